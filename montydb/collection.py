@@ -9,11 +9,14 @@ from .base import (
     validate_ok_for_replace,
     validate_list_or_none,
     validate_boolean,
+    _index_list,
+    _index_document,
 )
 
 from .cursor import MontyCursor
-from .engine.field_walker import FieldWalker
-from .engine.weighted import Weighted
+from .engine import keystring
+from .engine.field_walker import FieldWalker, iter_flat_values
+from .engine.index import ID_INDEX_NAME, gen_index_name
 from .engine.queries import QueryFilter
 from .engine.update import Updator
 from .engine.project import Projector
@@ -29,6 +32,7 @@ from .storage import StorageDuplicateKeyError
 from .errors import (
     DuplicateKeyError,
     BulkWriteError,
+    OperationFailure,
     WriteError,
 )
 
@@ -49,11 +53,7 @@ NotImplementeds = {
     "find_one_and_delete",
     "find_one_and_replace",
     "create_indexes",
-    "drop_index",
-    "drop_indexes",
     "reindex",
-    "list_indexes",
-    "index_information",
     "rename",
     "options",
     "map_reduce",
@@ -62,6 +62,16 @@ NotImplementeds = {
 }
 
 
+def _key_value(document, path):
+    """Get the value of `path` in `document` for error message"""
+    value = document
+    for field in path.split("."):
+        if not is_duckument_type(value) or field not in value:
+            return None
+        value = value[field]
+    return value
+
+
 class MontyCollection(BaseObject):
     def __init__(
         self,
@@ -152,13 +162,8 @@ class MontyCollection(BaseObject):
 
         try:
             result = self._storage.write_one(self, document)
-        except StorageDuplicateKeyError:
-            message = (
-                "E11000 duplicate key error collection: {} index: "
-                '_id_ dup key: {{ : "{}" }}'.format(self.full_name, str(document["_id"]))
-            )
-            details = {"index": 0, "code": 11000, "errmsg": message}
-            raise DuplicateKeyError(message, code=11000, details=details)
+        except StorageDuplicateKeyError as e:
+            self._raise_duplicate_key(e.index, document)
 
         return InsertOneResult(result)
 
@@ -182,12 +187,9 @@ class MontyCollection(BaseObject):
 
         try:
             result = self._storage.write_many(self, counter, ordered)
-        except StorageDuplicateKeyError:
-            message = (
-                f"E11000 duplicate key error collection: {self.full_name} index: "
-                f'_id_ dup key: {{ : "{str(counter.data)}" }}'
-            )
+        except StorageDuplicateKeyError as e:
             index = counter.count - 1
+            message = self._duplicate_key_message(e.index, documents[index])
             result = {
                 "writeErrors": [
                     {
@@ -236,12 +238,18 @@ class MontyCollection(BaseObject):
                     replacement["_id"] = bson.ObjectId()
                 raw_result["upserted"] = replacement["_id"]
                 raw_result["n"] = 1
-                self._storage.write_one(self, replacement, check_keys=False)
+                try:
+                    self._storage.write_one(self, replacement, check_keys=False)
+                except StorageDuplicateKeyError as e:
+                    self._raise_duplicate_key(e.index, replacement)
         else:
             raw_result["n"] = 1
             if fw.doc != replacement:
                 replacement["_id"] = fw.doc["_id"]
-                self._storage.update_one(self, replacement)
+                try:
+                    self._storage.update_one(self, replacement)
+                except StorageDuplicateKeyError as e:
+                    self._raise_duplicate_key(e.index, replacement)
                 raw_result["nModified"] = 1
 
         return UpdateResult(raw_result)
@@ -249,7 +257,7 @@ class MontyCollection(BaseObject):
     def _internal_scan_query(self, query_spec):
         """An internal document generator for update"""
         queryfilter = QueryFilter(query_spec)
-        documents = self._storage.query(MontyCursor(self), 0)
+        documents = self._storage.query(MontyCursor(self, query_spec), 0)
         first_matched = None
         for doc in documents:
             if queryfilter(doc):
@@ -288,7 +296,28 @@ class MontyCollection(BaseObject):
 
         fieldwalker = FieldWalker(document)
         updator(fieldwalker, do_insert=True)
-        self._storage.write_one(self, fieldwalker.doc)
+        try:
+            self._storage.write_one(self, fieldwalker.doc)
+        except StorageDuplicateKeyError as e:
+            self._raise_duplicate_key(e.index, fieldwalker.doc)
+
+    def _duplicate_key_message(self, index, document):
+        if index == ID_INDEX_NAME:
+            keys = [("_id", 1)]
+        else:
+            keys = self._storage.index_list(self).get(index, {}).get("key", [])
+        dup_key = ", ".join(
+            f': "{_key_value(document, path)}"' for path, _ in keys
+        )
+        return (
+            f"E11000 duplicate key error collection: {self.full_name} "
+            f"index: {index} dup key: {{ {dup_key} }}"
+        )
+
+    def _raise_duplicate_key(self, index, document):
+        message = self._duplicate_key_message(index, document)
+        details = {"index": 0, "code": 11000, "errmsg": message}
+        raise DuplicateKeyError(message, code=11000, details=details)
 
     def _no_id_update(self, updator, filter=None):
         id_operator = updator.operations.get("_id")
@@ -332,7 +361,10 @@ class MontyCollection(BaseObject):
 
             raw_result["n"] = 1
             if updator(fw):
-                self._storage.update_one(self, fw.doc)
+                try:
+                    self._storage.update_one(self, fw.doc)
+                except StorageDuplicateKeyError as e:
+                    self._raise_duplicate_key(e.index, fw.doc)
                 raw_result["nModified"] = 1
 
         return UpdateResult(raw_result)
@@ -368,6 +400,8 @@ class MontyCollection(BaseObject):
         else:
             self._no_id_update(updator)
 
+            updating = {}
+
             @on_err_close(scanner)
             def update_docs():
                 n, m = 0, 0
@@ -375,11 +409,15 @@ class MontyCollection(BaseObject):
                     n += 1
                     if updator(fieldwalker):
                         m += 1
+                        updating["doc"] = fieldwalker.doc
                         yield fieldwalker.doc
                 raw_result["n"] = n
                 raw_result["nModified"] = m
 
-            self._storage.update_many(self, update_docs())
+            try:
+                self._storage.update_many(self, update_docs())
+            except StorageDuplicateKeyError as e:
+                self._raise_duplicate_key(e.index, updating["doc"])
 
         return UpdateResult(raw_result)
 
@@ -388,7 +426,7 @@ class MontyCollection(BaseObject):
 
         queryfilter = QueryFilter(filter)
         storage = self._storage
-        documents = storage.query(MontyCursor(self), 0)
+        documents = storage.query(MontyCursor(self, filter), 0)
 
         for doc in documents:
             if queryfilter(doc):
@@ -403,7 +441,7 @@ class MontyCollection(BaseObject):
 
         queryfilter = QueryFilter(filter)
         storage = self._storage
-        documents = storage.query(MontyCursor(self), 0)
+        documents = storage.query(MontyCursor(self, filter), 0)
 
         doc_ids = set()
         for doc in documents:
@@ -548,7 +586,7 @@ class MontyCollection(BaseObject):
 
     def count_documents(self, filter, **kwargs):
         cursor = MontyCursor(self, filter=filter, **kwargs)
-        return len(list(cursor))
+        return sum(1 for _ in cursor)
 
     def distinct(self, key, filter=None, **kwargs):
         """ """
@@ -557,30 +595,26 @@ class MontyCollection(BaseObject):
                 f"key must be an instance of {string_types.__name__}"
             )
 
-        result = list()
+        # Keystring as canonical key, equal values (e.g. 1 and 1.0) share
+        # the same key, and keep the first one seen.
+        result = dict()
 
-        def get_value(doc):
-            fieldwalker = FieldWalker(doc)
-            fieldvalues = fieldwalker.go(key).get().value
-            res = list()
-            for v in fieldvalues.iter_flat():
-                weighted = Weighted(v)
-                if weighted not in result:
-                    res.append(weighted)
-            return res
+        def collect(doc):
+            for value in iter_flat_values(doc, key):
+                result.setdefault(keystring.encode(value), value)
 
-        documents = self._storage.query(MontyCursor(self), 0)
+        documents = self._storage.query(MontyCursor(self, filter), 0)
 
         if filter:
             queryfilter = QueryFilter(filter)
             for doc in documents:
                 if queryfilter(doc):
-                    result += get_value(doc)
+                    collect(doc)
         else:
             for doc in documents:
-                result += get_value(doc)
+                collect(doc)
 
-        return [weighted.value for weighted in sorted(result)]
+        return [result[k] for k in sorted(result)]
 
     def drop(self):
         self._database.drop_collection(self._name)
@@ -594,6 +628,107 @@ class MontyCollection(BaseObject):
         else:
             self.insert_one(to_save, *args, **kwargs)
 
-    def create_index(self, *args, **kwargs):
-        """Not functioning, currently only exists for mongoengine support.
+    def create_index(self, keys, **kwargs):
+        """Create an index on this collection
+
+        Single field and compound indexes of ascending (1) and descending (-1)
+        fields are supported. Storage engines that don't support secondary
+        indexes ignore it, and the index won't be listed. They can't enforce
+        a unique index, so creating one raises `OperationFailure`.
+
+        A `unique` index rejects documents that have the same key as other
+        document, which raises `DuplicateKeyError`, and so does creating it
+        on a collection that already has duplicates.
+
+        Options other than `name` and `unique` are ignored, e.g. `background`.
+
+        Returns the name of the index.
         """
+        keys = list(_index_document(_index_list(keys)).items())
+        for path, direction in keys:
+            if isinstance(direction, bool) or direction not in (1, -1):
+                raise OperationFailure(
+                    f"Index key type {direction!r} of {path!r} is not supported",
+                    code=67,
+                )
+
+        name = kwargs.get("name") or gen_index_name(keys)
+        unique = bool(kwargs.get("unique", False))
+        for existing, info in self.index_information().items():
+            same_options = info.get("unique", False) == unique
+            if existing == name:
+                if info["key"] != keys:
+                    raise OperationFailure(
+                        f"Index with name: {name} already exists with different "
+                        "options",
+                        code=86,
+                    )
+                if same_options:
+                    return name
+                raise OperationFailure(
+                    f"Index with name: {name} already exists with different "
+                    "options",
+                    code=85,
+                )
+            if info["key"] == keys:
+                raise OperationFailure(
+                    f"Index already exists with a different name: {existing}",
+                    code=85,
+                )
+
+        try:
+            self._storage.index_create(self, name, keys, unique)
+        except StorageDuplicateKeyError:
+            message = (
+                f"E11000 duplicate key error collection: {self.full_name} "
+                f"index: {name}"
+            )
+            raise DuplicateKeyError(message, code=11000)
+        except NotImplementedError as e:
+            raise OperationFailure(f"cannot create index {name}: {e}", code=67)
+        return name
+
+    def index_information(self):
+        """Get information on this collection's indexes
+
+        Returns a dict of index name to its info, which has the `key` of the
+        index, a list of (field path, direction) pairs.
+        """
+        information = {ID_INDEX_NAME: {"v": 2, "key": [("_id", 1)]}}
+        for name, info in self._storage.index_list(self).items():
+            information[name] = {"v": 2, **info}
+        return information
+
+    def list_indexes(self):
+        """Get an iterator of this collection's index documents"""
+        doc_cls = self.codec_options.document_class
+        documents = []
+        for name, info in self.index_information().items():
+            document = doc_cls(
+                [("v", info["v"]), ("key", doc_cls(info["key"])), ("name", name)]
+            )
+            document.update((k, v) for k, v in info.items() if k not in document)
+            documents.append(document)
+        return iter(documents)
+
+    def drop_index(self, index_or_name):
+        """Drop an index by its name or (field path, direction) pairs"""
+        name = index_or_name
+        if isinstance(index_or_name, list):
+            name = gen_index_name(index_or_name)
+
+        if not isinstance(name, string_types):
+            raise TypeError("index_or_name must be an instance of str or list")
+        if name == "*":
+            raise OperationFailure("use drop_indexes() to drop all indexes")
+        if name == ID_INDEX_NAME:
+            raise OperationFailure("cannot drop _id index", code=72)
+        if name not in self._storage.index_list(self):
+            raise OperationFailure(f"index not found with name [{name}]", code=27)
+
+        self._storage.index_drop(self, name)
+
+    def drop_indexes(self):
+        """Drop all indexes of this collection, except the `_id` index"""
+        for name in list(self._storage.index_list(self)):
+            self._storage.index_drop(self, name)
@@ -22,6 +22,7 @@ MONGO_COMPAT_VERSIONS = ("3.6", "4.0", "4.2", "4.4")  # 4.4 is experimenting
 
 
 _pinned_repository = {"_": None}
+_session_compat = {"_": None}
 _session = {}
 _session_default = {
     "mongo_version": "4.2",
@@ -296,6 +297,12 @@ def _bson_init(use_bson):
 
 def _mongo_compat(version):
     from .engine import queries
+    from .engine.cache import parse_cache
+
+    if _session_compat["_"] != version:
+        # Specs parsed in other version may have been validated differently
+        _session_compat["_"] = version
+        parse_cache.clear()
 
     def patch(mod, func, ver_func):
         setattr(mod, func, getattr(mod, ver_func))
@@ -1,15 +1,19 @@
 import warnings
 import copy
+import itertools
+import time
 from collections import deque
 
 from .errors import InvalidOperation, OperationFailure
-from .engine.queries import QueryFilter, ordering
+from .engine.queries import QueryFilter, ordering, ordering_top
 from .engine.project import Projector
+from .engine.planner import ExecutionStats
 from .types import (
     bson,
     RE_PATTERN_TYPE,
     iteritems,
     integer_types,
+    string_types,
 )
 from .base import (
     validate_boolean,
@@ -24,18 +28,20 @@ NotImplementeds = {
     "collation",
     "comment",
     "distinct",
-    "explain",
-    "hint",
     "max",
     "max_await_time_ms",
     "max_time_ms",
     "min",
     "remove_option",
     "where",
-    "batch_size",
 }
 
 
+DEFAULT_BATCH_SIZE = 101
+
+_cursor_ids = itertools.count(1)
+
+
 _QUERY_OPTIONS = {
     "tailable_cursor": 2,
     "slave_okay": 4,
@@ -122,8 +128,10 @@ class MontyCursor:
         self._projection = projection
         self._skip = skip
         self._limit = limit
+        self._batch_size = batch_size
         self._ordering = sort and _index_document(sort) or None
         self._max_scan = max_scan
+        self._hint = None
         self._max = max
         self._min = min
         self._return_key = return_key
@@ -133,9 +141,12 @@ class MontyCursor:
         self._retrieved = 0
 
         self._query_flags = cursor_type
+        self._stream = None
+        # Execution stats, only collected while explaining
+        self._stats = None
 
-        self._doc_count = 0
-        self._doc_count_with_skip_limit = 0
+        if hint is not None:
+            self.hint(hint)
 
     def __getattr__(self, name):
         if name in NotImplementeds:
@@ -246,7 +257,7 @@ class MontyCursor:
             "min",
             "ordering",
             # "explain",
-            # "hint",
+            "hint",
             "batch_size",
             "max_scan",
             # "manipulate",
@@ -272,10 +283,12 @@ class MontyCursor:
             raise InvalidOperation("cannot set options after executing query")
 
     def __die(self):
-        pass
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
 
-    def __query(self):
-        """ """
+    def __prepare(self):
+        """Validate params and return query filter and max scan"""
         # Validate params before jump into storage
 
         if self._skip < 0:
@@ -295,7 +308,11 @@ class MontyCursor:
                 )
             max_scan = int(self._max_scan)
 
-        queryfilter = QueryFilter(self._spec)
+        return QueryFilter(self._spec), max_scan
+
+    def __query(self):
+        """ """
+        queryfilter, max_scan = self.__prepare()
         projector = None
         if self._projection:
             projector = Projector(self._projection, queryfilter)
@@ -304,26 +321,32 @@ class MontyCursor:
         # (NOTE) Documents return from storage should be decoded.
         storage = self._collection.database.client._storage
         documents = storage.query(self, max_scan)
-        # Filtering
-        fieldwalkers = []
-        for doc in documents:
-            if queryfilter(doc):
-                fieldwalkers.append(queryfilter.fieldwalker)
 
-        self._doc_count = len(fieldwalkers)
+        if not self._ordering:
+            # Without sorting, documents are filtered, skipped and projected
+            # while being pulled from storage, batch by batch.
+            self._stream = self.__streaming(documents, queryfilter, projector)
+            self._id = next(_cursor_ids)
+            self.__get_more()
+            return
 
-        # Sorting
-        if self._ordering:
-            fieldwalkers = ordering(fieldwalkers, self._ordering)
+        # Filtering
+        matched = (
+            queryfilter.fieldwalker for doc in documents if queryfilter(doc)
+        )
 
-        # Limit and Skip
-        if self._skip and not self._limit:
-            fieldwalkers = fieldwalkers[self._skip:]
-        elif self._limit:
+        if self._limit:
+            # Sorting, only keep top candidates before Skip
             end = self._skip + abs(self._limit)
-            fieldwalkers = fieldwalkers[self._skip: end]
+            fieldwalkers = ordering_top(matched, self._ordering, end)
+            fieldwalkers = fieldwalkers[self._skip:]
 
-        self._doc_count_with_skip_limit = len(fieldwalkers)
+        else:
+            # Sorting
+            fieldwalkers = ordering(list(matched), self._ordering)
+            # Skip
+            if self._skip:
+                fieldwalkers = fieldwalkers[self._skip:]
 
         # Projection
         if projector:
@@ -339,7 +362,38 @@ class MontyCursor:
             self._killed = True
             self.__die()
 
-        if self._limit and self._id and self._limit <= self._retrieved:
+    def __streaming(self, documents, queryfilter, projector):
+        skip = self._skip
+        limit = abs(self._limit)
+        returned = 0
+
+        for doc in documents:
+            if not queryfilter(doc):
+                continue
+            if skip:
+                skip -= 1
+                continue
+
+            fieldwalker = queryfilter.fieldwalker
+            if projector:
+                projector(fieldwalker)
+
+            yield fieldwalker.doc
+
+            returned += 1
+            if limit and returned >= limit:
+                # Stop pulling from storage
+                return
+
+    def __get_more(self):
+        batch_size = self._batch_size or DEFAULT_BATCH_SIZE
+        batch = list(itertools.islice(self._stream, batch_size))
+        self._data.extend(batch)
+        self._retrieved += len(batch)
+
+        if len(batch) < batch_size:
+            self._id = 0
+            self._killed = True
             self.__die()
 
     def _refresh(self):
@@ -352,7 +406,7 @@ class MontyCursor:
             self.__query()
         elif self._id:
             # (NOTE) Get More
-            pass
+            self.__get_more()
 
         return len(self._data)
 
@@ -387,7 +441,18 @@ class MontyCursor:
     def alive(self):
         return bool(len(self._data) or (not self._killed))
 
+    def batch_size(self, batch_size):
+        if not isinstance(batch_size, integer_types):
+            raise TypeError("batch_size must be an integer")
+        if batch_size < 0:
+            raise ValueError("batch_size must be >= 0")
+        self.__check_okay_to_chain()
+
+        self._batch_size = batch_size
+        return self
+
     def close(self):
+        self._killed = True
         self.__die()
 
     def clone(self):
@@ -401,12 +466,124 @@ class MontyCursor:
         )
 
         validate_boolean("with_limit_and_skip", with_limit_and_skip)
-        if self._id is None:
-            # (NOTE) this might need improve
-            self.__query()
+        queryfilter, max_scan = self.__prepare()
+        storage = self._collection.database.client._storage
+
+        count = 0
+        for doc in storage.query(self, max_scan):
+            if queryfilter(doc):
+                count += 1
+
         if with_limit_and_skip:
-            return self._doc_count_with_skip_limit
-        return self._doc_count
+            count = max(count - self._skip, 0)
+            if self._limit:
+                count = min(count, abs(self._limit))
+        return count
+
+    def explain(self):
+        """Run this query and describe how it was executed
+
+        Returns a document of the `queryPlanner`, the plan that fetched
+        documents from storage, and the `executionStats`. Besides MongoDB's
+        stats, the time spent in decoding, filtering, sorting and projecting
+        documents are reported in milliseconds.
+        """
+        cursor = self._clone(deepcopy=False)
+        stats = cursor._stats = ExecutionStats()
+
+        start = time.perf_counter()
+        queryfilter, max_scan = cursor.__prepare()
+        projector = None
+        if cursor._projection:
+            projector = Projector(cursor._projection, queryfilter)
+
+        storage = cursor._collection.database.client._storage
+        documents = storage.query(cursor, max_scan)
+        matches = stats.timed("filter", queryfilter)
+        limit = abs(cursor._limit)
+
+        if not cursor._ordering:
+            fieldwalkers = []
+            skip = cursor._skip
+            for doc in documents:
+                if not matches(doc):
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                fieldwalkers.append(queryfilter.fieldwalker)
+                if limit and len(fieldwalkers) >= limit:
+                    break
+        else:
+            matched = [queryfilter.fieldwalker for doc in documents if matches(doc)]
+            if limit:
+                end = cursor._skip + limit
+                fieldwalkers = stats.time(
+                    "sort", ordering_top, matched, cursor._ordering, end
+                )
+            else:
+                fieldwalkers = stats.time(
+                    "sort", ordering, matched, cursor._ordering
+                )
+            fieldwalkers = fieldwalkers[cursor._skip:]
+
+        if projector:
+            for fw in fieldwalkers:
+                stats.time("projection", projector, fw)
+
+        millis = (time.perf_counter() - start) * 1000
+
+        plan = stats.plan.document(cursor._spec)
+        if cursor._ordering:
+            plan = {
+                "stage": "SORT",
+                "sortPattern": dict(cursor._ordering),
+                "inputStage": plan,
+            }
+        if cursor._skip:
+            plan = {"stage": "SKIP", "skipAmount": cursor._skip, "inputStage": plan}
+        if limit:
+            plan = {"stage": "LIMIT", "limitAmount": limit, "inputStage": plan}
+        if projector:
+            plan = {
+                "stage": "PROJECTION",
+                "transformBy": cursor._projection,
+                "inputStage": plan,
+            }
+
+        return {
+            "queryPlanner": {
+                "plannerVersion": 1,
+                "namespace": cursor._collection.full_name,
+                "indexFilterSet": False,
+                "parsedQuery": cursor._spec,
+                "winningPlan": plan,
+                "rejectedPlans": [],
+            },
+            "executionStats": {
+                "executionSuccess": True,
+                "nReturned": len(fieldwalkers),
+                "executionTimeMillis": int(millis),
+                "totalKeysExamined": stats.keys_examined,
+                "totalDocsExamined": stats.docs_examined,
+                "decodeTimeMillis": stats.seconds["decode"] * 1000,
+                "filterTimeMillis": stats.seconds["filter"] * 1000,
+                "sortTimeMillis": stats.seconds["sort"] * 1000,
+                "projectionTimeMillis": stats.seconds["projection"] * 1000,
+            },
+        }
+
+    def hint(self, index):
+        """Use an index for this query, by its name or (key, direction) pairs
+
+        Pass `$natural` to scan the collection, or None to clear the hint.
+        """
+        self.__check_okay_to_chain()
+        if index is None or isinstance(index, string_types):
+            self._hint = index
+        else:
+            self._hint = list(_index_document(_index_list(index)).items())
+        return self
 
     def limit(self, limit):
         if not isinstance(limit, integer_types):
@@ -425,6 +602,7 @@ class MontyCursor:
         return self
 
     def rewind(self):
+        self.__die()
         self._data = deque()
         self._id = None
         self._retrieved = 0
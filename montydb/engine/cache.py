@@ -0,0 +1,189 @@
+"""Bounded cache of parsed query, projection and update specs
+
+Parsing a spec builds operator closures and validates the whole spec, which
+costs much more than running a parsed spec on a few documents. Since most
+applications only use a limited number of specs, parse results are kept in
+a LRU cache, keyed by a hashable form of the spec.
+
+Specs that only have plain values on plain fields, like `{"_id": 1}`, are
+cheap to parse and usually differ in every call, so they are never cached.
+Other specs are only cached when they are seen the second time, so specs
+used once don't pay for being copied, nor push the specs in use out of the
+cache.
+
+Example:
+    >>> from montydb.engine.cache import parse_cache
+    >>> parse_cache.info()
+    {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 1024}
+
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+from ..types import (
+    bson,
+    RE_PATTERN_TYPE,
+    is_duckument_type,
+)
+
+
+DEFAULT_CACHE_SIZE = 1024
+
+
+def spec_key(spec):
+    """Return a hashable key of `spec`, or `None` if it can't be made
+
+    Type of each value is part of the key, so `1`, `1.0` and `True` are
+    different, and so is the key order of documents.
+
+    """
+    try:
+        return _freeze(spec)
+    except TypeError:
+        return None
+
+
+_PLAIN_TYPES = {int, float, str, bool, type(None)}
+
+
+def _freeze(value):
+    cls = type(value)
+    if cls in _PLAIN_TYPES:
+        return (cls, value)
+    if cls is dict or is_duckument_type(value):
+        return (cls, tuple([(k, _freeze(v)) for k, v in value.items()]))
+    if cls is list or isinstance(value, (list, tuple)):
+        return (cls, tuple([_freeze(v) for v in value]))
+    if isinstance(value, (RE_PATTERN_TYPE, bson.Regex)):
+        return (cls, value.pattern, value.flags)
+
+    hash(value)  # raise TypeError if not hashable
+    return (cls, value)
+
+
+def _thaw(frozen):
+    """Rebuild a value from its key, as a copy that shares no container"""
+    cls = frozen[0]
+    if cls in _PLAIN_TYPES:
+        return frozen[1]
+    if cls is dict or is_duckument_type(cls):
+        return cls([(k, _thaw(v)) for k, v in frozen[1]])
+    if issubclass(cls, (list, tuple)):
+        return cls([_thaw(v) for v in frozen[1]])
+    if cls is RE_PATTERN_TYPE:
+        return re.compile(frozen[1], frozen[2])
+    if cls is bson.Regex:
+        return bson.Regex(frozen[1], frozen[2])
+    return frozen[1]
+
+
+def _is_plain(spec):
+    """Is `spec` a document of plain values on fields without `$`"""
+    if type(spec) is not dict and not is_duckument_type(spec):
+        return False
+    for key, value in spec.items():
+        if type(value) not in _PLAIN_TYPES or "$" in key:
+            return False
+    return True
+
+
+class ParseCache:
+    """Thread-safe LRU cache of parse results
+
+    Parse results are shared between all the parsers of the same spec, so
+    they must not hold any per-call state.
+
+    Args:
+        maxsize (int): Max number of parse results to keep, `0` to disable.
+
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self._maxsize = maxsize
+        self._results = OrderedDict()
+        # Hashes of keys seen once, to admit them into cache when seen again
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind, parse, *args):
+        """Get parse result of `args`, call `parse(*args)` if not cached
+
+        `args` are parsed from a copy rebuilt from the cache key before being
+        cached, so the cached result won't be changed by the caller modifying
+        their spec afterward. Plain specs, and specs not seen before, are
+        parsed as is without being cached.
+
+        Args:
+            kind (str): What kind of spec, e.g. "query".
+            parse (callable): Parse function.
+            *args: Spec and other inputs that the parse result depends on.
+
+        """
+        if not self._maxsize or _is_plain(args[0]):
+            return parse(*args)
+        key = spec_key((kind,) + args)
+        if key is None:
+            return parse(*args)
+
+        with self._lock:
+            try:
+                result = self._results[key]
+            except KeyError:
+                self.misses += 1
+                digest = hash(key)
+                admit = self._seen.pop(digest, False)
+                if not admit:
+                    self._seen[digest] = True
+                    while len(self._seen) > self._maxsize:
+                        self._seen.popitem(last=False)
+            else:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return result
+
+        if not admit:
+            return parse(*args)
+
+        # Parse outside the lock, parser may parse nested specs.
+        result = parse(*_thaw(key)[1:])
+
+        with self._lock:
+            self._results[key] = result
+            while len(self._results) > self._maxsize:
+                self._results.popitem(last=False)
+
+        return result
+
+    def info(self):
+        """Return cache statistics"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._results),
+                "maxsize": self._maxsize,
+            }
+
+    def resize(self, maxsize):
+        """Change max number of parse results to keep, `0` to disable"""
+        with self._lock:
+            self._maxsize = maxsize
+            while len(self._results) > maxsize:
+                self._results.popitem(last=False)
+            while len(self._seen) > maxsize:
+                self._seen.popitem(last=False)
+
+    def clear(self):
+        """Remove all parse results and reset statistics"""
+        with self._lock:
+            self._results.clear()
+            self._seen.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+parse_cache = ParseCache()
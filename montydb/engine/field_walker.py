@@ -857,3 +857,46 @@ class FieldWalker:
 
     def __exit__(self, *args):
         self.tree.clear()
+
+
+def iter_flat_values(doc, path, doc_type=None):
+    """Iterate field values of a document like `FieldValues.iter_flat`
+
+    A lightweight read path for the cases that only need values, e.g.
+    `distinct`, without building a `FieldTree` for the document.
+
+    Arguments:
+        doc: The document to read from.
+        path (str): Document field path
+        doc_type (optional): The document class, default `type(doc)`.
+
+    """
+    map_cls = doc_type or type(doc)
+    # (value, located)
+    nodes = [(doc, False)]
+
+    for field in path.split("."):
+        picked = []
+        for value, _ in nodes:
+            if isinstance(value, map_cls):
+                if field in value:
+                    picked.append((value[field], False))
+
+            elif isinstance(value, list):
+                for elem in value:
+                    if isinstance(elem, map_cls) and field in elem:
+                        picked.append((elem[field], False))
+
+                if field.isdigit() and int(field) < len(value):
+                    picked.append((value[int(field)], True))
+
+        nodes = picked
+        if not nodes:
+            return
+
+    for value, located in nodes:
+        if isinstance(value, list):
+            if not located:
+                yield from value
+        else:
+            yield value
@@ -0,0 +1,230 @@
+"""Secondary index keys and key ranges
+
+An index maps entry keys to the `_id` of documents. The entry key of a
+document is the concatenation of each indexed field's keystring, so entry
+keys compare as bytes in the order of the index's first field, then the
+second, and so on. Field keys are always stored in ascending order, the
+direction of an index field is only recorded in the index catalog.
+
+A field holding an array is indexed by the array itself and each of its
+elements, which are the same values that query operators look at. So a
+document has one entry per combination of its indexed fields' values, and
+a missing field is indexed as `null`.
+
+Query conditions on the first field of an index are turned into ranges of
+entry keys. Documents in these ranges are only candidates, they still have
+to be checked by the `QueryFilter`, so a range may be wider than needed but
+never narrower.
+
+Example:
+    >>> from montydb.engine.index import index_keys, index_ranges
+    >>> entries = index_keys({"a": [1, 5]}, [("a", 1)])
+    >>> len(entries)  # 1, 5 and [1, 5]
+    3
+    >>> [(start, stop)] = index_ranges({"a": {"$gt": 2}}, "a")
+    >>> [start <= entry < stop for entry in entries]
+    [False, True, False]
+
+"""
+
+from datetime import datetime
+
+from ..types import bson, is_duckument_type
+from . import keystring
+from .field_walker import FieldWalker
+
+
+ID_INDEX_NAME = "_id_"
+
+_NULL_KEY = bytes([keystring.NULL])
+# Larger than any byte that follows a complete key, since every type byte
+# and END marker is smaller.
+_AFTER = b"\xff"
+# Every entry key is in this range
+FULL_RANGES = [(b"", _AFTER)]
+
+
+def gen_index_name(keys):
+    """Generate index name from a list of (path, direction) pairs"""
+    return "_".join(f"{path}_{direction}" for path, direction in keys)
+
+
+def index_keys(doc, keys):
+    """Get the entry keys of a document in an index
+
+    Args:
+        doc (dict): Document to index.
+        keys (list): The index's (path, direction) pairs.
+
+    Returns:
+        list: Distinct entry keys (bytes) in ascending order.
+
+    """
+    fieldwalker = FieldWalker(doc)
+    entries = [b""]
+    for path, _ in keys:
+        fieldwalker.go(path).get()
+        field_keys = {keystring.encode(value) for value in fieldwalker.value}
+        field_keys = sorted(field_keys) or [_NULL_KEY]
+        entries = [entry + key for entry in entries for key in field_keys]
+    return entries
+
+
+_plain_types = set()
+
+
+def _value_keys(value):
+    """Keys to look up for a query value, or None if it can't be looked up
+
+    Only values that never equal to, nor compare with, values of other types
+    are accepted. Besides its own key, a float may also equal to, or compare
+    with, a `Decimal128` by its string form.
+
+    """
+    if not _plain_types:
+        _plain_types.update({
+            int, float, bson.Int64, str, bool, datetime, bson.ObjectId,
+        })
+
+    if type(value) not in _plain_types or value != value:  # NaN
+        return None
+
+    keys = [keystring.encode(value)]
+    if bson.bson_used and type(value) is float:
+        keys.append(keystring.encode(bson.Decimal128(str(value))))
+    return keys
+
+
+def _type_range(key):
+    """The range of all keys that have the same type as `key`"""
+    type_byte = key[0]
+    return bytes([type_byte]), bytes([type_byte + 1])
+
+
+def _point_ranges(values):
+    if not isinstance(values, list):
+        return None
+    ranges = []
+    for value in values:
+        keys = _value_keys(value)
+        if keys is None:
+            return None
+        ranges += [(key, key + _AFTER) for key in keys]
+    return _merge(ranges)
+
+
+def _compare_range(op, value):
+    keys = _value_keys(value)
+    if keys is None:
+        return None
+    start, stop = _type_range(keys[0])
+    if op == "$gt":
+        start = min(keys) + _AFTER
+    elif op == "$gte":
+        start = min(keys)
+    elif op == "$lt":
+        stop = max(keys)
+    else:  # "$lte"
+        stop = max(keys) + _AFTER
+    return start, stop
+
+
+def _merge(ranges):
+    """Sort ranges and merge the overlapped ones"""
+    merged = []
+    for start, stop in sorted(ranges):
+        if start >= stop:
+            continue
+        if merged and start <= merged[-1][1]:
+            if stop > merged[-1][1]:
+                merged[-1] = (merged[-1][0], stop)
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def _is_operators(condition):
+    return (
+        is_duckument_type(condition)
+        and next(iter(condition), "").startswith("$")
+    )
+
+
+def index_ranges(spec, path):
+    """Get the ranges of entry keys that documents matching `spec` are in
+
+    Only top level conditions of `path` are looked at: equality, `$eq`,
+    `$in`, `$gt`, `$gte`, `$lt` and `$lte`. Entries in these ranges belong
+    to documents that *may* match `spec`.
+
+    Args:
+        spec (dict): Query filter.
+        path (str): Field path of the index's first field.
+
+    Returns:
+        list: Sorted (start, stop) pairs, entries `start <= key < stop` are
+            in range. Or None if there is no condition to look up by.
+
+    """
+    if not is_duckument_type(spec) or path not in spec:
+        return None
+
+    condition = spec[path]
+    if not _is_operators(condition):
+        return _point_ranges([condition])
+
+    if "$eq" in condition:
+        return _point_ranges([condition["$eq"]])
+    if "$in" in condition:
+        return _point_ranges(condition["$in"])
+
+    # Only one bound is looked up. Bounds can't be intersected into one
+    # range, since one element of an array may meet the lower bound and
+    # another element the upper bound, the filter checks the others.
+    for op in ("$gt", "$gte", "$lt", "$lte"):
+        if op not in condition:
+            continue
+        range_ = _compare_range(op, condition[op])
+        if range_ is not None:
+            return _merge([range_])
+
+    return None
+
+
+def is_equality(spec, path):
+    """Is `path` looked up by equality or `$in` in `spec`"""
+    condition = spec[path]
+    return (
+        not _is_operators(condition)
+        or "$eq" in condition
+        or "$in" in condition
+    )
+
+
+def select_index(spec, indexes):
+    """Select an index to look up documents that may match `spec`
+
+    Indexes that looked up by equality are preferred over range, otherwise
+    the first one in catalog order is selected.
+
+    Args:
+        spec (dict): Query filter.
+        indexes (dict): Index name to its (path, direction) pairs.
+
+    Returns:
+        tuple: Index name and entry key ranges, or None if no index could
+            be used.
+
+    """
+    selected = None
+    for name, keys in indexes.items():
+        path = keys[0][0]
+        ranges = index_ranges(spec, path)
+        if ranges is None:
+            continue
+        if is_equality(spec, path):
+            return name, ranges
+        if selected is None:
+            selected = name, ranges
+
+    return selected
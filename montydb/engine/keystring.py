@@ -0,0 +1,326 @@
+"""Encode BSON values into binary comparable keys
+
+The key of a value is a `bytes` string, and comparing two keys byte by byte
+gives the same result as comparing the two values in MongoDB's cross-type
+comparison order:
+
+    MinKey < null < Numbers < Strings < Object < Array < BinData < ObjectId
+        < Boolean < Date < Timestamp < Regex < Code < Code with scope < MaxKey
+
+All numeric types (int, Int64, float, Decimal128) are compared by their
+exact values, so `1`, `1.0` and `Decimal128("1.00")` have the same key, and
+NaN sorts before all other numbers.
+
+Every key is self-delimiting, no key is a prefix of another key. So keys can
+be concatenated into a compound key, or be inverted with `invert` to compare
+in descending order.
+
+Example:
+    >>> from montydb.engine import keystring
+    >>> keystring.encode(1) == keystring.encode(1.0)
+    True
+    >>> keystring.encode(10) < keystring.encode("1")
+    True
+
+"""
+
+import struct
+from datetime import datetime
+from decimal import Decimal
+from collections.abc import Mapping
+
+from ..types import (
+    bson,
+    string_types,
+    RE_PATTERN_TYPE,
+    re_int_flag_to_str,
+)
+
+
+# Type bytes, with gaps between them like MongoDB's own KeyString format.
+
+MINKEY = 10
+UNDEFINED = 15
+NULL = 20
+NUMBER = 30
+STRING = 60
+OBJECT = 70
+ARRAY = 80
+BINARY = 90
+OBJECTID = 100
+BOOL = 110
+DATE = 120
+TIMESTAMP = 130
+REGEX = 140
+CODE = 160
+CODE_W_SCOPE = 170
+MAXKEY = 240
+
+END = 0
+
+# Numeric value classes, followed by the type byte `NUMBER`.
+
+_NAN = 1
+_NEG_INF = 2
+_NEG = 3
+_ZERO = 4
+_POS = 5
+_POS_INF = 6
+
+_EXPONENT_BIAS = 1 << 31
+_INT64_BIAS = 1 << 63
+
+_EPOCH = datetime(1970, 1, 1)
+
+_INVERT = bytes(range(255, -1, -1))
+
+
+def encode(value):
+    """Encode a BSON value into binary comparable key
+
+    Args:
+        value: Any value that can be stored in a document.
+
+    Returns:
+        bytes: The key of the value.
+
+    Raises:
+        TypeError: If the value is not a BSON type.
+
+    """
+    out = bytearray()
+    _encode(value, out)
+    return bytes(out)
+
+
+def invert(key):
+    """Invert a key so it compares in descending order
+
+    Args:
+        key (bytes): A key or concatenated keys from `encode`.
+
+    Returns:
+        bytes: The inverted key.
+
+    """
+    return key.translate(_INVERT)
+
+
+def _encode(value, out):
+    encoder = _type_encoders().get(type(value))
+    if encoder is None:
+        encoder = _fallback_encoder(value)
+    encoder(value, out)
+
+
+def _encode_element(key, value, out):
+    # Element of a document compares by type, field name, then value.
+    element = bytearray()
+    _encode(value, element)
+    out.append(element[0])
+    out.extend(_string_body(key))
+    out.extend(element[1:])
+
+
+_encoders = {}
+
+
+def _type_encoders():
+    # Build once, `bson` types are only available after bson module init.
+    if not _encoders:
+        from .weighted import _cmp_decimal
+
+        _encoders.update({
+            bson.MinKey: _encode_minkey,
+            type(None): _encode_null,
+            int: _encode_int,
+            float: _encode_float,
+            bson.Int64: _encode_int,
+            bson.Decimal128: _encode_decimal128,
+            _cmp_decimal: _encode_cmp_decimal,
+            str: _encode_string,
+            bson.SON: _encode_document,
+            dict: _encode_document,
+            list: _encode_array,
+            tuple: _encode_array,
+            bson.Binary: _encode_binary,
+            bytes: _encode_binary,
+            bson.ObjectId: _encode_objectid,
+            bool: _encode_bool,
+            datetime: _encode_datetime,
+            bson.Timestamp: _encode_timestamp,
+            bson.Regex: _encode_regex,
+            RE_PATTERN_TYPE: _encode_regex,
+            bson.Code: _encode_code,
+            bson.MaxKey: _encode_maxkey,
+        })
+    return _encoders
+
+
+def _fallback_encoder(value):
+    if isinstance(value, bson.Code):  # also an instance of string_types
+        return _encode_code
+    elif isinstance(value, bool):
+        return _encode_bool
+    elif isinstance(value, int):
+        return _encode_int
+    elif isinstance(value, string_types):
+        return _encode_string
+    elif isinstance(value, bytes):
+        return _encode_binary
+    elif isinstance(value, datetime):
+        return _encode_datetime
+    elif isinstance(value, Mapping):
+        return _encode_document
+    else:
+        raise TypeError(f"Not encodable type: {type(value)!r}")
+
+
+def _encode_minkey(value, out):
+    out.append(MINKEY)
+
+
+def _encode_maxkey(value, out):
+    out.append(MAXKEY)
+
+
+def _encode_null(value, out):
+    out.append(NULL)
+
+
+def _encode_bool(value, out):
+    # One type byte for both, so an element compares by field name before
+    # its boolean value.
+    out.append(BOOL)
+    out.append(1 if value else 0)
+
+
+def _encode_int(value, out):
+    _encode_number(Decimal(int(value)), out)
+
+
+def _encode_float(value, out):
+    # Decimal from float is exact, so doubles compare with decimals by
+    # their real values.
+    _encode_number(Decimal(value), out)
+
+
+def _encode_decimal128(value, out):
+    _encode_number(value.to_decimal(), out)
+
+
+def _encode_cmp_decimal(value, out):
+    _encode_number(value._dec.to_decimal(), out)
+
+
+def _encode_number(dec, out):
+    out.append(NUMBER)
+
+    if dec.is_nan():
+        out.append(_NAN)
+        return
+    if dec.is_infinite():
+        out.append(_NEG_INF if dec < 0 else _POS_INF)
+        return
+    if not dec:
+        out.append(_ZERO)
+        return
+
+    sign, digits, exponent = dec.as_tuple()
+    # Normalize into 0.d1d2d3... x 10^exponent without trailing zeros,
+    # then larger exponent means larger value, and digits compare in order.
+    end = len(digits)
+    while digits[end - 1] == 0:
+        end -= 1
+    exponent += len(digits)
+    digits = digits[:end]
+    if len(digits) % 2:
+        digits += (0,)
+
+    body = bytearray(struct.pack(">I", exponent + _EXPONENT_BIAS))
+    # Two digits per byte, shifted by one to leave room for END.
+    body.extend(
+        digits[i] * 10 + digits[i + 1] + 1 for i in range(0, len(digits), 2)
+    )
+    body.append(END)
+
+    if sign:
+        out.append(_NEG)
+        out.extend(invert(bytes(body)))
+    else:
+        out.append(_POS)
+        out.extend(body)
+
+
+def _string_body(value):
+    # Escape NUL bytes so the END marker keeps shorter strings smaller.
+    return value.encode("utf-8").replace(b"\x00", b"\x00\xff") + b"\x00\x00"
+
+
+def _encode_string(value, out):
+    out.append(STRING)
+    out.extend(_string_body(value))
+
+
+def _encode_document(value, out):
+    out.append(OBJECT)
+    _document_body(value, out)
+
+
+def _document_body(value, out):
+    for key, val in value.items():
+        _encode_element(key, val, out)
+    out.append(END)
+
+
+def _encode_array(value, out):
+    out.append(ARRAY)
+    for val in value:
+        _encode(val, out)
+    out.append(END)
+
+
+def _encode_binary(value, out):
+    # Same as MongoDB, binary data compares by length, subtype, then data.
+    subtype = getattr(value, "subtype", 0)
+    out.append(BINARY)
+    out.extend(struct.pack(">IB", len(value), subtype))
+    out.extend(value)
+
+
+def _encode_objectid(value, out):
+    out.append(OBJECTID)
+    out.extend(value.binary)
+
+
+def _encode_datetime(value, out):
+    if value.utcoffset() is not None:
+        value = value.replace(tzinfo=None) - value.utcoffset()
+    delta = value - _EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+    out.append(DATE)
+    out.extend(struct.pack(">Q", micros + _INT64_BIAS))
+
+
+def _encode_timestamp(value, out):
+    out.append(TIMESTAMP)
+    out.extend(struct.pack(">II", value.time, value.inc))
+
+
+def _encode_regex(value, out):
+    flags = value.flags
+    if not isinstance(flags, string_types):
+        flags = re_int_flag_to_str(flags)
+    out.append(REGEX)
+    out.extend(_string_body(value.pattern))
+    out.extend(_string_body(flags))
+
+
+def _encode_code(value, out):
+    if value.scope is None:
+        out.append(CODE)
+        out.extend(_string_body(str(value)))
+    else:
+        out.append(CODE_W_SCOPE)
+        out.extend(_string_body(str(value)))
+        _document_body(value.scope, out)
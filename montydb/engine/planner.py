@@ -0,0 +1,186 @@
+"""Query plans and execution statistics
+
+A query fetches documents from storage in one of these stages:
+
+* `IDHACK`: Fetch by the `_id` keys of the query's `_id` equality or `$in`
+  condition.
+* `IXSCAN`: Fetch by the entry key ranges of a secondary index, see
+  `montydb.engine.index`.
+* `COLLSCAN`: Scan the whole collection.
+
+Documents fetched in any stage are only candidates, the query filter still
+applies to every one of them.
+
+Example:
+    >>> from montydb.engine.planner import plan_query
+    >>> indexes = {"a_1": {"key": [("a", 1)]}}
+    >>> plan_query({"a": 1}, None, indexes).index
+    'a_1'
+    >>> plan_query({"a": 1}, None, indexes, hint="$natural").stage
+    'COLLSCAN'
+
+"""
+
+import time
+
+from ..errors import OperationFailure
+from .index import ID_INDEX_NAME, FULL_RANGES, index_ranges, select_index
+
+
+COLLSCAN = "COLLSCAN"
+IDHACK = "IDHACK"
+IXSCAN = "IXSCAN"
+
+NATURAL = "$natural"
+
+
+class QueryPlan:
+    """How documents are fetched from storage
+
+    Args:
+        stage (str): `COLLSCAN`, `IDHACK` or `IXSCAN`.
+        keys (list): Encoded `_id` keys to fetch by, for `IDHACK`.
+        index (str): Name of the index to scan, for `IXSCAN`.
+        key_pattern (list): The index's (path, direction) pairs.
+        ranges (list): Entry key ranges to scan, for `IXSCAN`.
+
+    """
+
+    def __init__(self, stage, keys=None, index=None, key_pattern=None,
+                 ranges=None):
+        self.stage = stage
+        self.keys = keys
+        self.index = index
+        self.key_pattern = key_pattern
+        self.ranges = ranges
+
+    def __repr__(self):
+        if self.stage == IXSCAN:
+            return f"QueryPlan({self.stage!r}, index={self.index!r})"
+        return f"QueryPlan({self.stage!r})"
+
+    def document(self, spec):
+        """Describe this plan as a MongoDB explain stage document"""
+        if self.stage == IDHACK:
+            return {"stage": IDHACK}
+        if self.stage == IXSCAN:
+            return {
+                "stage": "FETCH",
+                "filter": spec,
+                "inputStage": {
+                    "stage": IXSCAN,
+                    "keyPattern": dict(self.key_pattern),
+                    "indexName": self.index,
+                    "direction": "forward",
+                },
+            }
+        return {"stage": COLLSCAN, "filter": spec, "direction": "forward"}
+
+
+def _hinted_index(hint, indexes):
+    """Get the name of the index that `hint` refers to, by name or keys"""
+    if isinstance(hint, str):
+        return hint
+    keys = list(hint)
+    if keys == [("_id", 1)]:
+        return ID_INDEX_NAME
+    for name, info in indexes.items():
+        if info["key"] == keys:
+            return name
+    return None
+
+
+def plan_query(spec, id_keys, indexes, hint=None):
+    """Choose how to fetch documents for query `spec`
+
+    Without `hint`, documents are looked up by `_id` if possible, otherwise
+    by index if any could be used, see `select_index`. A hinted index is
+    always used, it's fully scanned if `spec` has no condition on its first
+    field.
+
+    Args:
+        spec (dict): Query filter.
+        id_keys (list): Encoded `_id` keys of `spec`, or None if `spec` can't
+            be looked up by `_id`.
+        indexes (dict): Secondary index name to its info, in catalog order.
+        hint (str or list, optional): Index name or (path, direction) pairs
+            of the index to use, `$natural` to scan the collection.
+
+    Returns:
+        QueryPlan: The plan.
+
+    Raises:
+        OperationFailure: If the hinted index doesn't exist.
+
+    """
+    if hint is None:
+        if id_keys is not None:
+            return QueryPlan(IDHACK, keys=id_keys)
+
+        selected = select_index(
+            spec, {name: info["key"] for name, info in indexes.items()}
+        )
+        if selected is None:
+            return QueryPlan(COLLSCAN)
+        name, ranges = selected
+        return QueryPlan(
+            IXSCAN, index=name, key_pattern=indexes[name]["key"], ranges=ranges
+        )
+
+    if hint == NATURAL or (
+        not isinstance(hint, str) and [path for path, _ in hint] == [NATURAL]
+    ):
+        return QueryPlan(COLLSCAN)
+
+    name = _hinted_index(hint, indexes)
+    if name == ID_INDEX_NAME:
+        if id_keys is not None:
+            return QueryPlan(IDHACK, keys=id_keys)
+        return QueryPlan(COLLSCAN)
+    if name not in indexes:
+        raise OperationFailure(
+            "error processing query: planner returned error :: caused by :: "
+            "hint provided does not correspond to an existing index",
+            code=2,
+        )
+
+    key_pattern = indexes[name]["key"]
+    ranges = index_ranges(spec, key_pattern[0][0])
+    return QueryPlan(
+        IXSCAN,
+        index=name,
+        key_pattern=key_pattern,
+        ranges=FULL_RANGES if ranges is None else ranges,
+    )
+
+
+class ExecutionStats:
+    """Counters and timers of one query execution, for `explain`
+
+    Storage cursors record the plan, and count index entries and documents
+    they have examined. Time is added up per stage in seconds.
+
+    """
+
+    def __init__(self):
+        self.plan = None
+        self.keys_examined = 0
+        self.docs_examined = 0
+        self.seconds = {
+            "decode": 0.0,
+            "filter": 0.0,
+            "sort": 0.0,
+            "projection": 0.0,
+        }
+
+    def time(self, stage, func, *args):
+        """Call `func(*args)` and add up the time spent to `stage`"""
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.seconds[stage] += time.perf_counter() - start
+
+    def timed(self, stage, func):
+        """Wrap `func` so the time spent in it is added up to `stage`"""
+        return lambda *args: self.time(stage, func, *args)
@@ -1,4 +1,5 @@
 from ..errors import OperationFailure
+from .cache import parse_cache
 from .queries import QueryFilter
 from .field_walker import _no_val
 from ..types import (
@@ -66,11 +67,28 @@ class Projector:
     ARRAY_OP_ELEM_MATCH = 2
 
     def __init__(self, spec, qfilter):
+        self.matched = None
+
+        # Positional projection is parsed with the query, so the fields
+        # it matched in query are part of the spec.
+        positional = tuple(
+            _is_positional_match(qfilter.conditions, key.split(".$", 1)[0])
+            for key in spec
+            if ".$" in key
+        )
+        parsed = parse_cache.get(
+            "projection",
+            lambda spec, _: self.__parse(spec, qfilter),
+            spec,
+            positional,
+        )
+        self.__dict__.update(parsed)
+
+    def __parse(self, spec, qfilter):
         self.proj_with_id = True
         self.include_flag = None
         self.regular_field = []
         self.array_field = {}
-        self.matched = None
         self.position_path = None
 
         self.parser(spec, qfilter)
@@ -78,6 +96,15 @@ class Projector:
         if self.array_field and not self.regular_field:
             self.include_flag = True
 
+        return {
+            "proj_with_id": self.proj_with_id,
+            "include_flag": self.include_flag,
+            "regular_field": self.regular_field,
+            "array_field": self.array_field,
+            "position_path": self.position_path,
+            "array_op_type": self.array_op_type,
+        }
+
     def __call__(self, fieldwalker):
         """ """
         positioned = self.array_op_type == self.ARRAY_OP_POSITIONAL
@@ -91,7 +118,7 @@ class Projector:
 
             for path in self.array_field:
                 operation = self.array_field[path]
-                operation(fieldwalker)
+                operation(fieldwalker, self.matched)
 
             if self.proj_with_id:
                 fieldwalker.go("_id").get()
@@ -237,7 +264,7 @@ class Projector:
             self.include_flag = False
 
     def parse_slice(self, field_path, slicing):
-        def _slice(fieldwalker):
+        def _slice(fieldwalker, matched):
             if "$" in field_path:
                 return
 
@@ -266,7 +293,7 @@ class Projector:
 
         qfilter_ = QueryFilter(sub_v)
 
-        def _elemMatch(fieldwalker):
+        def _elemMatch(fieldwalker, matched):
             doc = fieldwalker.doc
             if field_path in doc and isinstance(doc[field_path], list):
                 for index, emb_doc in enumerate(doc[field_path]):
@@ -282,7 +309,7 @@ class Projector:
         return _elemMatch
 
     def parse_positional(self, field_path):
-        def _positional(fieldwalker):
+        def _positional(fieldwalker, matched):
             # Project first array doc's element
             fieldwalker.restart()
             for field in field_path.split("."):
@@ -294,9 +321,9 @@ class Projector:
                 if in_array:
                     # Reach array field
                     elem_count = len(node.value)
-                    matched_index = self.matched.split(".")[0]
+                    matched_index = matched.split(".")[0]
 
-                    if not self.matched.full_path.count(".") > 1:
+                    if not matched.full_path.count(".") > 1:
                         raise OperationFailure(
                             "Executor error during find command "
                             ":: caused by :: errmsg: "
@@ -307,7 +334,7 @@ class Projector:
 
                     if int(
                         matched_index
-                    ) >= elem_count and self.matched.full_path.startswith(
+                    ) >= elem_count and matched.full_path.startswith(
                         node.full_path
                     ):
                         raise OperationFailure(
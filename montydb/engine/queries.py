@@ -1,11 +1,14 @@
 import re
+import heapq
 from copy import deepcopy
 from datetime import datetime
 from collections.abc import Mapping
 
 from ..errors import OperationFailure
 
-from .field_walker import FieldWalker
+from . import keystring
+from .cache import parse_cache
+from .field_walker import FieldWalker, _no_val
 from .weighted import (
     Weighted,
     gravity,
@@ -30,68 +33,70 @@ def validate_sort_specifier(sort):
         raise OperationFailure("bad sort specification", code=2)
 
 
-def ordering(fieldwalkers, order, doc_type=None):
-    """ """
-    total = len(fieldwalkers)
-    pre_sect_stack = []
+# [] less than None, but greater than MinKey
+_EMPTY_ARRAY_SORT_KEY = bytes([keystring.UNDEFINED])
 
-    for path, direction in order.items():
-        validate_sort_specifier(direction)
 
-        is_reverse = direction == -1
-        value_stack = []
+def _sort_value(fieldwalker, path, is_reverse):
+    """Get the key of the field value that document sorted by"""
+    fieldwalker.go(path).get()
+    values = fieldwalker.value.iter_flat()
+    keys = [keystring.encode(val) for val in values]
+    if keys:
+        # list will firstly compare with other doc by it's smallest
+        # or largest member
+        return max(keys) if is_reverse else min(keys)
 
-        for index, fieldwalker in enumerate(fieldwalkers):
-            # get field value
-            fieldwalker = FieldWalker(fieldwalker.doc, doc_type).go(path).get()
-            values = list(fieldwalker.value.iter_flat())
-            if values:
-                value = tuple([Weighted(val) for val in values])
+    elif not fieldwalker.value.is_exists():
+        return keystring.encode(None)
 
-                if len(value):
-                    # list will firstly compare with other doc by it's smallest
-                    # or largest member
-                    value = max(value) if is_reverse else min(value)
+    else:
+        return _EMPTY_ARRAY_SORT_KEY
 
-            elif not fieldwalker.value.is_exists():
-                value = Weighted(None)
 
-            else:
-                # [] less than None
-                value = (0, ())
+def ordering_key(order, doc_type=None):
+    """Build a function that returns composite sort key of a fieldwalker
+
+    The key is the concatenation of each sort field's keystring, keys of
+    descending fields are inverted, so the whole key compares as bytes.
 
-            # read previous section
-            pre_sect = pre_sect_stack[index] if pre_sect_stack else 0
-            # inverse if in reverse mode
-            pre_sect = (total - pre_sect) if is_reverse else pre_sect
-            index = (total - index) if is_reverse else index
+    """
+    fields = []
+    for path, direction in order.items():
+        validate_sort_specifier(direction)
+        fields.append((path, direction == -1))
 
-            value_stack.append((pre_sect, value, index))
+    def sort_key(fieldwalker):
+        # Read sort fields with a new walker, so the one given is not
+        # disturbed (e.g. it's positional matches for projection).
+        walker = FieldWalker(fieldwalker.doc, doc_type)
+        key = b""
+        for path, is_reverse in fields:
+            value = _sort_value(walker, path, is_reverse)
+            key += keystring.invert(value) if is_reverse else value
+        return key
 
-        # sort docs
-        value_stack.sort(reverse=is_reverse)
+    return sort_key
 
-        ordereddoc = []
-        sect_stack = []
-        sect_id = -1
-        last_doc = None
-        for _, value, index in value_stack:
-            # restore if in reverse mode
-            index = (total - index) if is_reverse else index
-            ordereddoc.append(fieldwalkers[index])
 
-            # define section
-            # maintain the sorting result in next level sorting
-            if not value == last_doc:
-                sect_id += 1
-            sect_stack.append(sect_id)
-            last_doc = value
+def ordering(fieldwalkers, order, doc_type=None):
+    """Sort fieldwalkers by `order`, equal ones keep the input order"""
+    return sorted(fieldwalkers, key=ordering_key(order, doc_type))
 
-        # save result for next level sorting
-        fieldwalkers = ordereddoc
-        pre_sect_stack = sect_stack
 
-    return fieldwalkers
+def ordering_top(fieldwalkers, order, count, doc_type=None):
+    """Get the first `count` fieldwalkers in the result of `ordering`
+
+    Only `count` candidates are kept in a bounded heap while consuming the
+    iterable `fieldwalkers`, instead of sorting all of them.
+
+    """
+    sort_key = ordering_key(order, doc_type)
+    candidates = (
+        (sort_key(fieldwalker), index, fieldwalker)
+        for index, fieldwalker in enumerate(fieldwalkers)
+    )
+    return [fieldwalker for _, _, fieldwalker in heapq.nsmallest(count, candidates)]
 
 
 class LogicBox(list):
@@ -245,9 +250,10 @@ class QueryFilter:
             "$regex": parse_regex,
         }
 
-        # Start parsing query object
-        self.conditions = self.parser(spec)
+        # Start parsing query object, or reuse the result of same spec
+        self.conditions, self.__plan = parse_cache.get("query", self.__parse, spec)
         self.__fieldwalker = None
+        self.__doc = None
 
         # ready to be called.
 
@@ -264,13 +270,33 @@ class QueryFilter:
             doc (dict): Document received from database.
 
         """
-        self.__fieldwalker = FieldWalker(doc, doc_type)
-        return all(cond(self.__fieldwalker) for cond in self.conditions)
+        try:
+            matched = self.__plan(doc, doc_type or type(doc))
+        except _ArrayFound:
+            # Arrays need to be walked by `FieldWalker`
+            pass
+        else:
+            self.__fieldwalker = None
+            self.__doc = (doc, doc_type)
+            return matched
+
+        fieldwalker = FieldWalker(doc, doc_type)
+        self.__doc = None
+        self.__fieldwalker = fieldwalker
+        return all(cond(fieldwalker) for cond in self.conditions)
 
     @property
     def fieldwalker(self):
+        if self.__fieldwalker is None and self.__doc is not None:
+            # Document was filtered by query plan, no array was walked
+            # so there is no positional match to keep.
+            self.__fieldwalker = FieldWalker(*self.__doc)
         return self.__fieldwalker
 
+    def __parse(self, spec):
+        conditions = self.parser(spec)
+        return conditions, compile_plan(conditions)
+
     def parser(self, spec):
         """Top-level parser"""
 
@@ -397,6 +423,223 @@ class QueryFilter:
                 raise OperationFailure(f"unknown operator: {op}")
 
 
+"""
+Query Plan
+"""
+
+
+class _ArrayFound(Exception):
+    """Query plan found an array in document on the query path"""
+
+
+class _ValueView:
+    """`FieldValues` alike, for one field value which is not an array"""
+
+    __slots__ = ("value", "_value_iter")
+
+    def __init__(self, value):
+        self.value = value
+        self._value_iter = self.iter_full
+
+    def is_exists(self):
+        return self.value is not _no_val
+
+    def null_or_missing(self):
+        return self.value is _no_val or self.value is None
+
+    def iter_full(self):
+        if self.value is not _no_val:
+            yield self.value
+
+    iter_plain = iter_flat = iter_full
+
+    def iter_arrays(self):
+        return iter(())
+
+    iter_elements = iter_arrays
+
+    def change_iter(self, func):
+        self._value_iter = func
+
+    def __iter__(self):
+        return self._value_iter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._value_iter = self.iter_full
+
+
+class _ValueWalker:
+    """`FieldWalker` alike, for operators to read a field value"""
+
+    __slots__ = ("value", "doc_type")
+
+    def __init__(self, value, doc_type):
+        self.value = _ValueView(value)
+        self.doc_type = doc_type
+
+
+def _read_path(doc, fields, map_cls):
+    value = doc
+    for field in fields:
+        if isinstance(value, map_cls):
+            try:
+                value = value[field]
+            except KeyError:
+                return _no_val
+        elif isinstance(value, list):
+            raise _ArrayFound
+        else:
+            return _no_val
+
+    if isinstance(value, list):
+        raise _ArrayFound
+    return value
+
+
+def compile_plan(logic_box):
+    """Compile parsed query conditions into a query plan
+
+    The plan is a function `plan(doc, map_cls)` that reads document fields
+    directly, and gives the same result as calling the conditions with
+    a `FieldWalker`. If an array is found on any query path, `_ArrayFound`
+    is raised and the document should be filtered by `FieldWalker`.
+
+    Args:
+        logic_box (LogicBox): Conditions parsed by `QueryFilter`.
+
+    """
+    theme = logic_box.theme
+
+    if theme in ("$and", "$or", "$nor"):
+        plans = [compile_plan(cond) for cond in logic_box]
+        if theme == "$and" and len(plans) == 1:
+            return plans[0]
+
+        def _logic(doc, map_cls):
+            results = (plan(doc, map_cls) for plan in plans)
+            if theme == "$and":
+                return all(results)
+            if theme == "$or":
+                return any(results)
+            return not any(results)
+
+        return _logic
+
+    fields = theme.split(".")
+    predicates = [_compile_op(op) for op in logic_box]
+
+    if len(predicates) == 1:
+        predicate = predicates[0]
+
+        def _field(doc, map_cls):
+            return predicate(_read_path(doc, fields, map_cls), map_cls)
+
+    else:
+
+        def _field(doc, map_cls):
+            value = _read_path(doc, fields, map_cls)
+            return all(pred(value, map_cls) for pred in predicates)
+
+    return _field
+
+
+def _compile_op(op):
+    if not isinstance(op, LogicBox):
+        compiler = _op_compilers.get(op.__name__)
+        predicate = compiler and compiler(op)
+        if predicate is not None:
+            return predicate
+
+    return _generic_op(op)
+
+
+def _generic_op(op):
+    def _op(value, map_cls):
+        return op(_ValueWalker(value, map_cls))
+
+    return _op
+
+
+def _compile_eq(op):
+    query = op._keep()
+    if (
+        query is None
+        or is_duckument_type(query)
+        or isinstance(query, bson.Decimal128)
+    ):
+        return None
+
+    def _eq(value, map_cls):
+        if value is _no_val:
+            return False
+        if isinstance(value, bson.Decimal128):
+            value = _cmp_decimal(value)
+        return value == query and _is_comparable(value, query)
+
+    return _eq
+
+
+def _compile_ne(op):
+    _eq = _compile_eq(op)
+    if _eq is None:
+        return None
+
+    def _ne(value, map_cls):
+        return not _eq(value, map_cls)
+
+    return _ne
+
+
+def _compile_exists(op):
+    exists = bool(op._keep())
+
+    def _exists(value, map_cls):
+        return (value is not _no_val) == exists
+
+    return _exists
+
+
+# Type weights of values that can be compared with Python operators
+# directly, same as comparing their `Weighted`.
+_plain_weights = {int: 2, float: 2, str: 3}
+
+
+def _compile_range(compare):
+    def compiler(op):
+        query = op._keep()
+        weight = _plain_weights.get(type(query))
+        if weight is None or query != query:  # NaN
+            return None
+
+        generic = _generic_op(op)
+
+        def _range(value, map_cls):
+            if value is _no_val:
+                return False
+            value_weight = _plain_weights.get(type(value))
+            if value_weight is None:
+                return generic(value, map_cls)
+            return value_weight == weight and compare(value, query)
+
+        return _range
+
+    return compiler
+
+
+_op_compilers = {
+    "_eq": _compile_eq,
+    "_ne": _compile_ne,
+    "_exists": _compile_exists,
+    "_gt": _compile_range(lambda value, query: value > query),
+    "_gte": _compile_range(lambda value, query: value >= query),
+    "_lt": _compile_range(lambda value, query: value < query),
+    "_lte": _compile_range(lambda value, query: value <= query),
+}
+
+
 def _is_expression_obj(sub_spec):
     return is_duckument_type(sub_spec) and next(iter(sub_spec)).startswith("$")
 
@@ -616,7 +859,39 @@ def parse_lte(query):
     return _lte
 
 
-def _in_match(fieldwalker, query):
+def _in_hash_sets(query):
+    """Helper function for $in and $nin, put hashable values into sets
+
+    Values that equal to each other only if they are same type, or both are
+    numbers, are put into a set by their type. Numbers of Python types are
+    compared by their exact values, same as `_eq_match`, so they all share
+    one set.
+
+    Returns a dict of value type to set, and a list of rest values.
+
+    """
+    numbers = set()
+    hash_sets = {
+        int: numbers,
+        float: numbers,
+        bson.Int64: numbers,
+        bool: set(),
+        str: set(),
+        datetime: set(),
+        bson.ObjectId: set(),
+    }
+    rest = []
+    for q in query:
+        values = hash_sets.get(type(q))
+        if values is None or q != q:  # NaN never equal to NaN
+            rest.append(q)
+        else:
+            values.add(q)
+
+    return hash_sets, rest
+
+
+def _in_match(fieldwalker, hash_sets, query):
     """Helper function for $in and $nin"""
     q_regex = []
     q_value = []
@@ -631,6 +906,17 @@ def _in_match(fieldwalker, query):
         else:
             q_value.append(q)
 
+    numbers = hash_sets[int]
+    for value in fieldwalker.value:
+        values = hash_sets.get(type(value))
+        if values is not None:
+            if value in values:
+                return True
+        elif numbers and isinstance(value, bson.Decimal128):
+            value = _cmp_decimal(value)
+            if any(value == q for q in numbers):
+                return True
+
     for q in q_value:
         if _eq_match(fieldwalker, q):
             return True
@@ -648,9 +934,11 @@ def parse_in(query):
     if any(_is_expression_obj(q) for q in query):
         raise OperationFailure("cannot nest $ under $in")
 
+    hash_sets, rest = _in_hash_sets(query)
+
     @keep(query)
     def _in(fieldwalker):
-        return _in_match(fieldwalker, query)
+        return _in_match(fieldwalker, hash_sets, rest)
 
     return _in
 
@@ -662,9 +950,11 @@ def parse_nin(query):
     if any(_is_expression_obj(q) for q in query):
         raise OperationFailure("cannot nest $ under $nin")
 
+    hash_sets, rest = _in_hash_sets(query)
+
     @keep(query)
     def _nin(fieldwalker):
-        return not _in_match(fieldwalker, query)
+        return not _in_match(fieldwalker, hash_sets, rest)
 
     return _nin
 
@@ -689,6 +979,7 @@ def parse_all(query):
         for q in query:
             if not (is_duckument_type(q) and next(iter(q)) == "$elemMatch"):
                 raise OperationFailure("$all/$elemMatch has to be consistent")
+        queryfilters = [QueryFilter(q["$elemMatch"]) for q in query]
     else:
         go_match = False
         for q in query:
@@ -698,8 +989,7 @@ def parse_all(query):
     @keep(query)
     def _all(fieldwalker):
         if go_match:
-            for q in query:
-                queryfilter = QueryFilter(q["$elemMatch"])
+            for queryfilter in queryfilters:
                 doc_type = fieldwalker.doc_type
                 for value in fieldwalker.value.iter_arrays():
                     if not any(queryfilter(v, doc_type) for v in value):
@@ -718,11 +1008,11 @@ def parse_elemMatch(query):
     # (NOTE) $elemMatch in MontyDB may require document input to proceed
     #        further filter error.OperationFailure check, here we put one
     #        fake doc {}
-    QueryFilter(query)({})
+    queryfilter = QueryFilter(query)
+    queryfilter({})
 
     @keep(query)
     def _elemMatch(fieldwalker):
-        queryfilter = QueryFilter(query)
         doc_type = fieldwalker.doc_type
         for elem in fieldwalker.value.iter_elements():
             if queryfilter(elem, doc_type):
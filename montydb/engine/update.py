@@ -5,6 +5,7 @@ from ..errors import WriteError
 
 from .field_walker import FieldWalker, FieldWriteError, is_conflict
 from .weighted import Weighted, _cmp_decimal
+from .cache import parse_cache
 from .queries import QueryFilter, ordering
 from ..types import (
     bson,
@@ -47,7 +48,7 @@ class Updator:
             "$mul": parse_mul,
             "$rename": parse_rename,
             "$set": parse_set,
-            "$setOnInsert": self.parse_set_on_insert,
+            "$setOnInsert": parse_set,
             "$unset": parse_unset,
             "$currentDate": parse_currentDate,
             # array update ops
@@ -65,23 +66,36 @@ class Updator:
             # $sort             implemented in Eacher
         }
 
+        parsed = parse_cache.get("update", self.__parse, spec, array_filters)
+        self.__dict__.update(parsed)
+        self.__fieldwalker = None
+
+    def __repr__(self):
+        pass
+
+    def __parse(self, spec, array_filters):
         self.fields_to_update = []
+        # fields of $setOnInsert
+        self.insert_only = set()
         self.array_filters = self.array_filter_parser(array_filters or [])
         # sort by key (operator)
         self.operations = OrderedDict(sorted(self.parser(spec).items()))
-        self.__insert = None
-        self.__fieldwalker = None
 
-    def __repr__(self):
-        pass
+        return {
+            "fields_to_update": self.fields_to_update,
+            "insert_only": self.insert_only,
+            "array_filters": self.array_filters,
+            "operations": self.operations,
+        }
 
     def __call__(self, fieldwalker, do_insert=False):
         """Update document and return a bool value indicate changed or not"""
         self.__fieldwalker = fieldwalker
-        self.__insert = do_insert
 
         with fieldwalker:
-            for operator in self.operations.values():
+            for field, operator in self.operations.items():
+                if field in self.insert_only and not do_insert:
+                    continue
                 operator(fieldwalker)
 
             return fieldwalker.commit()
@@ -147,6 +161,8 @@ class Updator:
                 update_stack[field] = self.update_ops[op](
                     field, value, self.array_filters
                 )
+                if op == "$setOnInsert":
+                    self.insert_only.add(field)
 
                 self.check_conflict(field)
                 if op == "$rename":
@@ -172,14 +188,6 @@ class Updator:
 
         self.fields_to_update.append(field)
 
-    def parse_set_on_insert(self, field, value, array_filters):
-        @keep(value)
-        def _set_on_insert(fieldwalker):
-            if self.__insert:
-                parse_set(field, value, array_filters)(fieldwalker)
-
-        return _set_on_insert
-
 
 def parse_inc(field, value, array_filters):
     if not is_numeric_type(value):
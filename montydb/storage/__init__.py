@@ -1,8 +1,13 @@
 
 import os
+import math
 from abc import abstractmethod
+from collections.abc import Mapping
 from ..types import ConfigParser
 from ..types import bson
+from ..engine import keystring
+from ..engine.index import ID_INDEX_NAME
+from ..engine.planner import IDHACK, plan_query
 
 
 class StorageError(Exception):
@@ -10,7 +15,17 @@ class StorageError(Exception):
 
 
 class StorageDuplicateKeyError(StorageError):
-    """Raise when an insert or update fails due to a duplicate key error."""
+    """Raise when an insert or update fails due to a duplicate key error.
+
+    Args:
+        index (str): Name of the unique index that has the key, `_id_` by
+            default.
+
+    """
+
+    def __init__(self, index=ID_INDEX_NAME):
+        super().__init__(index)
+        self.index = index
 
 
 class AbstractStorage:
@@ -233,15 +248,140 @@ class AbstractCollection:
     def delete_many(self):
         return NotImplemented
 
+    def index_create(self, name, keys, unique=False):
+        """Create a secondary index
+
+        Optional, storages that don't support secondary indexes ignore it,
+        except a `unique` one, which they can't enforce, so raise
+        `NotImplementedError`.
+        `keys` is a list of (field path, direction) pairs. If `unique`, no
+        two documents may have the same entry key, which should be checked
+        in every write, and `StorageDuplicateKeyError` raised with the index
+        name. So does when building the index on existing duplicates.
+        """
+        if unique:
+            raise NotImplementedError(
+                f"{self._database._storage.nice_name()} storage does not support "
+                "unique indexes"
+            )
+
+    def index_drop(self, name):
+        """Drop a secondary index
+
+        Optional, only called with the name of an existing index.
+        """
+
+    def index_list(self):
+        """Secondary index names and their info, `_id` index excluded
+
+        Optional, should return a `dict` of index name to a `dict` that has
+        at least the index's `key`, the list of (field path, direction) pairs,
+        and `unique` set to True for a unique index.
+        """
+        return {}
+
+
+def _id_key_values(value):
+    """All `_id` values that equal to `value` in query, or None if unknown
+
+    Only values that have a finite number of equivalents are accepted. With
+    BSON, numbers are not accepted since a `Decimal128` has many encodings
+    for the same number.
+
+    """
+    value_type = type(value)
+    if value_type is str or isinstance(value, bson.ObjectId):
+        return [value]
+    if bson.bson_used:
+        return None
+
+    if value_type is int:
+        equivalent = float(value)
+        return [value, equivalent] if equivalent == value else [value]
+    if value_type is float and math.isfinite(value):
+        return [value, int(value)] if value.is_integer() else [value]
+
+    return None
+
+
+def _id_lookup_keys(spec):
+    """Encoded `_id` keys that may match the filter, or None if any could
+
+    If the filter has `_id` equality or `$in` condition at top level,
+    documents could be fetched by key instead of scanning whole collection.
+    Rest of the filter is applied to fetched documents as usual. Keys are in
+    `_id` order, so documents are fetched in the same order on every storage.
+
+    """
+    if not isinstance(spec, Mapping) or "_id" not in spec:
+        return None
+
+    condition = spec["_id"]
+    if isinstance(condition, Mapping):
+        if "$eq" in condition:
+            values = [condition["$eq"]]
+        elif isinstance(condition.get("$in"), list):
+            values = condition["$in"]
+        else:
+            return None
+    else:
+        values = [condition]
+
+    equivalents = []
+    for value in values:
+        found = _id_key_values(value)
+        if found is None:
+            return None
+        equivalents += found
+
+    keys = dict()
+    for equivalent in sorted(equivalents, key=keystring.encode):
+        keys[bson.id_encode(equivalent)] = None
+
+    return list(keys)
+
 
 class AbstractCursor:
 
     def __init__(self, collection, subject):
         self._collection = collection
+        self._spec = subject._spec
+        self._hint = subject._hint
+        # Execution stats to collect, only when being explained
+        self._stats = subject._stats
+
+    def _lookup_keys(self):
+        """Encoded `_id` keys to fetch documents by, or None to scan all"""
+        return _id_lookup_keys(self._spec)
+
+    def _plan(self):
+        """Plan how to fetch documents, see `montydb.engine.planner`"""
+        id_keys = self._lookup_keys()
+        if id_keys is not None and self._hint is None:
+            indexes = {}  # No need to read the index catalog
+        else:
+            indexes = self._collection.index_list()
+
+        plan = plan_query(self._spec, id_keys, indexes, self._hint)
+        if self._stats is not None:
+            self._stats.plan = plan
+            if plan.stage == IDHACK:
+                self._stats.keys_examined += len(plan.keys)
+        return plan
+
+    def _keys_examined(self, count):
+        if self._stats is not None:
+            self._stats.keys_examined += count
 
     def _decode_doc(self, doc):
         """
         """
+        stats = self._stats
+        if stats is not None:
+            stats.docs_examined += 1
+            return stats.time(
+                "decode", bson.document_decode, doc, self._collection.coptions
+            )
         return bson.document_decode(
             doc,
             codec_options=self._collection.coptions
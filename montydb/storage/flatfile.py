@@ -4,6 +4,7 @@ import shutil
 from collections import OrderedDict
 from itertools import islice
 
+from ..engine.planner import IDHACK
 from ..types import unicode_, bson
 from . import (
     AbstractStorage,
@@ -16,16 +17,43 @@ from . import (
 
 
 FLATFILE_DB_EXT = ".json"
+FLATFILE_LOG_EXT = ".jsonl"
 
 
-def _read_pretty(file_path):
+def _iter_pretty(file_path):
+    """Stream documents from the JSON file one at a time
+
+    Yields `(serialized, doc)` pairs, `serialized` is the document's JSON text,
+    or None if the document was not stored on its own lines.
+
+    """
     with open(file_path, "r") as fp:
-        lines = [line.strip() for line in fp.readlines()]
-        if lines:
-            serialized = "".join(lines)
-            return bson.json_loads(serialized)
-        else:
-            return []
+        buffer = ""
+        for line in fp:
+            line = line.strip()
+            if not buffer and line in ("[", "]", "[]", ""):
+                continue
+
+            buffer += line
+            serialized = buffer.rstrip(",")
+            if not serialized.endswith(("}", "]")):
+                continue
+            try:
+                doc = bson.json_loads(serialized)
+            except ValueError:
+                # Document spans more lines
+                continue
+
+            buffer = ""
+            if isinstance(doc, list):
+                for d in doc:
+                    yield None, d
+            else:
+                yield serialized, doc
+
+        if buffer:
+            # Raise the decode error of the broken document
+            bson.json_loads(buffer)
 
 
 def _write_pretty(file_path, documents):
@@ -37,21 +65,96 @@ def _write_pretty(file_path, documents):
         fp.write("[\n{}\n]".format(",\n".join(serialized)))
 
 
+def _read_journal(file_path):
+    """Yield change records from the JSON-lines journal
+
+    Each record is either `{"put": document}` or `{"del": _id}`, yielded with
+    the file offset where its line ends.
+
+    """
+    end = 0
+    with open(file_path, "rb") as fp:
+        for line in fp:
+            if not line.endswith(b"\n"):
+                # Incomplete record from an interrupted append, all records
+                # before it are intact.
+                break
+            end += len(line)
+            yield end, bson.json_loads(line.decode("utf-8"))
+
+
+def _journal_line(op, value):
+    if op == "put":
+        doc = bson.json_dumps(bson.document_decode(value))
+        return f'{{"put": {doc}}}\n'
+    else:
+        return bson.json_dumps({"del": value}) + "\n"
+
+
 class FlatFileKVEngine:
+    """Per collection
+
+    The pretty JSON file is the compacted collection, changes since then are
+    appended into a journal as JSON-lines, and replayed on load. The journal
+    is compacted into the JSON file when it grows larger than `journal_ratio`
+    times of the JSON file, or when the storage is closed.
+
+    """
 
     def __init__(self, file_path, conn_config):
         """
         """
         self.file_path = file_path
+        self.journal_path = os.path.splitext(file_path)[0] + FLATFILE_LOG_EXT
 
         self.__conn_config = conn_config
-        self.__cache = OrderedDict()
+        self.__cache = None
+        self.__pending = []
+        self.__base_size = 0
+        self.__journal_size = 0
         self.modified_count = 0
 
+    def __load(self):
+        """Load documents on first access
+
+        The JSON file is parsed one document at a time. Without BSON, the
+        stored JSON text of each document is kept as its encoded form instead
+        of being re-encoded.
+
+        """
+        cache = OrderedDict()
+
         if os.path.isfile(self.file_path):
-            for doc in _read_pretty(self.file_path):
+            for serialized, doc in _iter_pretty(self.file_path):
                 b_id = bson.id_encode(doc["_id"])
-                self.__cache[b_id] = bson.document_encode(doc)
+                if serialized is None or bson.bson_used:
+                    cache[b_id] = bson.document_encode(doc)
+                else:
+                    cache[b_id] = serialized.encode()
+            self.__base_size = os.path.getsize(self.file_path)
+
+        if os.path.isfile(self.journal_path):
+            end = 0
+            for end, record in _read_journal(self.journal_path):
+                if "put" in record:
+                    doc = record["put"]
+                    b_id = bson.id_encode(doc["_id"])
+                    cache[b_id] = bson.document_encode(doc)
+                else:
+                    cache.pop(bson.id_encode(record["del"]), None)
+            if os.path.getsize(self.journal_path) > end:
+                # Cut off the incomplete record, or new records would be
+                # appended onto its line.
+                os.truncate(self.journal_path, end)
+            self.__journal_size = end
+
+        return cache
+
+    @property
+    def _documents(self):
+        if self.__cache is None:
+            self.__cache = self.__load()
+        return self.__cache
 
     @classmethod
     def touch(cls, file_path):
@@ -61,30 +164,62 @@ class FlatFileKVEngine:
 
     @property
     def document_count(self):
-        return len(self.__cache)
+        return len(self._documents)
 
     def flush(self):
-        _write_pretty(self.file_path, self.__cache)
+        """Append cached changes into journal, compact if it's too large"""
+        if self.__pending:
+            lines = "".join(_journal_line(*change) for change in self.__pending)
+            with open(self.journal_path, "a") as fp:
+                fp.write(lines)
+            self.__journal_size += len(lines)
+            self.__pending = []
+
         self.modified_count = 0
 
+        ratio = self.__conn_config["journal_ratio"]
+        if self.__journal_size > self.__base_size * ratio:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the JSON file with all documents and clear the journal"""
+        temp_path = self.file_path + ".tmp"
+        _write_pretty(temp_path, self._documents)
+        os.replace(temp_path, self.file_path)
+        if os.path.isfile(self.journal_path):
+            os.remove(self.journal_path)
+
+        self.__base_size = os.path.getsize(self.file_path)
+        self.__journal_size = 0
+        self.__pending = []
+        self.modified_count = 0
+
+    def close(self):
+        self.flush()
+        if self.__journal_size:
+            self.compact()
+
     def read(self):
-        return self.__cache
+        return self._documents
 
     def _id_existed(self, id):
-        if id in self.__cache:
+        if id in self._documents:
             return True
 
     def write(self, documents):
         """`documents` should be `OrderedDict` type"""
         self.modified_count += len(documents)
-        self.__cache.update(documents)
+        self._documents.update(documents)
+        self.__pending.extend(("put", doc) for doc in documents.values())
 
         if self.modified_count > self.__conn_config["cache_modified"]:
             self.flush()
 
-    def delete(self, doc_id):
-        self.modified_count += 1
-        del self.__cache[doc_id]
+    def delete(self, doc_ids):
+        for doc_id in doc_ids:
+            del self._documents[bson.id_encode(doc_id)]
+            self.__pending.append(("del", doc_id))
+            self.modified_count += 1
 
         if self.modified_count > self.__conn_config["cache_modified"]:
             self.flush()
@@ -112,21 +247,24 @@ class FlatFileStorage(AbstractStorage):
         return "flatfile"
 
     @classmethod
-    def config(cls, cache_modified=0, **kwargs):
+    def config(cls, cache_modified=0, journal_ratio=1.0, **kwargs):
         """
 
         Args:
             cache_modified (int): Default 0
+            journal_ratio (float): Compact journal into collection file when
+                it's larger than this ratio of the file size. Default 1.0
 
         """
         return {
             "cache_modified": int(cache_modified),
+            "journal_ratio": float(journal_ratio),
         }
 
     def close(self):
         for db in self._cache_manager:
             for col in self._cache_manager[db]:
-                self._cache_manager[db][col].flush()
+                self._cache_manager[db][col].close()
         self._init_cache_manager()
         self.is_opened = False
 
@@ -179,9 +317,14 @@ class FlatFileDatabase(AbstractDatabase):
             self._storage.database_create(self._name)
         FlatFileKVEngine.touch(self._col_path(col_name))
 
+    def _log_path(self, col_name):
+        return os.path.join(self._db_path, col_name) + FLATFILE_LOG_EXT
+
     def collection_drop(self, col_name):
         if self.collection_exists(col_name):
             os.remove(self._col_path(col_name))
+        if os.path.isfile(self._log_path(col_name)):
+            os.remove(self._log_path(col_name))
         if col_name in self._cache_manager:
             del self._cache_manager[col_name]
 
@@ -189,7 +332,8 @@ class FlatFileDatabase(AbstractDatabase):
         if not self.database_exists():
             return []
         return [os.path.splitext(name)[0]
-                for name in os.listdir(unicode_(self._db_path))]
+                for name in os.listdir(unicode_(self._db_path))
+                if name.endswith(FLATFILE_DB_EXT)]
 
 
 FlatFileStorage.contractor_cls = FlatFileDatabase
@@ -267,11 +411,10 @@ class FlatFileCollection(AbstractCollection):
         self._flatfile.write(_docs)
 
     def delete_one(self, id):
-        self._flatfile.delete(bson.id_encode(id))
+        self._flatfile.delete([id])
 
     def delete_many(self, ids):
-        for id in ids:
-            self._flatfile.delete(bson.id_encode(id))
+        self._flatfile.delete(ids)
 
 
 FlatFileDatabase.contractor_cls = FlatFileCollection
@@ -290,7 +433,15 @@ class FlatFileCursor(AbstractCursor):
 
     def query(self, max_scan):
         cache = self._flatfile.read()
-        docs = (self._decode_doc(doc) for doc in cache.values())
+        plan = self._plan()
+        if plan.stage == IDHACK:
+            keys = plan.keys
+        else:
+            # Snapshot keys, documents may be written while being pulled.
+            keys = list(cache)
+        stored = (cache[key] for key in keys if key in cache)
+
+        docs = (self._decode_doc(doc) for doc in stored)
         if not max_scan:
             return docs
         else:
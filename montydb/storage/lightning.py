@@ -1,9 +1,16 @@
 
 import os
+import json
 import lmdb
 import shutil
+import threading
+import contextlib
 from itertools import islice
+from collections import OrderedDict
 
+from ..engine.index import ID_INDEX_NAME, index_keys
+from ..engine.planner import IDHACK, IXSCAN
+from ..errors import WriteError
 from ..types import unicode_, to_bytes, bson
 from . import (
     AbstractStorage,
@@ -17,71 +24,575 @@ from . import (
 
 LMDB_DB_EXT = ".mdb"
 
+DEFAULT_BATCH_SIZE = 1000
+
+# Named databases of an index catalog and each index, beside `documents`
+INDEX_CATALOG = to_bytes("indexes")
+INDEX_DB_PREFIX = "index:"
+MAX_INDEXES = 64
+
+
+def _index_dbname(name):
+    return to_bytes(INDEX_DB_PREFIX + name)
+
+
+def _truncated_range(start, stop, size):
+    """Entry key range for keys that truncated to `size`
+
+    A truncated key is not larger than its full key, and not smaller than
+    the truncated `start`. So the range still covers all keys in range.
+
+    """
+    if len(stop) > size:
+        stop = stop[:size] + b"\xff"
+    return start[:size], stop
+
+
+class _StaleIndexes(Exception):
+    """Index catalog has changed, index databases have to be opened"""
+
+
+class _MapGuard:
+    """Transactions share the guard, resizing the map takes it exclusively
+
+    `Environment.set_mapsize` re-maps the file, so there must be no other
+    transaction alive in this process while doing so.
+
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._shared = 0
+
+    @contextlib.contextmanager
+    def shared(self):
+        with self._cond:
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._shared -= 1
+                if not self._shared:
+                    self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        with self._cond:
+            self._cond.wait_for(lambda: not self._shared)
+            yield
+
+
+_map_guard = _MapGuard()
+
+
+class LMDBEnvironmentPool:
+    """Keep LMDB environments opened across operations
+
+    An environment can only be opened once per process, so environments are
+    shared by every storage instance in this process, and keyed by collection
+    file path. Each storage instance that has used an environment is recorded
+    as an owner, the environment is closed after its last owner released it.
+
+    Named database handles are also kept with their environment, since a
+    database should only be opened once per environment.
+
+    """
+
+    def __init__(self):
+        self._pool = dict()
+        self._lock = threading.Lock()
+        # LMDB does not allow opening databases in concurrent transactions
+        self._open_lock = threading.Lock()
+
+    def acquire(self, owner, path, options):
+        with self._lock:
+            entry = self._pool.get(path)
+            if entry is None:
+                env = lmdb.open(path, **options)
+                dbs = {
+                    name: env.open_db(name)
+                    for name in (LMDBKVEngine.dbname, INDEX_CATALOG)
+                }
+                entry = self._pool[path] = (env, dbs, set())
+
+            env, dbs, owners = entry
+            owners.add(owner)
+
+        return env, dbs[LMDBKVEngine.dbname]
+
+    def database(self, path, name):
+        """Get an opened named database of an acquired environment"""
+        with self._lock:
+            return self._pool[path][1].get(name)
+
+    def open_database(self, path, name, txn=None, **kwargs):
+        """Open a named database of an acquired environment if not yet
+
+        Must not be called within a write transaction without passing it as
+        `txn`, or it will wait for the write lock forever.
+
+        """
+        with self._open_lock:
+            db = self.database(path, name)
+            if db is None:
+                with self._lock:
+                    env = self._pool[path][0]
+                db = env.open_db(name, txn=txn, **kwargs)
+                with self._lock:
+                    self._pool[path][1][name] = db
+        return db
+
+    def forget_database(self, path, name):
+        """Forget a named database that has been dropped"""
+        with self._lock:
+            self._pool[path][1].pop(name, None)
+
+    def _select(self, path):
+        if path is None:
+            return list(self._pool)
+        prefix = os.path.join(path, "")
+        return [p for p in self._pool if p == path or p.startswith(prefix)]
+
+    def release(self, owner, path=None):
+        """Release environments used by the owner
+
+        Args:
+            owner (object): Whom was acquired the environments.
+            path (str, optional): Only release the environment of this
+                collection file, or of collection files under this directory.
+                Release all environments of the owner if not given.
+
+        """
+        envs = list()
+        with self._lock:
+            for p in self._select(path):
+                env, _, owners = self._pool[p]
+                owners.discard(owner)
+                if not owners:
+                    del self._pool[p]
+                    envs.append(env)
+
+        for env in envs:
+            env.close()
+
+    def close(self, path):
+        """Close environments regardless of owners, e.g. before removing files
+
+        Args:
+            path (str): Close the environment of this collection file, or of
+                collection files under this directory.
+
+        """
+        with self._lock:
+            envs = [self._pool.pop(p)[0] for p in self._select(path)]
+
+        for env in envs:
+            env.close()
+
+
+_environments = LMDBEnvironmentPool()
+
 
 class LMDBKVEngine:
-    """Per collection"""
+    """Per storage, environments are cached in `_environments`"""
 
     dbname = to_bytes("documents")
 
     def __init__(self, options=None):
         """
         """
-        opt = options or dict()
+        opt = dict(options or {})
+        self.max_map_size = opt.pop("max_map_size", 0)
         opt.update({
             "subdir": False,
-            "max_dbs": 1,
+            "max_dbs": MAX_INDEXES + 2,
         })
         self.opt = opt
-        self._path = None
+        self.stats = {"map_resizes": 0}
+        self._max_key_size = None
 
-    def set_path(self, path):
-        self._path = path
+    def open(self, path):
+        env, db = _environments.acquire(self, path, self.opt)
+        if self._max_key_size is None:
+            self._max_key_size = env.max_key_size()
+        return env, db
 
-    def open(self, readonly=None):
-        opt = self.opt.copy()
-        if readonly is not None:
-            opt["readonly"] = readonly
+    def close(self, path=None):
+        """Release environments that opened by this engine"""
+        _environments.release(self, path)
 
-        return lmdb.open(self._path, **opt)
+    def drop(self, path):
+        """Close environments of files that are about to be removed"""
+        _environments.close(path)
 
-    def iter_docs(self):
-        if not os.path.isfile(self._path):
-            return
+    def iter_docs(self, path, batch_size=None):
+        """Iterate encoded documents, read in batches
+
+        Each batch is read in its own short read transaction, so no read
+        transaction is held while documents are being consumed. The scan
+        stops at the last key when it starts, so documents inserted after
+        that are not returned, and each document is returned at most once.
+
+        """
+        if not os.path.isfile(path):
+            return iter(())
 
-        with self.open(readonly=True) as env:
-            db = env.open_db(self.dbname)
-            with env.begin(db, write=False) as txn:
+        env, db = self.open(path)
+        with _map_guard.shared(), env.begin(db, write=False) as txn:
+            cursor = txn.cursor()
+            stop_key = cursor.key() if cursor.last() else None
+
+        if stop_key is None:
+            return iter(())
+        return self._iter_docs(env, db, stop_key, batch_size or DEFAULT_BATCH_SIZE)
+
+    def _iter_docs(self, env, db, stop_key, batch_size):
+        last_key = None
+        found = True
+
+        while found:
+            batch = list()
+            with _map_guard.shared(), env.begin(db, write=False) as txn:
                 cursor = txn.cursor()
-                yield from cursor.iternext(keys=False, values=True)
+                if last_key is None:
+                    found = cursor.first()
+                else:
+                    found = cursor.set_range(last_key)
+                    if found and cursor.key() == last_key:
+                        found = cursor.next()
+
+                while found and len(batch) < batch_size:
+                    last_key = cursor.key()
+                    if last_key > stop_key:
+                        found = False
+                        break
+                    batch.append(cursor.value())
+                    found = cursor.next()
+
+            yield from batch
+
+    def get_docs(self, path, keys):
+        """Fetch encoded documents by encoded `_id` keys"""
+        if not os.path.isfile(path):
+            return []
+
+        env, db = self.open(path)
+        with _map_guard.shared(), env.begin(db, write=False) as txn:
+            docs = [txn.get(key) for key in keys]
+
+        return [doc for doc in docs if doc is not None]
+
+    def _grow(self, env, map_size):
+        """Double the map size, but not beyond `max_map_size` if set
+
+        Returns False if the map can not grow any further.
+
+        """
+        with _map_guard.exclusive():
+            current = env.info()["map_size"]
+            if current > map_size:
+                # Grown by other writer while we were waiting.
+                return True
+            if self.max_map_size and current >= self.max_map_size:
+                return False
+
+            new_size = current * 2
+            if self.max_map_size:
+                new_size = min(new_size, self.max_map_size)
+            env.set_mapsize(new_size)
+            self.stats["map_resizes"] += 1
+
+        return True
+
+    def _write_txn(self, path, job, items):
+        """Run `job(txn, items)` in a write transaction
+
+        If the map is full, the transaction is aborted and the map grows,
+        then the same items are passed to `job` again in a new transaction.
+        So does when the index catalog has been changed by other process,
+        after the new index databases are opened.
+
+        """
+        env, db = self.open(path)
+        items = iter(items)
+        consumed = list()
+
+        def replay():
+            yield from consumed
+            for item in items:
+                consumed.append(item)
+                yield item
+
+        while True:
+            map_size = env.info()["map_size"]
+            try:
+                with _map_guard.shared(), env.begin(db, write=True) as txn:
+                    return job(txn, replay())
+            except lmdb.MapFullError:
+                if not self._grow(env, map_size):
+                    raise
+            except _StaleIndexes:
+                self._open_indexes(path)
+
+    def _catalog(self, path, txn):
+        """Read index catalog, return (name, info) pairs in creation order"""
+        catalog = _environments.database(path, INDEX_CATALOG)
+        entries = list()
+        for name, value in txn.cursor(db=catalog):
+            entry = json.loads(value.decode("utf-8"))
+            info = entry["info"]
+            info["key"] = [tuple(key) for key in info["key"]]
+            entries.append((entry["seq"], name.decode("utf-8"), info))
+
+        return [(name, info) for _, name, info in sorted(entries)]
+
+    def _indexes(self, path, txn):
+        """Get (name, info, database) of each index in creation order
+
+        Raises `_StaleIndexes` if any index database has not been opened in
+        this process, which could not be done within a transaction.
+
+        """
+        indexes = list()
+        for name, info in self._catalog(path, txn):
+            index_db = _environments.database(path, _index_dbname(name))
+            if index_db is None:
+                raise _StaleIndexes()
+            indexes.append((name, info, index_db))
+
+        return indexes
+
+    def _open_indexes(self, path):
+        """Open index databases that listed in the catalog"""
+        env, db = self.open(path)
+        with _map_guard.shared(), env.begin(db, write=False) as txn:
+            names = [name for name, _ in self._catalog(path, txn)]
+
+        for name in names:
+            try:
+                with _map_guard.shared():
+                    _environments.open_database(
+                        path, _index_dbname(name), create=False, dupsort=True
+                    )
+            except lmdb.NotFoundError:
+                pass  # Dropped in the meantime
+
+    def _entries(self, doc, info):
+        """Entry keys of a document, truncated if too long for LMDB
+
+        A document with a truncated key is still in range when looked up
+        by `_truncated_range`.
+
+        """
+        max_key_size = self._max_key_size
+        return {key[:max_key_size] for key in index_keys(doc, info["key"])}
+
+    def _index(self, txn, indexes, id, doc, delete=False):
+        """Put or delete index entries of a decoded document"""
+        for _, info, index_db in indexes:
+            for key in self._entries(doc, info):
+                if delete:
+                    txn.delete(key, id, db=index_db)
+                else:
+                    txn.put(key, id, db=index_db)
+
+    def _conflict(self, txn, indexes, id, doc):
+        """Get the unique index that has other document on `doc`'s keys
+
+        Returns the index name, or None if there is no conflict.
 
-    def write(self, environment, pairs, overwrite=False):
-        if not os.path.isfile(self._path):
+        """
+        for name, info, index_db in indexes:
+            if not info.get("unique"):
+                continue
+            cursor = txn.cursor(db=index_db)
+            full_keys = None
+            for key in self._entries(doc, info):
+                if not cursor.set_key(key):
+                    continue
+                for other in cursor.iternext_dup():
+                    if other == id:
+                        continue
+                    if len(key) < self._max_key_size:
+                        return name
+                    # Truncated, compare with the other document's full keys
+                    if full_keys is None:
+                        full_keys = set(index_keys(doc, info["key"]))
+                    other_doc = bson.document_decode(txn.get(other))
+                    if full_keys.intersection(index_keys(other_doc, info["key"])):
+                        return name
+        return None
+
+    def write(self, path, pairs, overwrite=False):
+        if not os.path.isfile(path):
             return
 
-        dup = False
-        with environment as env:
-            db = env.open_db(self.dbname)
-            with env.begin(db, write=True) as txn:
-                for doc_id, encoded_doc in pairs:
-                    id = bson.id_encode(doc_id)
+        self.open(path)
+
+        def encode_ids(pairs):
+            # Lazily, so the writer knows which document is being written.
+            for doc_id, encoded_doc in pairs:
+                id = bson.id_encode(doc_id)
+                # `_id` is the key of document, and the value of index entries
+                if len(id) > self._max_key_size:
+                    raise WriteError(
+                        f"_id is too long for lightning storage, {len(id)} "
+                        f"bytes encoded, the limit is {self._max_key_size} bytes",
+                        code=17280,
+                    )
+                yield id, encoded_doc
+
+        def put(txn, pairs):
+            indexes = self._indexes(path, txn)
+            for id, encoded_doc in encode_ids(pairs):
+                if not indexes:
                     if not txn.put(id, encoded_doc, overwrite=overwrite):
-                        dup = True
-                        break
-        if dup:
-            raise StorageDuplicateKeyError()
-
-    def delete(self, environment, doc_ids):
-        if not os.path.isfile(self._path):
+                        return ID_INDEX_NAME
+                    continue
+
+                old_doc = txn.get(id)
+                if old_doc is not None and not overwrite:
+                    return ID_INDEX_NAME
+                doc = bson.document_decode(encoded_doc)
+                conflict = self._conflict(txn, indexes, id, doc)
+                if conflict:
+                    return conflict
+
+                txn.put(id, encoded_doc)
+                if old_doc is not None:
+                    old_doc = bson.document_decode(old_doc)
+                    self._index(txn, indexes, id, old_doc, delete=True)
+                self._index(txn, indexes, id, doc)
+            return None
+
+        # Documents written before the duplicate one are committed.
+        duplicate = self._write_txn(path, put, pairs)
+        if duplicate:
+            raise StorageDuplicateKeyError(duplicate)
+
+    def delete(self, path, doc_ids):
+        if not os.path.isfile(path):
             return
 
-        with environment as env:
-            db = env.open_db(self.dbname, reverse_key=False)
-            with env.begin(db, write=True) as txn:
-                cursor = txn.cursor()
-                for doc_id in doc_ids:
-                    id = bson.id_encode(doc_id)
-                    if cursor.set_key(id):
-                        cursor.delete()
+        def delete(txn, doc_ids):
+            indexes = self._indexes(path, txn)
+            cursor = txn.cursor()
+            for doc_id in doc_ids:
+                id = bson.id_encode(doc_id)
+                if cursor.set_key(id):
+                    if indexes:
+                        doc = bson.document_decode(cursor.value())
+                        self._index(txn, indexes, id, doc, delete=True)
+                    cursor.delete()
+
+        self._write_txn(path, delete, doc_ids)
+
+    def index_create(self, path, name, keys, unique=False):
+        """Create and build an index, then add it into the catalog"""
+        _, db = self.open(path)
+        dbname = _index_dbname(name)
+        # Opened (created) outside of the write transaction below, or it
+        # waits for the write lock that we are holding.
+        with _map_guard.shared():
+            index_db = _environments.open_database(path, dbname, dupsort=True)
+        catalog = _environments.database(path, INDEX_CATALOG)
+        info = {"key": list(keys)}
+        if unique:
+            info["unique"] = True
+
+        def build(txn, _):
+            seq = max(
+                (json.loads(value.decode("utf-8"))["seq"]
+                 for _, value in txn.cursor(db=catalog)),
+                default=-1,
+            ) + 1
+            txn.drop(index_db, delete=False)
+            indexes = [(name, info, index_db)]
+            for id, encoded_doc in txn.cursor(db=db):
+                doc = bson.document_decode(encoded_doc)
+                if self._conflict(txn, indexes, id, doc):
+                    raise StorageDuplicateKeyError(name)
+                self._index(txn, indexes, id, doc)
+
+            entry = {"seq": seq, "info": info}
+            txn.put(to_bytes(name), to_bytes(json.dumps(entry)), db=catalog)
+
+        try:
+            self._write_txn(path, build, [])
+        except StorageDuplicateKeyError:
+            self._write_txn(
+                path, lambda txn, _: txn.drop(index_db, delete=True), []
+            )
+            _environments.forget_database(path, dbname)
+            raise
+
+    def index_drop(self, path, name):
+        """Remove an index from the catalog and delete its database"""
+        self.open(path)
+        dbname = _index_dbname(name)
+        catalog = _environments.database(path, INDEX_CATALOG)
+
+        self._open_indexes(path)
+        index_db = _environments.database(path, dbname)
+
+        def drop(txn, _):
+            txn.delete(to_bytes(name), db=catalog)
+            if index_db is not None:
+                txn.drop(index_db, delete=True)
+
+        self._write_txn(path, drop, [])
+        _environments.forget_database(path, dbname)
+
+    def index_list(self, path):
+        if not os.path.isfile(path):
+            return OrderedDict()
+
+        env, db = self.open(path)
+        with _map_guard.shared(), env.begin(db, write=False) as txn:
+            return OrderedDict(self._catalog(path, txn))
+
+    def index_scan(self, path, name, ranges):
+        """Fetch encoded documents in entry key ranges of an index
+
+        Index entries and documents are read in one read transaction, so
+        they are from the same snapshot. Returns the documents and the
+        number of entries examined, or None if the index doesn't exist.
+
+        """
+        if not os.path.isfile(path):
+            return None
+
+        env, db = self.open(path)
+        while True:
+            try:
+                with _map_guard.shared(), env.begin(db, write=False) as txn:
+                    return self._index_scan(path, txn, name, ranges)
+            except _StaleIndexes:
+                self._open_indexes(path)
+
+    def _index_scan(self, path, txn, name, ranges):
+        index_db = next(
+            (index_db for name_, _, index_db in self._indexes(path, txn)
+             if name_ == name),
+            None
+        )
+        if index_db is None:
+            return None
+
+        cursor = txn.cursor(db=index_db)
+        keys = OrderedDict()
+        examined = 0
+        for start, stop in ranges:
+            start, stop = _truncated_range(start, stop, self._max_key_size)
+            found = cursor.set_range(start)
+            while found and cursor.key() < stop:
+                keys[cursor.value()] = None
+                examined += 1
+                found = cursor.next()
+
+        docs = [txn.get(key) for key in keys]
+        return [doc for doc in docs if doc is not None], examined
 
 
 class LMDBStorage(AbstractStorage):
@@ -103,19 +614,29 @@ class LMDBStorage(AbstractStorage):
         return "lightning"
 
     @classmethod
-    def config(cls, map_size=10485760, **kwargs):
+    def config(cls, map_size=10485760, max_map_size=0, **kwargs):
         """
         """
         return {
             "map_size": int(map_size),
+            "max_map_size": int(max_map_size),
         }
 
+    @property
+    def stats(self):
+        return dict(self._conn.stats)
+
     def database_create(self, db_name):
         if not os.path.isdir(self._db_path(db_name)):
             os.makedirs(self._db_path(db_name))
 
+    def close(self):
+        self._conn.close()
+        super().close()
+
     def database_drop(self, db_name):
         db_path = self._db_path(db_name)
+        self._conn.drop(db_path)
         if os.path.isdir(db_path):
             shutil.rmtree(db_path)
 
@@ -150,14 +671,13 @@ class LMDBDatabase(AbstractDatabase):
     def collection_create(self, col_name):
         if not self.database_exists():
             self._storage.database_create(self._name)
-        self._conn.set_path(self._col_path(col_name))
-        environment = self._conn.open()
-
-        return environment
+        self._conn.open(self._col_path(col_name))
 
     def collection_drop(self, col_name):
+        col_path = self._col_path(col_name)
+        self._conn.drop(col_path)
         if self.collection_exists(col_name):
-            os.remove(self._col_path(col_name))
+            os.remove(col_path)
 
     def collection_list(self):
         if not self.database_exists():
@@ -177,29 +697,25 @@ class LMDBCollection(AbstractCollection):
     def __init__(self, database, subject):
         super().__init__(database, subject)
         self._conn = database._conn
-        self._conn.set_path(database._col_path(self._name))
+        self._col_path = database._col_path(self._name)
 
     def _ensure_table(func):
         def make_table(self, *args, **kwargs):
-            environment = None
             if not self._database.collection_exists(self._name):
-                environment = self._database.collection_create(self._name)
-            return func(self, env=environment, *args, **kwargs)
+                self._database.collection_create(self._name)
+            return func(self, *args, **kwargs)
         return make_table
 
     @_ensure_table
-    def write_one(self, doc, check_keys=True, env=None):
-        env = env or self._conn.open()
-
+    def write_one(self, doc, check_keys=True):
         id = doc["_id"]
         encoded = self._encode_doc(doc, check_keys)
-        self._conn.write(env, [(id, encoded)])
+        self._conn.write(self._col_path, [(id, encoded)])
 
         return id
 
     @_ensure_table
-    def write_many(self, docs, check_keys=True, ordered=True, env=None):
-        env = env or self._conn.open()
+    def write_many(self, docs, check_keys=True, ordered=True):
         ids = list()
 
         def produce_encoded_docs():
@@ -208,33 +724,37 @@ class LMDBCollection(AbstractCollection):
                 yield id, self._encode_doc(doc, check_keys)
                 ids.append(id)
 
-        self._conn.write(env, produce_encoded_docs())
+        self._conn.write(self._col_path, produce_encoded_docs())
 
         return ids
 
     def update_one(self, doc):
-        env = self._conn.open()
-
         id = doc["_id"]
         encoded = self._encode_doc(doc)
-        self._conn.write(env, [(id, encoded)], overwrite=True)
+        self._conn.write(self._col_path, [(id, encoded)], overwrite=True)
 
     def update_many(self, docs):
-        env = self._conn.open()
-
         def produce_encoded_docs():
             for doc in docs:
                 yield doc["_id"], self._encode_doc(doc)
 
-        self._conn.write(env, produce_encoded_docs(), overwrite=True)
+        self._conn.write(self._col_path, produce_encoded_docs(), overwrite=True)
 
     def delete_one(self, id):
-        env = self._conn.open()
-        self._conn.delete(env, [id])
+        self._conn.delete(self._col_path, [id])
 
     def delete_many(self, ids):
-        env = self._conn.open()
-        self._conn.delete(env, ids)
+        self._conn.delete(self._col_path, ids)
+
+    @_ensure_table
+    def index_create(self, name, keys, unique=False):
+        self._conn.index_create(self._col_path, name, keys, unique)
+
+    def index_drop(self, name):
+        self._conn.index_drop(self._col_path, name)
+
+    def index_list(self):
+        return self._conn.index_list(self._col_path)
 
 
 LMDBDatabase.contractor_cls = LMDBCollection
@@ -247,9 +767,23 @@ class LMDBCursor(AbstractCursor):
     def __init__(self, collection, subject):
         super().__init__(collection, subject)
         self._conn = self._collection._conn
+        self._batch_size = subject._batch_size
 
     def query(self, max_scan):
-        docs = (self._decode_doc(doc) for doc in self._conn.iter_docs())
+        col_path = self._collection._col_path
+        plan = self._plan()
+        stored = None
+        if plan.stage == IDHACK:
+            stored = self._conn.get_docs(col_path, plan.keys)
+        elif plan.stage == IXSCAN:
+            scanned = self._conn.index_scan(col_path, plan.index, plan.ranges)
+            if scanned is not None:
+                stored, examined = scanned
+                self._keys_examined(examined)
+        if stored is None:
+            stored = self._conn.iter_docs(col_path, self._batch_size)
+
+        docs = (self._decode_doc(doc) for doc in stored)
 
         if not max_scan:
             return docs
@@ -1,7 +1,10 @@
 
+import bisect
 from itertools import islice
 from collections import defaultdict, OrderedDict
 
+from ..engine.index import index_keys
+from ..engine.planner import IDHACK, IXSCAN
 from ..types import bson
 from . import (
     AbstractStorage,
@@ -14,13 +17,170 @@ from . import (
 
 
 _repos = defaultdict(OrderedDict)
+_indexes = defaultdict(dict)
 _config = {"_": {}}
 
+# Codec options that affect decoded values, besides document class
+_CODEC_FIELDS = (
+    "tz_aware",
+    "tzinfo",
+    "uuid_representation",
+    "unicode_decode_error_handler",
+    "type_registry",
+)
+
 
 def is_memory_storage_set():
     return bool(_config["_"])
 
 
+def _is_copyable(codec_options):
+    """Whether decoded documents could be copied for these codec options
+
+    Decoded documents are stored with default codec options, copy them for
+    other codec options that only differ by document class would be same as
+    decode them.
+
+    """
+    default = bson.DEFAULT_CODEC_OPTIONS
+    return all(
+        getattr(codec_options, field, None) == getattr(default, field, None)
+        for field in _CODEC_FIELDS
+    )
+
+
+def _copy_doc(doc, document_class=dict):
+    copied = document_class()
+    for key, value in doc.items():
+        if type(value) is dict:
+            value = _copy_doc(value, document_class)
+        elif type(value) is list:
+            value = _copy_list(value, document_class)
+        copied[key] = value
+    return copied
+
+
+def _copy_list(array, document_class=dict):
+    copied = []
+    for value in array:
+        if type(value) is dict:
+            value = _copy_doc(value, document_class)
+        elif type(value) is list:
+            value = _copy_list(value, document_class)
+        copied.append(value)
+    return copied
+
+
+class MemoryIndex:
+    """Secondary index of a collection
+
+    Index entries are (entry key, sequence, encoded `_id`) in a sorted list,
+    so documents are looked up by bisecting entry key ranges. Documents are
+    numbered in the order they are put into the collection, so documents
+    that have the same entry key are in natural order.
+
+    Entry keys and the number of each indexed document are also kept, for
+    removing its entries when it's updated or deleted.
+
+    Inserting or removing one document's entries shifts the list, which costs
+    O(n) per write, so new documents written in bulk are added with `extend`,
+    which sorts the entries only once.
+
+    Args:
+        keys (list): The index's (path, direction) pairs.
+        unique (bool): Whether an entry key can only belong to one document.
+
+    """
+
+    def __init__(self, keys, unique=False):
+        self.keys = keys
+        self.unique = unique
+        self._entries = []
+        self._docs = {}
+        self._sequence = 0
+
+    def info(self):
+        info = {"key": list(self.keys)}
+        if self.unique:
+            info["unique"] = True
+        return info
+
+    def build(self, docs):
+        """Index (encoded `_id`, document) pairs all at once
+
+        Returns False if the index is unique but has duplicate keys.
+
+        """
+        self.extend(docs)
+
+        if self.unique:
+            entries = self._entries
+            return not any(
+                entries[i][0] == entries[i + 1][0]
+                for i in range(len(entries) - 1)
+            )
+        return True
+
+    def extend(self, docs):
+        """Index new (encoded `_id`, document) pairs, sorting entries once"""
+        for seq, (b_id, doc) in enumerate(docs, self._sequence):
+            keys = index_keys(doc, self.keys)
+            self._docs[b_id] = (seq, keys)
+            self._entries.extend((key, seq, b_id) for key in keys)
+            self._sequence = seq + 1
+        self._entries.sort()
+
+    def conflicts(self, b_id, doc):
+        """Has other document got any of the entry keys of `doc`"""
+        entries = self._entries
+        for key in index_keys(doc, self.keys):
+            i = bisect.bisect_left(entries, (key,))
+            while i < len(entries) and entries[i][0] == key:
+                if entries[i][2] != b_id:
+                    return True
+                i += 1
+        return False
+
+    def insert(self, b_id, doc):
+        """Index a new document, or re-index an updated one"""
+        seq = self.remove(b_id)
+        if seq is None:
+            seq = self._sequence
+            self._sequence += 1
+
+        keys = index_keys(doc, self.keys)
+        self._docs[b_id] = (seq, keys)
+        for key in keys:
+            bisect.insort(self._entries, (key, seq, b_id))
+
+    def remove(self, b_id):
+        """Remove a document's entries and return its number, if indexed"""
+        if b_id not in self._docs:
+            return None
+        seq, keys = self._docs.pop(b_id)
+        for key in keys:
+            del self._entries[bisect.bisect_left(self._entries, (key, seq))]
+        return seq
+
+    def scan(self, ranges):
+        """Get encoded `_id` of documents in entry key ranges, in index order
+
+        A document is only returned once even it has many entries in range.
+        Returns the `_id` list and the number of entries examined.
+
+        """
+        entries = self._entries
+        b_ids = OrderedDict()
+        examined = 0
+        for start, stop in ranges:
+            lo = bisect.bisect_left(entries, (start,))
+            hi = bisect.bisect_left(entries, (stop,), lo)
+            examined += hi - lo
+            for _, _, b_id in entries[lo:hi]:
+                b_ids[b_id] = None
+        return list(b_ids), examined
+
+
 class MemoryStorage(AbstractStorage):
     """
     """
@@ -28,13 +188,24 @@ class MemoryStorage(AbstractStorage):
     def __init__(self, repository, storage_config):
         super().__init__(repository, storage_config)
         self._repo = _repos[repository]
+        # Secondary indexes, keyed by (database name, collection name)
+        self._indexes = _indexes[repository]
 
     @classmethod
     def nice_name(cls):
         return "memory"
 
     @classmethod
-    def config(cls, **storage_kwargs):
+    def config(cls, store_decoded=False, **storage_kwargs):
+        """
+
+        Args:
+            store_decoded (bool): Store documents decoded instead of encoded,
+                documents are copied on read instead of being decoded.
+                Default False
+
+        """
+        storage_kwargs["store_decoded"] = bool(store_decoded)
         return storage_kwargs
 
     @classmethod
@@ -51,6 +222,8 @@ class MemoryStorage(AbstractStorage):
     def database_drop(self, db_name):
         if db_name in self._repo:
             del self._repo[db_name]
+        for key in [key for key in self._indexes if key[0] == db_name]:
+            del self._indexes[key]
 
     def database_list(self):
         return list(self._repo.keys())
@@ -80,6 +253,7 @@ class MemoryDatabase(AbstractDatabase):
     def collection_drop(self, col_name):
         if self.collection_exists(col_name):
             del self._db[col_name]
+        self._storage._indexes.pop((self._name, col_name), None)
 
     def collection_list(self):
         if not self.db_exists():
@@ -94,6 +268,17 @@ class MemoryCollection(AbstractCollection):
     """
     """
 
+    def __init__(self, database, subject):
+        super().__init__(database, subject)
+        self._store_decoded = database._storage._config["store_decoded"]
+
+    def _store_doc(self, doc, check_keys=False):
+        encoded = self._encode_doc(doc, check_keys)
+        if self._store_decoded:
+            # Still encoded once for validating and normalizing values.
+            return bson.document_decode(encoded)
+        return encoded
+
     @property
     def _col(self):
         if not self._col_exists():
@@ -107,36 +292,114 @@ class MemoryCollection(AbstractCollection):
         if id in self._col:
             raise StorageDuplicateKeyError()
 
+    @property
+    def _indexes(self):
+        key = (self._database._name, self._name)
+        return self._database._storage._indexes.get(key, {})
+
+    def _index_doc(self, stored):
+        # Index the stored document, which has been normalized by encoding.
+        if isinstance(stored, bytes):
+            return bson.document_decode(stored)
+        return stored
+
+    def _put(self, b_id, stored):
+        indexes = self._indexes
+        if indexes:
+            doc = self._index_doc(stored)
+            for name, index in indexes.items():
+                if index.unique and index.conflicts(b_id, doc):
+                    raise StorageDuplicateKeyError(name)
+            for index in indexes.values():
+                index.insert(b_id, doc)
+        self._col[b_id] = stored
+
+    def _remove(self, b_id):
+        for index in self._indexes.values():
+            index.remove(b_id)
+        del self._col[b_id]
+
     def write_one(self, doc, check_keys=True):
         _id = doc["_id"]
         b_id = bson.id_encode(_id)
         self._id_unique(b_id)
-        self._col[b_id] = self._encode_doc(doc, check_keys)
+        self._put(b_id, self._store_doc(doc, check_keys))
         return _id
 
     def write_many(self, docs, check_keys=True, ordered=True):
         ids = list()
-        for doc in docs:
-            _id = doc["_id"]
-            b_id = bson.id_encode(_id)
-            self._id_unique(b_id)
-            self._col[b_id] = self._encode_doc(doc, check_keys)
-            ids.append(_id)
+        indexes = self._indexes
+        # Entry keys taken by this batch, per unique index
+        taken = {name: set() for name, index in indexes.items() if index.unique}
+        indexed = []
+        try:
+            for doc in docs:
+                _id = doc["_id"]
+                b_id = bson.id_encode(_id)
+                self._id_unique(b_id)
+                stored = self._store_doc(doc, check_keys)
+                if indexes:
+                    index_doc = self._index_doc(stored)
+                    for name, keys in taken.items():
+                        index = indexes[name]
+                        doc_keys = index_keys(index_doc, index.keys)
+                        if index.conflicts(b_id, index_doc) or not keys.isdisjoint(
+                            doc_keys
+                        ):
+                            raise StorageDuplicateKeyError(name)
+                        keys.update(doc_keys)
+                    indexed.append((b_id, index_doc))
+                self._col[b_id] = stored
+                ids.append(_id)
+        finally:
+            # Documents written before a failure stay indexed
+            for index in indexes.values():
+                index.extend(indexed)
         return ids
 
     def update_one(self, doc):
-        self._col[bson.id_encode(doc["_id"])] = self._encode_doc(doc)
+        self._put(bson.id_encode(doc["_id"]), self._store_doc(doc))
 
     def update_many(self, docs):
         for doc in docs:
-            self._col[bson.id_encode(doc["_id"])] = self._encode_doc(doc)
+            self._put(bson.id_encode(doc["_id"]), self._store_doc(doc))
 
     def delete_one(self, id):
-        del self._col[bson.id_encode(id)]
+        self._remove(bson.id_encode(id))
 
     def delete_many(self, ids):
         for id in ids:
-            del self._col[bson.id_encode(id)]
+            self._remove(bson.id_encode(id))
+
+    def index_create(self, name, keys, unique=False):
+        index = MemoryIndex(keys, unique)
+        col = self._col
+        if not index.build(
+            (b_id, self._index_doc(stored)) for b_id, stored in col.items()
+        ):
+            raise StorageDuplicateKeyError(name)
+        key = (self._database._name, self._name)
+        self._database._storage._indexes.setdefault(key, OrderedDict())[name] = index
+
+    def index_drop(self, name):
+        del self._indexes[name]
+
+    def index_list(self):
+        return OrderedDict(
+            (name, index.info()) for name, index in self._indexes.items()
+        )
+
+    def index_scan(self, name, ranges):
+        """Encoded `_id` of documents in entry key ranges of an index
+
+        Returns the `_id` list and the number of entries examined, or None
+        if the index doesn't exist.
+
+        """
+        index = self._indexes.get(name)
+        if index is None:
+            return None
+        return index.scan(ranges)
 
 
 MemoryDatabase.contractor_cls = MemoryCollection
@@ -146,14 +409,48 @@ class MemoryCursor(AbstractCursor):
     """
     """
 
+    def __init__(self, collection, subject):
+        super().__init__(collection, subject)
+        coptions = collection.coptions
+        if _is_copyable(coptions):
+            document_class = coptions.document_class
+            self._copy_doc = lambda doc: _copy_doc(doc, document_class)
+        else:
+            self._copy_doc = lambda doc: self._decode_doc(bson.document_encode(doc))
+
     @property
     def _col(self):
         if self._collection._col_exists():
             return self._collection._col
         return OrderedDict()
 
+    def _load_doc(self, doc):
+        if isinstance(doc, bytes):
+            return self._decode_doc(doc)
+        # Stored decoded, copy on read so the stored one won't be mutated.
+        stats = self._stats
+        if stats is not None:
+            stats.docs_examined += 1
+            return stats.time("decode", self._copy_doc, doc)
+        return self._copy_doc(doc)
+
     def query(self, max_scan):
-        docs = (self._decode_doc(doc) for doc in self._col.values())
+        col = self._col
+        plan = self._plan()
+        keys = None
+        if plan.stage == IDHACK:
+            keys = plan.keys
+        elif plan.stage == IXSCAN:
+            scanned = self._collection.index_scan(plan.index, plan.ranges)
+            if scanned is not None:
+                keys, examined = scanned
+                self._keys_examined(examined)
+        if keys is None:
+            # Snapshot keys, documents may be written while being pulled.
+            keys = list(col)
+        stored = (col[key] for key in keys if key in col)
+
+        docs = (self._load_doc(doc) for doc in stored)
         if not max_scan:
             return docs
         else:
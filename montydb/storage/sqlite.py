@@ -1,11 +1,18 @@
 
 import os
+import re
+import json
 import shutil
 import sqlite3
+import weakref
+import threading
 import contextlib
+from itertools import islice
 from collections import OrderedDict
 
 from ..base import WriteConcern
+from ..engine.index import index_keys
+from ..engine.planner import IDHACK, IXSCAN
 from ..types import unicode_, bson
 from . import (
     AbstractStorage,
@@ -20,6 +27,21 @@ from . import (
 sqlite_324 = sqlite3.sqlite_version_info >= (3, 24, 0)
 
 
+def _has_json1():
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("SELECT json_valid('{}');")
+    except sqlite3.OperationalError:
+        return False
+    else:
+        return True
+    finally:
+        conn.close()
+
+
+sqlite_json1 = _has_json1()
+
+
 """
 (NOTE) SQLite3 pragmas DEFAULT value:
 
@@ -35,6 +57,9 @@ sqlite_324 = sqlite3.sqlite_version_info >= (3, 24, 0)
 
 SQLITE_DB_EXT = ".collection"
 SQLITE_RECORD_TABLE = "documents"
+SQLITE_INDEX_CATALOG = "indexes"
+DEFAULT_BATCH_SIZE = 1000
+MAX_KEYS_PER_SELECT = 500  # SQLite limits host parameters per statement
 
 
 """SQL"""
@@ -70,23 +95,408 @@ DELETE_RECORD = """
 """
 
 SELECT_ALL_RECORD = """
-    SELECT v FROM [{}];
+    SELECT v FROM [{}] WHERE rowid <= (?);
+"""
+
+SELECT_ALL_KEY_RECORD = """
+    SELECT k, v FROM [{}];
 """
 
 SELECT_LIMIT_RECORD = """
-    SELECT v FROM [{0}] LIMIT {1};
+    SELECT v FROM [{0}] WHERE rowid <= (?) LIMIT {1};
+"""
+
+SELECT_MAX_ROWID = """
+    SELECT MAX(rowid) FROM [{}];
+"""
+
+SELECT_KEYS_RECORD = """
+    SELECT k, v FROM [{0}] WHERE k IN ({1});
+"""
+
+SELECT_WHERE_RECORD = """
+    SELECT v FROM [{0}]
+        WHERE rowid <= (?)
+        AND CASE WHEN json_valid({1}) THEN ({2}) ELSE 1 END;
+"""
+
+
+"""SQL for secondary indexes
+
+Each index is a side table of (entry key, document key) rows, see
+`montydb.engine.index` for entry keys. Entry keys are BLOBs which SQLite
+compares with `memcmp()`, so key ranges are looked up by the primary key.
+"""
+
+CREATE_INDEX_CATALOG = """
+    CREATE TABLE IF NOT EXISTS [{}](
+        name text NOT NULL,
+        seq integer NOT NULL,
+        info text NOT NULL,
+        PRIMARY KEY(name)
+    );
+"""
+
+SELECT_INDEX_CATALOG = """
+    SELECT name, seq, info FROM [{}] ORDER BY seq;
+"""
+
+SELECT_NEXT_INDEX_SEQ = """
+    SELECT COALESCE(MAX(seq) + 1, 0) FROM [{}];
+"""
+
+INSERT_INDEX_CATALOG = """
+    INSERT INTO [{}](name, seq, info) VALUES (?, ?, ?);
+"""
+
+DELETE_INDEX_CATALOG = """
+    DELETE FROM [{}] WHERE name = (?);
+"""
+
+SELECT_TABLE_EXISTS = """
+    SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = (?);
+"""
+
+CREATE_INDEX_TABLE = """
+    CREATE TABLE [{0}](
+        key blob NOT NULL,
+        k text NOT NULL,
+        PRIMARY KEY(key, k)
+    ) WITHOUT ROWID;
+"""
+
+CREATE_INDEX_TABLE_K = """
+    CREATE INDEX [{0}_k] ON [{0}](k);
+"""
+
+DROP_INDEX_TABLE = """
+    DROP TABLE [{}];
+"""
+
+INSERT_INDEX_ENTRY = """
+    INSERT OR IGNORE INTO [{}](key, k) VALUES (?, ?);
+"""
+
+DELETE_INDEX_ENTRY = """
+    DELETE FROM [{}] WHERE k = (?);
+"""
+
+SELECT_INDEX_CONFLICT = """
+    SELECT 1 FROM [{}] WHERE key = (?) AND k != (?) LIMIT 1;
+"""
+
+SELECT_INDEX_DUPLICATE = """
+    SELECT 1 FROM [{}] GROUP BY key HAVING COUNT(*) > 1 LIMIT 1;
 """
 
-SELECT_ALL_KEYS = """
-    SELECT k FROM [{}];
+COUNT_INDEX_ENTRY = """
+    SELECT COUNT(*) FROM [{0}] WHERE {1};
 """
 
+SELECT_INDEX_RECORD = """
+    SELECT v FROM [{0}] WHERE k IN (SELECT k FROM [{1}] WHERE {2});
+"""
+
+SELECT_INDEX_ORDERED_RECORD = """
+    SELECT d.v FROM [{0}] AS d
+        JOIN (SELECT k, {3}(key) AS key FROM [{1}] WHERE {2} GROUP BY k) AS i
+        ON d.k = i.k
+        ORDER BY i.key {4};
+"""
+
+
+"""Filter pushdown
+
+Without BSON, documents are stored as JSON text, so SQLite's JSON1 functions
+can pre-filter rows before they get decoded. The generated clause only needs
+to reject rows that the `QueryFilter` would surely reject, every returned row
+will still be checked by the `QueryFilter` afterward.
+
+A predicate is only evaluated when the field path resolves to a JSON scalar
+through embedded documents, which means no array is on the path. Rows that
+the path is missing, or resolves to an array or a document (including the
+extended JSON types like `$oid` and `$date`) are always returned.
+"""
+
+_JSON_DOC = "CAST(v AS TEXT)"
+_JSON_TYPE = f"json_type({_JSON_DOC}, ?)"
+_JSON_VALUE = f"json_extract({_JSON_DOC}, ?)"
+_JSON_NUMBER = "('integer', 'real')"
+_JSON_UNKNOWN = "('array', 'object')"
+
+_PATH_FIELD = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_MAX_INT = 2 ** 63
+# Slack for comparing numbers, in case SQLite parse JSON real number
+# differently than Python.
+_NUM_SLACK = 1e-9
+
+
+def _json_path(path):
+    fields = path.split(".")
+    if all(_PATH_FIELD.match(field) for field in fields):
+        return ["$." + ".".join(fields[:i + 1]) for i in range(len(fields))]
+
+
+def _is_pushable_string(value):
+    return isinstance(value, str) and value.isascii()
+
+
+def _is_pushable_number(value):
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return -_MAX_INT <= value < _MAX_INT
+    return isinstance(value, float) and value == value and abs(value) != float("inf")
+
+
+def _num_bounds(value):
+    slack = abs(value) * _NUM_SLACK
+    return float(value) - slack, float(value) + slack
+
+
+def _where_scalar(json_path, predicate, params):
+    """Only evaluate predicate when the value is a scalar"""
+    sql = (
+        f"({_JSON_TYPE} IS NULL OR {_JSON_TYPE} IN {_JSON_UNKNOWN}"
+        f" OR ({predicate}))"
+    )
+    return sql, [json_path, json_path] + params
+
+
+def _where_eq(json_path, query):
+    if query is None:
+        return _where_scalar(json_path, f"{_JSON_TYPE} = 'null'", [json_path])
+    if isinstance(query, bool):
+        json_type = "true" if query else "false"
+        return _where_scalar(
+            json_path, f"{_JSON_TYPE} = '{json_type}'", [json_path]
+        )
+    if _is_pushable_number(query):
+        lower, upper = _num_bounds(query)
+        return _where_scalar(
+            json_path,
+            f"{_JSON_TYPE} IN {_JSON_NUMBER} AND {_JSON_VALUE} BETWEEN ? AND ?",
+            [json_path, json_path, lower, upper],
+        )
+    if _is_pushable_string(query):
+        return _where_scalar(
+            json_path,
+            f"{_JSON_TYPE} = 'text' AND {_JSON_VALUE} = ?",
+            [json_path, json_path, query],
+        )
+
+
+def _where_cmp(json_path, op, query):
+    if _is_pushable_number(query):
+        lower, upper = _num_bounds(query)
+        bound = lower if op in (">", ">=") else upper
+        return _where_scalar(
+            json_path,
+            f"{_JSON_TYPE} IN {_JSON_NUMBER} AND {_JSON_VALUE} {op} ?",
+            [json_path, json_path, bound],
+        )
+    if _is_pushable_string(query):
+        return _where_scalar(
+            json_path,
+            f"{_JSON_TYPE} = 'text' AND {_JSON_VALUE} {op} ?",
+            [json_path, json_path, query],
+        )
+
+
+def _where_in(json_path, query):
+    if not isinstance(query, list) or not query:
+        return None
+    clauses = [_where_eq(json_path, q) for q in query]
+    if None in clauses:
+        return None
+    return _where_join(" OR ", clauses)
+
+
+def _where_exists(json_paths, query):
+    json_path = json_paths[-1]
+    if not query:
+        return f"{_JSON_TYPE} IS NULL", [json_path]
+
+    # Field may exist in array embedded documents
+    sql = [f"{_JSON_TYPE} IS NOT NULL"]
+    params = [json_path]
+    for parent in json_paths[:-1]:
+        sql.append(f"{_JSON_TYPE} = 'array'")
+        params.append(parent)
+    return "(" + " OR ".join(sql) + ")", params
+
+
+_CMP_OPS = {
+    "$gt": ">",
+    "$gte": ">=",
+    "$lt": "<",
+    "$lte": "<=",
+}
+
+
+def _where_field(path, sub_spec):
+    json_paths = _json_path(path)
+    if json_paths is None:
+        return None
+    json_path = json_paths[-1]
+
+    if not (isinstance(sub_spec, dict)
+            and sub_spec and next(iter(sub_spec)).startswith("$")):
+        return _where_eq(json_path, sub_spec)
+
+    clauses = []
+    for op, query in sub_spec.items():
+        if op == "$eq":
+            clauses.append(_where_eq(json_path, query))
+        elif op in _CMP_OPS:
+            clauses.append(_where_cmp(json_path, _CMP_OPS[op], query))
+        elif op == "$in":
+            clauses.append(_where_in(json_path, query))
+        elif op == "$exists":
+            clauses.append(_where_exists(json_paths, query))
+
+    return _where_join(" AND ", [c for c in clauses if c is not None])
+
+
+def _where_logic(sub_spec, joint):
+    if not isinstance(sub_spec, list):
+        return None
+    clauses = [json_where(cond) for cond in sub_spec]
+    if joint == " OR " and None in clauses:
+        return None
+    return _where_join(joint, [c for c in clauses if c is not None])
+
+
+def _where_join(joint, clauses):
+    if not clauses:
+        return None
+    sql = joint.join(clause for clause, _ in clauses)
+    params = [param for _, clause_params in clauses for param in clause_params]
+    return f"({sql})", params
+
+
+def json_where(spec):
+    """Translate pushable query filter into SQL WHERE clause
+
+    Args:
+        spec (dict): MongoDB document query language object.
+
+    Returns:
+        tuple: (clause, params), or `None` if nothing could be pushed down.
+
+    """
+    if not isinstance(spec, dict):
+        return None
+
+    clauses = []
+    for path, sub_spec in spec.items():
+        if path == "$and":
+            clauses.append(_where_logic(sub_spec, " AND "))
+        elif path == "$or":
+            clauses.append(_where_logic(sub_spec, " OR "))
+        elif not path.startswith("$"):
+            clauses.append(_where_field(path, sub_spec))
+
+    return _where_join(" AND ", [c for c in clauses if c is not None])
+
+
+class _ThreadConnections:
+    """Connections of one thread, collection file to [connection, pragmas]"""
+
+    def __init__(self):
+        self.entries = dict()
+
+
+class SQLiteConnectionPool:
+    """Keep SQLite connections alive across operations
+
+    Connections are pooled per collection file and per thread, so the
+    `check_same_thread` option of `sqlite3.connect` is always satisfied.
+    Database pragmas are applied once when the connection is opened, and
+    write concern pragmas are only re-applied when they changed.
+
+    Each thread keeps its connections in thread local storage, so they are
+    released when the thread exits.
+
+    Since connections are not re-opened, `sqlite3`'s per-connection prepared
+    statement cache is also preserved between operations.
+
+    """
+
+    def __init__(self, db_pragmas, conn_kwargs):
+        self._db_pragmas = db_pragmas
+        self._conn_kwargs = conn_kwargs
+        self._local = threading.local()
+        # Connections of living threads
+        self._threads = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(conns.entries) for conns in self._threads)
+
+    def _connections(self):
+        conns = getattr(self._local, "conns", None)
+        if conns is None:
+            conns = self._local.conns = _ThreadConnections()
+            with self._lock:
+                self._threads.add(conns)
+        return conns
+
+    def acquire(self, db_file, wcon_pragmas=""):
+        conns = self._connections()
+        entry = conns.entries.get(db_file)
+
+        if entry is None:
+            conn = sqlite3.connect(db_file, **self._conn_kwargs)
+            conn.text_factory = str
+            conn.executescript(self._db_pragmas)
+            entry = [conn, None]
+
+            with self._lock:
+                conns.entries[db_file] = entry
+
+        conn, applied = entry
+        if wcon_pragmas and wcon_pragmas != applied:
+            conn.executescript(wcon_pragmas)
+            entry[1] = wcon_pragmas
+
+        return conn
+
+    def close(self, path=None):
+        """Close pooled connections
+
+        Connections of the current thread are closed. Connections of other
+        threads can only be closed by their own thread, so they are removed
+        from the pool, and get closed once their thread no longer uses them.
+
+        Args:
+            path (str, optional): Only close connections of this collection
+                file, or of collection files under this directory. Close all
+                connections if not given.
+
+        """
+        prefix = None if path is None else os.path.join(path, "")
+        owned = self._connections()
+        closing = []
+
+        with self._lock:
+            for conns in self._threads:
+                for db_file in list(conns.entries):
+                    if path is None or (
+                        db_file == path or db_file.startswith(prefix)
+                    ):
+                        entry = conns.entries.pop(db_file)
+                        if conns is owned:
+                            closing.append(entry[0])
+
+        for conn in closing:
+            conn.close()
+
 
 class SQLiteKVEngine:
 
     def __init__(self, config):
-        self.__conn = None
-
         self.__db_pragmas = {
             key: config[key]
             for key in [
@@ -103,14 +513,18 @@ class SQLiteKVEngine:
             if key in config
         }
 
+        self.__pool = SQLiteConnectionPool(self.db_pragmas, self.__conn_kwargs)
+        self.__batch_size = config.get("batch_size") or DEFAULT_BATCH_SIZE
+        # Index catalog of each collection file, with the schema version
+        # it was read at.
+        self.__catalogs = dict()
+
     @property
     def db_pragmas(self):
         return self._assemble_pragmas(self.__db_pragmas)
 
+    @contextlib.contextmanager
     def _connect(self, db_file, wconcern=None):
-        self.__conn = sqlite3.connect(db_file, **self.__conn_kwargs)
-        self.__conn.text_factory = str
-
         wcon_pragmas = ""
         if wconcern:
             wcon_doc = wconcern.document
@@ -122,10 +536,17 @@ class SQLiteKVEngine:
 
             wcon_pragmas = self._assemble_pragmas(wcon_doc)
 
-        # update connection pragmas and write_concern pragmas
-        self.__conn.executescript(self.db_pragmas + ";" + wcon_pragmas)
+        yield self.__pool.acquire(db_file, wcon_pragmas)
 
-        return contextlib.closing(self.__conn)
+    def close(self, path=None):
+        self.__pool.close(path)
+        if path is None:
+            self.__catalogs.clear()
+        else:
+            prefix = os.path.join(path, "")
+            for db_file in list(self.__catalogs):
+                if db_file == path or db_file.startswith(prefix):
+                    self.__catalogs.pop(db_file, None)
 
     def _assemble_pragmas(self, pragma_dict):
         return ";".join([f"PRAGMA {k}={v}"
@@ -136,62 +557,324 @@ class SQLiteKVEngine:
             with conn:
                 conn.execute(CREATE_TABLE.format(SQLITE_RECORD_TABLE))
 
+    def _indexes(self, conn, db_file):
+        """Get (name, table, info) of each index in creation order
+
+        The catalog is only re-read when the database schema has changed,
+        since every index creation or removal changes the schema.
+
+        """
+        version = conn.execute("PRAGMA schema_version;").fetchone()[0]
+        cached = self.__catalogs.get(db_file)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        indexes = list()
+        if conn.execute(SELECT_TABLE_EXISTS, (SQLITE_INDEX_CATALOG,)).fetchone():
+            sql = SELECT_INDEX_CATALOG.format(SQLITE_INDEX_CATALOG)
+            for name, seq, info in conn.execute(sql):
+                info = json.loads(info)
+                info["key"] = [tuple(key) for key in info["key"]]
+                indexes.append((name, f"index_{seq}", info))
+
+        self.__catalogs[db_file] = (version, indexes)
+        return indexes
+
+    def _begin(self, conn, db_file):
+        """Begin a write transaction, return indexes to maintain in it
+
+        The catalog is read after the write lock is taken, so no index could
+        be created or dropped by others before this transaction ends.
+
+        """
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE;")
+        return self._indexes(conn, db_file)
+
+    def _decode_records(self, indexes, records):
+        """Decode (key, encoded document) records for indexing"""
+        if not indexes:
+            return []
+        return [(k, bson.document_decode(v)) for k, v in records]
+
+    def _check_unique(self, conn, indexes, docs):
+        """Raise if other document has any entry key of `docs` in unique index"""
+        for name, table, info in indexes:
+            if not info.get("unique"):
+                continue
+            sql = SELECT_INDEX_CONFLICT.format(table)
+            for k, doc in docs:
+                for entry in index_keys(doc, info["key"]):
+                    if conn.execute(sql, (entry, k)).fetchone():
+                        raise StorageDuplicateKeyError(name)
+
+    def _index_records(self, conn, indexes, docs, replace=False):
+        """Add index entries of (key, decoded document) pairs"""
+        for _, table, info in indexes:
+            if replace:
+                sql = DELETE_INDEX_ENTRY.format(table)
+                conn.executemany(sql, [(k,) for k, _ in docs])
+            conn.executemany(
+                INSERT_INDEX_ENTRY.format(table),
+                [(entry, k) for k, doc in docs
+                 for entry in index_keys(doc, info["key"])],
+            )
+
+    def _unindex_records(self, conn, indexes, keys):
+        for _, table, _ in indexes:
+            sql = DELETE_INDEX_ENTRY.format(table)
+            conn.executemany(sql, [(k,) for k in keys])
+
     def write_one(self, db_file, params, wconcern=None):
         with self._connect(db_file, wconcern) as conn:
             with conn:
+                indexes = self._begin(conn, db_file)
                 sql = INSERT_RECORD.format(SQLITE_RECORD_TABLE)
                 conn.execute(sql, params)
+                docs = self._decode_records(indexes, [params])
+                self._check_unique(conn, indexes, docs)
+                self._index_records(conn, indexes, docs)
 
     def write_many(self, db_file, seq_params, wconcern=None):
         with self._connect(db_file, wconcern) as conn:
-            with conn:
-                sql = INSERT_RECORD.format(SQLITE_RECORD_TABLE)
-                conn.executemany(sql, seq_params)
+            sql = INSERT_RECORD.format(SQLITE_RECORD_TABLE)
+            try:
+                indexes = self._begin(conn, db_file)
+                if indexes:
+                    for params in seq_params:
+                        docs = self._decode_records(indexes, [params])
+                        self._check_unique(conn, indexes, docs)
+                        conn.execute(sql, params)
+                        self._index_records(conn, indexes, docs)
+                else:
+                    conn.executemany(sql, seq_params)
+            except (sqlite3.IntegrityError, StorageDuplicateKeyError):
+                # Duplicate key found, keep the records that were inserted
+                # before it.
+                conn.commit()
+                raise
+            except Exception:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
 
     def update_one(self, db_file, params, wconcern=None):
         with self._connect(db_file, wconcern) as conn:
             with conn:
+                indexes = self._begin(conn, db_file)
+                v, k = params
+                docs = self._decode_records(indexes, [(k, v)])
+                self._check_unique(conn, indexes, docs)
                 sql = UPDATE_RECORD.format(SQLITE_RECORD_TABLE)
                 conn.execute(sql, params)
+                self._index_records(conn, indexes, docs, replace=True)
 
     def update_many(self, db_file, seq_params, wconcern=None):
         with self._connect(db_file, wconcern) as conn:
             with conn:
+                indexes = self._begin(conn, db_file)
                 sql = UPDATE_RECORD.format(SQLITE_RECORD_TABLE)
-                conn.executemany(sql, seq_params)
+                if not indexes:
+                    conn.executemany(sql, seq_params)
+                    return
+
+                for v, k in seq_params:
+                    docs = self._decode_records(indexes, [(k, v)])
+                    try:
+                        self._check_unique(conn, indexes, docs)
+                    except StorageDuplicateKeyError:
+                        # Keep the records that were updated before it.
+                        conn.commit()
+                        raise
+                    conn.execute(sql, (v, k))
+                    self._index_records(conn, indexes, docs, replace=True)
 
     def delete_one(self, db_file, params, wconcern=None):
         with self._connect(db_file, wconcern) as conn:
             with conn:
+                indexes = self._begin(conn, db_file)
                 sql = DELETE_RECORD.format(SQLITE_RECORD_TABLE)
                 conn.execute(sql, params)
+                self._unindex_records(conn, indexes, params)
 
     def delete_many(self, db_file, seq_params, wconcern=None):
         with self._connect(db_file, wconcern) as conn:
             with conn:
+                indexes = self._begin(conn, db_file)
                 sql = DELETE_RECORD.format(SQLITE_RECORD_TABLE)
                 conn.executemany(sql, seq_params)
+                self._unindex_records(
+                    conn, indexes, [k for k, in seq_params]
+                )
+
+    def index_create(self, db_file, name, keys, unique=False):
+        """Create an index table, fill it, then add it into the catalog"""
+        info = {"key": list(keys)}
+        if unique:
+            info["unique"] = True
+        with self._connect(db_file) as conn:
+            with conn:
+                self._begin(conn, db_file)
+                conn.execute(CREATE_INDEX_CATALOG.format(SQLITE_INDEX_CATALOG))
+                seq = conn.execute(
+                    SELECT_NEXT_INDEX_SEQ.format(SQLITE_INDEX_CATALOG)
+                ).fetchone()[0]
+                table = f"index_{seq}"
+                conn.execute(CREATE_INDEX_TABLE.format(table))
+                conn.execute(CREATE_INDEX_TABLE_K.format(table))
+
+                indexes = [(name, table, info)]
+                records = conn.execute(
+                    SELECT_ALL_KEY_RECORD.format(SQLITE_RECORD_TABLE)
+                ).fetchall()
+                self._index_records(
+                    conn, indexes, self._decode_records(indexes, records)
+                )
+                if unique and conn.execute(
+                    SELECT_INDEX_DUPLICATE.format(table)
+                ).fetchone():
+                    raise StorageDuplicateKeyError(name)
+
+                conn.execute(
+                    INSERT_INDEX_CATALOG.format(SQLITE_INDEX_CATALOG),
+                    (name, seq, json.dumps(info)),
+                )
+
+    def index_drop(self, db_file, name):
+        with self._connect(db_file) as conn:
+            with conn:
+                for name_, table, _ in self._begin(conn, db_file):
+                    if name_ == name:
+                        conn.execute(
+                            DELETE_INDEX_CATALOG.format(SQLITE_INDEX_CATALOG),
+                            (name,),
+                        )
+                        conn.execute(DROP_INDEX_TABLE.format(table))
+
+    def index_list(self, db_file):
+        if not os.path.isfile(db_file):
+            return OrderedDict()
+        with self._connect(db_file) as conn:
+            return OrderedDict(
+                (name, info) for name, _, info in self._indexes(conn, db_file)
+            )
 
-    def read_all(self, db_file, limit):
+    def _index_table(self, conn, db_file, name):
+        for name_, table, info in self._indexes(conn, db_file):
+            if name_ == name:
+                return table, info
+        return None, None
+
+    def _index_where(self, ranges):
+        """WHERE clause and params of entry key ranges"""
+        if len(ranges) * 2 > MAX_KEYS_PER_SELECT:
+            # Too many host parameters, look up by one covering range.
+            ranges = [(ranges[0][0], ranges[-1][1])]
+
+        clause = " OR ".join(["(key >= ? AND key < ?)"] * len(ranges))
+        params = [bound for range_ in ranges for bound in range_]
+        return clause, params
+
+    def read_index(self, db_file, name, ranges, ordering=None, batch_size=None):
+        """Fetch records in entry key ranges of an index
+
+        Records are in the order of index entry keys if the first field to
+        sort by is the first field of the index. Returns None if the index
+        doesn't exist.
+
+        """
         if not os.path.isfile(db_file):
-            return []
+            return None
         with self._connect(db_file) as conn:
-            with conn:
-                if limit:
-                    sql = SELECT_LIMIT_RECORD.format(
-                        SQLITE_RECORD_TABLE, limit)
-                else:
-                    sql = SELECT_ALL_RECORD.format(SQLITE_RECORD_TABLE)
+            table, info = self._index_table(conn, db_file, name)
+            if table is None:
+                return None
+            if not ranges:
+                return iter(())
+
+            clause, params = self._index_where(ranges)
+            path = info["key"][0][0]
+            order = list((ordering or {}).items())[:1]
+            if order and order[0][0] == path:
+                direction = order[0][1]
+                sql = SELECT_INDEX_ORDERED_RECORD.format(
+                    SQLITE_RECORD_TABLE, table, clause,
+                    "MAX" if direction == -1 else "MIN",
+                    "DESC" if direction == -1 else "ASC",
+                )
+            else:
+                sql = SELECT_INDEX_RECORD.format(
+                    SQLITE_RECORD_TABLE, table, clause)
+
+            return self._fetch(conn, sql, params, batch_size)
+
+    def count_index(self, db_file, name, ranges):
+        """Count index entries in entry key ranges"""
+        if not os.path.isfile(db_file) or not ranges:
+            return 0
+        with self._connect(db_file) as conn:
+            table, _ = self._index_table(conn, db_file, name)
+            if table is None:
+                return 0
+            clause, params = self._index_where(ranges)
+            sql = COUNT_INDEX_ENTRY.format(table, clause)
+            return conn.execute(sql, params).fetchone()[0]
+
+    def _fetch(self, conn, sql, params, batch_size=None):
+        batch_size = batch_size or self.__batch_size
+        cursor = conn.execute(sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
 
-                return conn.execute(sql).fetchall()
+    def read_all(self, db_file, limit, batch_size=None, where=None):
+        """Fetch records that exist when the scan starts
 
-    def read_all_keys(self, db_file):
+        Rows are fetched in batches from a statement that stays open, so the
+        scan is bounded by the largest rowid at start, rows inserted while
+        the scan is being pulled are not returned. Updates keep the rowid.
+
+        """
         if not os.path.isfile(db_file):
-            return []
+            return iter(())
         with self._connect(db_file) as conn:
-            with conn:
-                sql = SELECT_ALL_KEYS.format(SQLITE_RECORD_TABLE)
-                return conn.execute(sql).fetchall()
+            sql = SELECT_MAX_ROWID.format(SQLITE_RECORD_TABLE)
+            bound = conn.execute(sql).fetchone()[0]
+            if bound is None:
+                return iter(())
+
+            params = [bound]
+            if where:
+                clause, where_params = where
+                params += where_params
+                sql = SELECT_WHERE_RECORD.format(
+                    SQLITE_RECORD_TABLE, _JSON_DOC, clause)
+            elif limit:
+                sql = SELECT_LIMIT_RECORD.format(SQLITE_RECORD_TABLE, limit)
+            else:
+                sql = SELECT_ALL_RECORD.format(SQLITE_RECORD_TABLE)
+
+            return self._fetch(conn, sql, params, batch_size)
+
+    def read_keys(self, db_file, keys):
+        """Fetch records by primary keys, in the order of `keys`"""
+        if not os.path.isfile(db_file):
+            return
+        with self._connect(db_file) as conn:
+            for i in range(0, len(keys), MAX_KEYS_PER_SELECT):
+                chunk = keys[i:i + MAX_KEYS_PER_SELECT]
+                sql = SELECT_KEYS_RECORD.format(
+                    SQLITE_RECORD_TABLE, ", ".join("?" * len(chunk)))
+                records = dict(conn.execute(sql, chunk).fetchall())
+                for key in chunk:
+                    if key in records:
+                        yield (records[key],)
 
 
 class SQLiteWriteConcern(WriteConcern):
@@ -249,7 +932,11 @@ class SQLiteStorage(AbstractStorage):
         return "sqlite"
 
     @classmethod
-    def config(cls, journal_mode="WAL", check_same_thread=True, **kwargs):
+    def config(cls,
+               journal_mode="WAL",
+               check_same_thread=True,
+               batch_size=DEFAULT_BATCH_SIZE,
+               **kwargs):
         """
 
         Args:
@@ -258,11 +945,15 @@ class SQLiteStorage(AbstractStorage):
                 enum: [DELETE, TRUNCATE, PERSIST, MEMORY, WAL, "OFF"]
             check_same_thread (bool): Default True
                 See `sqlite3.connect`
+            batch_size (int): Default 1000
+                How many rows fetched at a time while scanning collection,
+                can be overridden per query by `MontyCursor.batch_size`.
 
         """
         return {
             "journal_mode": journal_mode,
             "check_same_thread": check_same_thread,
+            "batch_size": int(batch_size),
         }
 
     def wconcern_parser(self,
@@ -279,8 +970,13 @@ class SQLiteStorage(AbstractStorage):
         if not os.path.isdir(self._db_path(db_name)):
             os.makedirs(self._db_path(db_name))
 
+    def close(self):
+        self._conn.close()
+        super().close()
+
     def database_drop(self, db_name):
         db_path = self._db_path(db_name)
+        self._conn.close(db_path)
         if os.path.isdir(db_path):
             shutil.rmtree(db_path)
 
@@ -319,14 +1015,17 @@ class SQLiteDatabase(AbstractDatabase):
         self._conn.create_table(self._col_path(col_name))
 
     def collection_drop(self, col_name):
+        col_path = self._col_path(col_name)
+        self._conn.close(col_path)
         if self.collection_exists(col_name):
-            os.remove(self._col_path(col_name))
+            os.remove(col_path)
 
     def collection_list(self):
         if not self.database_exists():
             return []
         return [os.path.splitext(name)[0]
-                for name in os.listdir(unicode_(self._db_path))]
+                for name in os.listdir(unicode_(self._db_path))
+                if name.endswith(SQLITE_DB_EXT)]
 
 
 SQLiteStorage.contractor_cls = SQLiteDatabase
@@ -371,27 +1070,21 @@ class SQLiteCollection(AbstractCollection):
     def write_many(self, docs, check_keys=True, ordered=True):
         """
         """
-        _docs = OrderedDict()
         ids = list()
-        keys = self._conn.read_all_keys(self._col_path)
-        has_duplicated_key = False
-        for doc in docs:
-            _id = doc["_id"]
-            b_id = bson.id_encode(_id)
-            if b_id in keys or b_id in _docs:
-                has_duplicated_key = True
-                break
-
-            _docs[b_id] = self._encode_doc(doc, check_keys)
-            ids.append(_id)
-
-        self._conn.write_many(
-            self._col_path,
-            _docs.items(),
-            self.wconcern
-        )
 
-        if has_duplicated_key:
+        def produce_encoded_docs():
+            for doc in docs:
+                _id = doc["_id"]
+                yield bson.id_encode(_id), self._encode_doc(doc, check_keys)
+                ids.append(_id)
+
+        try:
+            self._conn.write_many(
+                self._col_path,
+                produce_encoded_docs(),
+                self.wconcern
+            )
+        except sqlite3.IntegrityError:
             raise StorageDuplicateKeyError()
 
         return ids
@@ -429,6 +1122,16 @@ class SQLiteCollection(AbstractCollection):
             self.wconcern
         )
 
+    @_ensure_table
+    def index_create(self, name, keys, unique=False):
+        self._conn.index_create(self._col_path, name, keys, unique)
+
+    def index_drop(self, name):
+        self._conn.index_drop(self._col_path, name)
+
+    def index_list(self):
+        return self._conn.index_list(self._col_path)
+
 
 SQLiteDatabase.contractor_cls = SQLiteCollection
 
@@ -437,6 +1140,8 @@ class SQLiteCursor(AbstractCursor):
 
     def __init__(self, collection, subject):
         super().__init__(collection, subject)
+        self._batch_size = subject._batch_size
+        self._ordering = subject._ordering
 
     @property
     def _conn(self):
@@ -447,7 +1152,33 @@ class SQLiteCursor(AbstractCursor):
         return self._collection._col_path
 
     def query(self, max_scan):
-        docs = self._conn.read_all(self._col_path, max_scan)
+        plan = self._plan()
+        docs = None
+        if plan.stage == IDHACK:
+            docs = self._conn.read_keys(self._col_path, plan.keys)
+        elif plan.stage == IXSCAN:
+            docs = self._conn.read_index(
+                self._col_path, plan.index, plan.ranges,
+                self._ordering, self._batch_size
+            )
+            if docs is not None and self._stats is not None:
+                self._keys_examined(self._conn.count_index(
+                    self._col_path, plan.index, plan.ranges
+                ))
+
+        if docs is not None:
+            if max_scan:
+                docs = islice(docs, max_scan)
+            return (self._decode_doc(doc[0]) for doc in docs)
+
+        where = None
+        if sqlite_json1 and not bson.bson_used and not max_scan:
+            # Documents are JSON text
+            where = json_where(self._spec)
+
+        docs = self._conn.read_all(
+            self._col_path, max_scan, self._batch_size, where
+        )
         return (self._decode_doc(doc[0]) for doc in docs)
 
 
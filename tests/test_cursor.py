@@ -63,6 +63,21 @@ def test_cursor_limit_not_int(monty_collection):
         monty_collection.find({}, limit="5")
 
 
+def test_cursor_batch_size(monty_collection):
+    cur = monty_collection.find({}).batch_size(3)
+    assert len(list(cur)) == 20
+
+
+def test_cursor_batch_size_not_int(monty_collection):
+    with pytest.raises(TypeError):
+        monty_collection.find({}).batch_size("5")
+
+
+def test_cursor_batch_size_neg_int(monty_collection):
+    with pytest.raises(ValueError):
+        monty_collection.find({}).batch_size(-5)
+
+
 def test_cursor_cursor_type_value_err(monty_collection):
     with pytest.raises(ValueError):
         monty_collection.find({}, cursor_type=1)
@@ -147,3 +162,72 @@ def test_cursor_rewind(monty_collection):
         assert next(cur)["doc"] == 1
         cur.rewind()
         assert next(cur)["doc"] == 0
+
+
+@pytest.fixture
+def pulled_count(monty_collection, monkeypatch):
+    storage = monty_collection.database.client._storage
+    query = storage.query
+    pulled = []
+
+    def counted_query(cursor, max_scan):
+        for doc in query(cursor, max_scan):
+            pulled.append(doc)
+            yield doc
+
+    monkeypatch.setattr(storage, "query", counted_query)
+    return pulled
+
+
+def test_cursor_stream_stop_early(monty_collection, pulled_count):
+    assert monty_collection.find_one({"doc": {"$mod": [10, 2]}})["doc"] == 2
+    assert len(pulled_count) == 3
+
+    del pulled_count[:]
+    docs = list(monty_collection.find({}, skip=4, limit=3))
+    assert [d["doc"] for d in docs] == [4, 5, 6]
+    assert len(pulled_count) == 7
+
+    del pulled_count[:]
+    assert monty_collection.find({})[10]["doc"] == 10
+    assert len(pulled_count) == 11
+
+
+def test_cursor_stream_in_batches(monty_collection, pulled_count):
+    cur = monty_collection.find({}).batch_size(6)
+    assert next(cur)["doc"] == 0
+    assert cur.retrieved == 6
+    assert len(pulled_count) == 6
+    assert cur.alive
+
+    assert [d["doc"] for d in cur] == list(range(1, 20))
+    assert cur.retrieved == 20
+    assert not cur.alive
+
+
+def test_cursor_stream_count(monty_collection):
+    cur = monty_collection.find({"doc": {"$gt": 4}}, skip=2, limit=5)
+    next(cur)
+    with pytest.warns(DeprecationWarning):
+        assert cur.count() == 15
+    with pytest.warns(DeprecationWarning):
+        assert cur.count(with_limit_and_skip=True) == 5
+    assert [d["doc"] for d in cur] == [8, 9, 10, 11]
+
+
+def test_cursor_stream_write_while_iterating(monty_collection):
+    for doc in monty_collection.find({}):
+        monty_collection.update_one({"_id": doc["_id"]}, {"$inc": {"doc": 100}})
+        if doc["doc"] % 2:
+            monty_collection.delete_one({"_id": doc["_id"]})
+
+    assert monty_collection.count_documents({}) == 10
+    assert monty_collection.count_documents({"doc": {"$gte": 100}}) == 10
+
+
+def test_cursor_close_while_streaming(monty_collection):
+    cur = monty_collection.find({}).batch_size(5)
+    next(cur)
+    cur.close()
+    assert len(list(cur)) == 4
+    assert not cur.alive
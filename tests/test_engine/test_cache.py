@@ -0,0 +1,224 @@
+import itertools
+import re
+import threading
+import time
+
+import pytest
+
+from montydb.engine.cache import (
+    DEFAULT_CACHE_SIZE,
+    ParseCache,
+    parse_cache,
+    spec_key,
+)
+from montydb.engine.project import Projector
+from montydb.engine.queries import QueryFilter
+from montydb.engine.update import Updator
+from montydb.errors import OperationFailure
+
+
+@pytest.fixture
+def fresh_cache():
+    parse_cache.clear()
+    yield parse_cache
+    parse_cache.clear()
+
+
+def test_cache_spec_key():
+    assert spec_key({"a": 1}) == spec_key({"a": 1})
+    assert spec_key({"a": 1}) != spec_key({"a": 1.0})
+    assert spec_key({"a": 1}) != spec_key({"a": True})
+    assert spec_key({"a": [1]}) != spec_key({"a": (1,)})
+    assert spec_key({"a": 1, "b": 2}) != spec_key({"b": 2, "a": 1})
+    assert spec_key({"a": re.compile("x")}) == spec_key({"a": re.compile("x")})
+    assert spec_key({"a": re.compile("x")}) != spec_key({"a": re.compile("x", re.I)})
+    assert spec_key({"a": {1, 2}}) is None
+
+
+def test_cache_lru():
+    cache = ParseCache(maxsize=2)
+    parsed = []
+
+    def parse(spec):
+        parsed.append(spec)
+        return dict(spec)
+
+    a, b = {"a": [1]}, {"b": [1]}
+    # Cached when seen the second time
+    assert cache.get("query", parse, a) == a
+    assert cache.get("query", parse, a) == a
+    assert cache.get("query", parse, a) == a
+    assert len(parsed) == 2
+    assert cache.info() == {"hits": 1, "misses": 2, "size": 1, "maxsize": 2}
+
+    cache.get("update", parse, a)
+    cache.get("update", parse, a)
+    cache.get("query", parse, a)  # "query" a is now recent
+    cache.get("query", parse, b)
+    cache.get("query", parse, b)  # evicts "update" a
+    cache.get("update", parse, a)
+    assert len(parsed) == 7
+    assert cache.info() == {"hits": 2, "misses": 7, "size": 2, "maxsize": 2}
+
+    cache.resize(1)
+    assert cache.info()["size"] == 1
+
+    cache.resize(0)
+    cache.get("query", parse, a)
+    cache.get("query", parse, a)
+    assert len(parsed) == 9
+    assert cache.info() == {"hits": 2, "misses": 7, "size": 0, "maxsize": 0}
+
+    cache.clear()
+    assert cache.info() == {"hits": 0, "misses": 0, "size": 0, "maxsize": 0}
+
+
+def test_cache_plain_spec_not_cached():
+    cache = ParseCache()
+    for _ in range(3):
+        cache.get("query", dict, {"_id": 1, "a": "x", "b": None})
+        cache.get("projection", dict, {"a": 1})
+    assert cache.info() == {"hits": 0, "misses": 0, "size": 0, "maxsize": 1024}
+
+    cache.get("query", dict, {"a.$": 1})
+    cache.get("query", dict, {"a": {"$gt": 1}})
+    assert cache.info()["misses"] == 2
+
+
+def test_cache_miss_cost(fresh_cache):
+    # Specs that differ in every call should cost about the same as parsing
+    # them without cache.
+    counter = itertools.count()
+
+    def run():
+        start = time.perf_counter()
+        for _ in range(500):
+            i = next(counter)
+            QueryFilter({"_id": i})
+            QueryFilter({
+                "a": {"$in": [i, "x"]},
+                "b": {"$gt": i, "$lt": i + 5},
+                "$or": [{"c": i}, {"d.e": {"$exists": True}}],
+            })
+        return time.perf_counter() - start
+
+    try:
+        cached = min(run() for _ in range(3))
+        parse_cache.resize(0)
+        uncached = min(run() for _ in range(3))
+    finally:
+        parse_cache.resize(DEFAULT_CACHE_SIZE)
+
+    assert cached < uncached * 2
+
+
+def test_cache_parse_copied_spec():
+    cache = ParseCache()
+    spec = {"a": [1]}
+
+    assert cache.get("query", lambda spec: spec, spec) is spec  # Not cached
+    result = cache.get("query", lambda spec: spec, spec)
+    assert result == spec and result is not spec
+    assert result["a"] is not spec["a"]
+
+    spec["a"].append(2)
+    assert cache.get("query", lambda spec: spec, {"a": [1]}) == {"a": [1]}
+
+
+def test_cache_unhashable_not_cached(fresh_cache):
+    spec = {"a": {"$in": [{1, 2}]}}
+    QueryFilter(spec)
+    QueryFilter(spec)
+    assert fresh_cache.info() == {"hits": 0, "misses": 0, "size": 0, "maxsize": 1024}
+
+
+def test_cache_query_filter(fresh_cache):
+    QueryFilter({"a": {"$gt": 1}})  # Seen once, not cached yet
+    spec = {"a": {"$gt": 1}}
+    qf_a = QueryFilter(spec)
+    qf_b = QueryFilter({"a": {"$gt": 1}})
+
+    assert qf_a.conditions is qf_b.conditions
+    assert fresh_cache.info()["hits"] == 1
+
+    spec["a"]["$gt"] = 10
+    assert QueryFilter({"a": {"$gt": 1}})({"a": 5})
+    assert not QueryFilter(spec)({"a": 5})
+
+    assert qf_a({"a": 5})
+    assert not qf_b({"a": 0})
+    assert qf_a.fieldwalker.doc == {"a": 5}
+    assert qf_b.fieldwalker.doc == {"a": 0}
+
+
+def test_cache_query_filter_parse_error(fresh_cache):
+    for _ in range(2):
+        with pytest.raises(OperationFailure) as exc:
+            QueryFilter({"a": {"$in": 1}})
+        assert str(exc.value) == "$in needs an array"
+    assert fresh_cache.info() == {"hits": 0, "misses": 2, "size": 0, "maxsize": 1024}
+
+
+def test_cache_elemMatch_parsed_once(fresh_cache):
+    docs = [{"a": [{"b": i}, {"b": i + 1}]} for i in range(10)]
+    for spec in [
+        {"a": {"$elemMatch": {"b": 3}}},
+        {"a": {"$all": [{"$elemMatch": {"b": 3}}, {"$elemMatch": {"b": 4}}]}},
+    ]:
+        QueryFilter(spec)
+        queryfilter = QueryFilter(spec)
+        info = fresh_cache.info()
+        assert sum(1 for doc in docs if queryfilter(doc)) in (1, 2)
+        assert fresh_cache.info() == info
+
+
+def test_cache_projector_positional(fresh_cache):
+    proj = {"a.$": 1}
+    Projector(proj, QueryFilter({"a": 1}))
+    Projector(proj, QueryFilter({"a": 2}))
+    Projector(proj, QueryFilter({"a": 3}))
+    assert fresh_cache.info()["hits"] == 1
+
+    with pytest.raises(OperationFailure) as exc:
+        Projector(proj, QueryFilter({"b": 1}))
+    assert exc.value.code == 2
+    assert "does not match the query document" in str(exc.value)
+
+
+def test_cache_updator_set_on_insert(fresh_cache):
+    from montydb.engine.field_walker import FieldWalker
+
+    spec = {"$set": {"a": 1}, "$setOnInsert": {"b": 1}}
+
+    fieldwalker = FieldWalker({})
+    Updator(spec)(fieldwalker, do_insert=True)
+    assert fieldwalker.doc == {"a": 1, "b": 1}
+
+    for _ in range(2):
+        fieldwalker = FieldWalker({})
+        Updator(spec)(fieldwalker)
+        assert fieldwalker.doc == {"a": 1}
+
+    assert fresh_cache.info()["hits"] == 1
+
+
+def test_cache_query_filter_threads(fresh_cache):
+    docs = [{"a": i, "b": [i]} for i in range(200)]
+    results = []
+
+    def run(spec):
+        for _ in range(20):
+            queryfilter = QueryFilter(spec)
+            results.append(sum(1 for doc in docs if queryfilter(doc)))
+
+    threads = [
+        threading.Thread(target=run, args=({"a": {"$lt": 50}},)),
+        threading.Thread(target=run, args=({"b": {"$lt": 50}},)),
+        threading.Thread(target=run, args=({"a": {"$lt": 50}},)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [50] * 60
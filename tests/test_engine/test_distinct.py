@@ -106,3 +106,53 @@ def test_distinct_4(monty_distinct, mongo_distinct, mongo_version):
         ]
         assert mongo_dist == expected
         assert monty_dist == mongo_dist
+
+
+def test_distinct_5(monty_distinct):
+    docs = [
+        {"a": 1},
+        {"a": 1.0},
+        {"a": [1, 2, 2]},
+        {"a": {"x": 1, "y": 2}},
+        {"a": {"y": 2, "x": 1}},
+        {"a": {"x": 1.0, "y": 2}},
+        {"a": [[1], [1.0]]},
+        {"a": None},
+        {"b": 1},
+        {"a": "1"},
+    ]
+    key = "a"
+    filter = None
+
+    monty_dist = monty_distinct(docs, key, filter)
+
+    expected = [None, 1, 2, "1", {"x": 1, "y": 2}, {"y": 2, "x": 1}, [1]]
+    assert monty_dist == expected
+    assert [type(v) for v in monty_dist[:3]] == [type(None), int, int]
+    assert list(monty_dist[5]) == ["y", "x"]
+
+
+def test_distinct_6(monty_distinct, mongo_distinct):
+    docs = [
+        {"a": [{"b": 1}, {"b": [5, 2]}, 7]},
+        {"a": {"0": {"b": 3}, "b": 4}},
+        {"a": [[{"b": 6}], {"b": 2}]},
+        {"a": [{"b": [[8]]}]},
+    ]
+    filter = {"a": {"$exists": True}}
+
+    for key in ("a.b", "a.0", "a.0.b", "a.1.b"):
+        monty_dist = monty_distinct(docs, key, filter)
+        mongo_dist = mongo_distinct(docs, key, filter)
+
+        assert monty_dist == mongo_dist
+
+
+def test_distinct_7(monty_distinct):
+    docs = [{"a": i % 500, "b": [i, float(i)]} for i in range(2000)]
+
+    monty_dist = monty_distinct(docs, "a", None)
+    assert monty_dist == list(range(500))
+
+    monty_dist = monty_distinct(docs, "b", {"a": {"$lt": 10}})
+    assert monty_dist == [i for i in range(2000) if i % 500 < 10]
@@ -1,4 +1,4 @@
-from montydb.engine.field_walker import FieldWalker
+from montydb.engine.field_walker import FieldWalker, iter_flat_values
 
 
 def test_fieldwalker_value_get_1():
@@ -284,3 +284,22 @@ def test_fieldwalker_clean_result_1():
         fieldwalker.go("a").get()
 
         assert fieldwalker.value == [5]
+
+
+def test_fieldwalker_iter_flat_values():
+    docs = [
+        {"a": 1},
+        {"a": [1, [2], {"b": 3}]},
+        {"a": {"b": [4, {"c": 5}]}},
+        {"a": [{"b": 1}, {"b": [2, [3]]}, {"c": 0}, [{"b": 9}]]},
+        {"a": [[0, 1], {"0": "x"}]},
+        {"a": {"0": [7, 8]}},
+        {"a": None},
+        {},
+    ]
+    paths = ["a", "a.b", "a.b.c", "a.0", "a.1", "a.0.b", "a.1.b", "a.b.1", "x"]
+    for doc in docs:
+        for path in paths:
+            field_value = FieldWalker(doc).go(path).get().value
+            expected = list(field_value.iter_flat())
+            assert list(iter_flat_values(doc, path)) == expected, (doc, path)
@@ -0,0 +1,179 @@
+import re
+import random
+from datetime import datetime, timedelta
+
+from montydb.engine import keystring
+from montydb.types import bson
+from montydb.types.tz_util import utc
+
+from ..conftest import skip_if_no_bson
+
+
+def assert_ascending(values):
+    keys = [keystring.encode(v) for v in values]
+    for i in range(len(keys) - 1):
+        assert keys[i] < keys[i + 1], (values[i], values[i + 1])
+
+
+def test_keystring_type_order():
+    assert_ascending([
+        None,
+        -1,
+        "",
+        {},
+        [],
+        b"",
+        bson.ObjectId(),
+        False,
+        True,
+        datetime(2000, 1, 1),
+        re.compile("a"),
+    ])
+
+
+@skip_if_no_bson
+def test_keystring_type_order_bson():
+    assert_ascending([
+        bson.MinKey(),
+        None,
+        bson.Decimal128("Infinity"),
+        "a",
+        {"a": 1},
+        [1],
+        bson.Binary(b"a", 5),
+        bson.ObjectId(),
+        True,
+        datetime(2000, 1, 1),
+        bson.Timestamp(1, 1),
+        bson.Regex("a", "i"),
+        bson.Code("a"),
+        bson.Code("a", {}),
+        bson.MaxKey(),
+    ])
+
+
+def test_keystring_numbers():
+    assert_ascending([
+        float("-inf"),
+        -1e300,
+        -10,
+        -1.5,
+        -1,
+        -0.5,
+        -1e-300,
+        0,
+        1e-300,
+        0.1,
+        1,
+        1.5,
+        2,
+        10,
+        100,
+        2 ** 63,
+        1e300,
+        float("inf"),
+    ])
+
+
+def test_keystring_numbers_random():
+    numbers = [random.uniform(-1e6, 1e6) for _ in range(200)]
+    numbers += [random.randint(-10 ** 6, 10 ** 6) for _ in range(200)]
+    numbers.sort()
+    keys = sorted(numbers, key=keystring.encode)
+    assert keys == numbers
+
+
+def test_keystring_numbers_equal():
+    assert keystring.encode(1) == keystring.encode(1.0)
+    assert keystring.encode(0) == keystring.encode(-0.0)
+    assert keystring.encode(100) == keystring.encode(1e2)
+
+
+def test_keystring_nan():
+    nan = keystring.encode(float("nan"))
+    assert nan < keystring.encode(float("-inf"))
+    assert nan > keystring.encode(None)
+
+
+@skip_if_no_bson
+def test_keystring_decimal128():
+    D = bson.Decimal128
+    assert keystring.encode(D("1.00")) == keystring.encode(1)
+    assert keystring.encode(D("-0")) == keystring.encode(0)
+    assert keystring.encode(D("0.1")) < keystring.encode(0.1)
+    assert keystring.encode(bson.Int64(5)) == keystring.encode(D("5"))
+
+    for nan in bson.decimal128_NaN_ls:
+        assert keystring.encode(nan) == keystring.encode(float("nan"))
+
+    assert_ascending([
+        D("NaN"),
+        D("-Infinity"),
+        D("-1E+6144"),
+        D("-1E-6176"),
+        D("0"),
+        D("1E-6176"),
+        D("9.999999999999999999999999999999999E+6144"),
+        D("Infinity"),
+    ])
+
+
+def test_keystring_strings():
+    assert_ascending(["", "\x00", "\x00\x00", "\x01", "a", "a\x00", "ab", "b"])
+    assert_ascending(["Z", "a", "é", "中"])
+
+
+def test_keystring_documents():
+    assert_ascending([
+        {},
+        {"b": None},
+        {"b": 1},
+        {"a": "x"},
+        {"b": "x"},
+        {"b": "x", "a": 1},
+        {"a": {}},
+    ])
+    assert keystring.encode({"a": 1}) == keystring.encode({"a": 1.0})
+    assert keystring.encode({"a": 1, "b": 2}) != keystring.encode({"b": 2, "a": 1})
+    # Booleans are one type, compared by field name before value
+    assert_ascending([{"a": False}, {"a": True}, {"b": False}, {"b": True}])
+
+
+def test_keystring_arrays():
+    assert_ascending([[], [None], [1], [1, 1], [1, 2], [2], ["a"]])
+    assert keystring.encode([1, 2]) == keystring.encode((1, 2.0))
+
+
+def test_keystring_binary():
+    assert_ascending([b"", b"b", b"aa", b"ab", b"b\x00\x00"])
+
+
+def test_keystring_datetime():
+    base = datetime(1970, 1, 1)
+    assert_ascending([
+        base - timedelta(days=1),
+        base - timedelta(microseconds=1),
+        base,
+        base + timedelta(milliseconds=1),
+        datetime(2020, 1, 1),
+    ])
+
+    aware = datetime(2020, 1, 1, 8, tzinfo=utc)
+    assert keystring.encode(aware) == keystring.encode(datetime(2020, 1, 1, 8))
+
+
+def test_keystring_invert():
+    values = [None, -1, 0, 2.5, "", "a", "a\x00", {}, {"a": [1]}, [], [1]]
+    keys = [keystring.encode(v) for v in values]
+    inverted = sorted(keys, key=keystring.invert)
+    assert inverted == sorted(keys, reverse=True)
+
+
+def test_keystring_compound():
+    pairs = [(1, "b"), (1, "a\x00"), (1, "a"), ("a", 0), (None, 2), (0.5, "z")]
+    keys = sorted(
+        pairs,
+        key=lambda p: keystring.encode(p[0]) + keystring.encode(p[1]),
+    )
+    assert keys == [(None, 2), (0.5, "z"), (1, "a"), (1, "a\x00"), (1, "b"),
+                    ("a", 0)]
@@ -0,0 +1,122 @@
+import re
+import pytest
+from datetime import datetime
+
+from montydb.engine.field_walker import FieldWalker
+from montydb.engine.queries import QueryFilter
+from montydb.types import bson
+
+from ...conftest import skip_if_no_bson
+
+
+DOCS = [
+    {},
+    {"a": None},
+    {"a": 1},
+    {"a": 1.0},
+    {"a": 5.5},
+    {"a": float("nan")},
+    {"a": True},
+    {"a": "1"},
+    {"a": "xyz"},
+    {"a": datetime(2020, 1, 1)},
+    {"a": {"b": 1}},
+    {"a": {"b": "x", "c": None}},
+    {"a": {"b": {"c": 2}}},
+    {"a": [1, 2]},
+    {"a": [{"b": 1}, {"b": 6}]},
+    {"a": {"b": [1, 5]}},
+    {"a": []},
+    {"a": "x", "b": 3},
+    {"a": 2, "b": {"0": "z"}},
+]
+
+
+SPECS = [
+    {"a": 1},
+    {"a": "1"},
+    {"a": None},
+    {"a": {"b": 1}},
+    {"a.b": 1},
+    {"a.b.c": 2},
+    {"a.c": None},
+    {"a": {"$eq": 1.0}},
+    {"a": {"$ne": 1}},
+    {"a": {"$ne": None}},
+    {"a": {"$gt": 1}},
+    {"a": {"$gte": 1}},
+    {"a": {"$lt": 5.5}},
+    {"a": {"$lte": "x"}},
+    {"a": {"$gt": float("nan")}},
+    {"a": {"$gt": None}},
+    {"a": {"$gt": datetime(2000, 1, 1)}},
+    {"a.b": {"$gt": 0, "$lt": 5}},
+    {"a": {"$exists": True}},
+    {"a.b": {"$exists": False}},
+    {"a": {"$in": [1, "xyz", None]}},
+    {"a": {"$nin": [1, 2]}},
+    {"a": {"$type": "string"}},
+    {"a": {"$regex": "^x"}},
+    {"a": re.compile("Y", re.I)},
+    {"a": {"$not": {"$gt": 1}}},
+    {"a": {"$size": 0}},
+    {"a": {"$all": [1]}},
+    {"a": {"$elemMatch": {"$gt": 1}}},
+    {"a": {"$elemMatch": {"b": 6}}},
+    {"a": {"$all": [{"$elemMatch": {"b": 1}}, {"$elemMatch": {"b": 6}}]}},
+    {"a": {"$mod": [2, 0]}},
+    {"b.0": "z"},
+    {"a": "x", "b": {"$gte": 3}},
+    {"$or": [{"a": 1}, {"a.b": "x"}]},
+    {"$and": [{"a": {"$exists": True}}, {"a": {"$ne": "1"}}]},
+    {"$nor": [{"a": 1}, {"b": 3}]},
+    {"$or": [{"a": {"$gt": 100}}, {"a.b": {"$lt": 2}}]},
+]
+
+
+def outcome(func, *args):
+    try:
+        return bool(func(*args))
+    except Exception as e:
+        return type(e)
+
+
+def walk(queryfilter, doc):
+    fieldwalker = FieldWalker(doc)
+    return all(cond(fieldwalker) for cond in queryfilter.conditions)
+
+
+def assert_same_as_fieldwalker(spec, docs):
+    queryfilter = QueryFilter(spec)
+    for doc in docs:
+        expected = outcome(walk, queryfilter, doc)
+        assert outcome(queryfilter, doc) == expected, (spec, doc)
+        if expected is True:
+            assert queryfilter.fieldwalker.doc is doc
+
+
+@pytest.mark.parametrize("spec", SPECS)
+def test_query_plan_same_as_fieldwalker(spec):
+    assert_same_as_fieldwalker(spec, DOCS)
+
+
+@skip_if_no_bson
+def test_query_plan_same_as_fieldwalker_bson():
+    docs = DOCS + [
+        {"a": bson.Int64(1)},
+        {"a": bson.Decimal128("1")},
+        {"a": bson.Decimal128("NaN")},
+        {"a": bson.Decimal128("Infinity")},
+        {"a": bson.MinKey()},
+        {"a": bson.MaxKey()},
+        {"a": bson.Code("x")},
+    ]
+    specs = SPECS + [
+        {"a": bson.Decimal128("1")},
+        {"a": {"$gte": bson.Decimal128("NaN")}},
+        {"a": {"$lte": bson.Decimal128("Infinity")}},
+        {"a": {"$gt": bson.MinKey()}},
+        {"a": {"$lt": bson.MaxKey()}},
+    ]
+    for spec in specs:
+        assert_same_as_fieldwalker(spec, docs)
@@ -2,6 +2,9 @@
 import pytest
 import re
 
+from datetime import datetime
+
+from montydb.engine.queries import QueryFilter
 from montydb.errors import OperationFailure
 from montydb.types import PY3, bson
 
@@ -237,3 +240,73 @@ def test_qop_in_15(monty_find, mongo_find):
         assert next(mongo_c) == next(monty_c)
         mongo_c.rewind()
         assert next(mongo_c)["_id"] == 1
+
+
+def test_qop_in_16(monty_find, mongo_find):
+    docs = [
+        {"a": f"sku-{i}"} for i in range(0, 100, 3)
+    ] + [
+        {"a": [f"sku-{i}", i]} for i in range(100, 200, 7)
+    ]
+    spec = {"a": {"$in": [f"sku-{i}" for i in range(0, 150, 2)]}}
+
+    monty_c = monty_find(docs, spec)
+    mongo_c = mongo_find(docs, spec)
+
+    assert count_documents(mongo_c, spec) == 17 + 4
+    assert count_documents(monty_c, spec) == count_documents(mongo_c, spec)
+    assert sorted(d["_id"] for d in monty_c) == sorted(d["_id"] for d in mongo_c)
+
+
+IN_VALUES = [
+    None, 0, 1, 1.0, 2.5, -0.0, float("nan"), float("inf"), 2 ** 63,
+    True, False, "", "1", "a", datetime(2020, 1, 1), b"1",
+    {"b": 1}, [1], [], [1, 2],
+]
+
+
+def outcome(queryfilter, doc):
+    try:
+        return bool(queryfilter(doc))
+    except Exception as e:
+        return type(e)
+
+
+def assert_in_as_or_eq(values, query):
+    in_filter = QueryFilter({"a": {"$in": query}})
+    nin_filter = QueryFilter({"a": {"$nin": query}})
+    or_filter = QueryFilter({"$or": [{"a": q} for q in query]})
+    for value in values:
+        for doc in ({"a": value}, {"a": [value, "x"]}, {"a": [{"a": value}]}):
+            expected = outcome(or_filter, doc)
+            if expected not in (True, False):
+                # e.g. comparing Decimal128 with bool in `_eq_match`
+                continue
+            assert outcome(in_filter, doc) is expected, (doc, query)
+            assert outcome(nin_filter, doc) is not expected, (doc, query)
+
+
+def test_qop_in_17():
+    for i in range(len(IN_VALUES)):
+        assert_in_as_or_eq(IN_VALUES, [IN_VALUES[i]])
+        assert_in_as_or_eq(IN_VALUES, IN_VALUES[:i])
+        assert_in_as_or_eq(IN_VALUES, IN_VALUES[i:])
+
+
+@skip_if_no_bson
+def test_qop_in_18():
+    values = IN_VALUES + [
+        bson.Int64(1),
+        bson.Decimal128("1"),
+        bson.Decimal128("2.5"),
+        bson.Decimal128("0.1"),
+        bson.Decimal128("NaN"),
+        0.1,
+        bson.ObjectId(b"0" * 12),
+        bson.ObjectId(b"1" * 12),
+        bson.Code("a"),
+    ]
+    for i in range(len(values)):
+        assert_in_as_or_eq(values, [values[i]])
+        assert_in_as_or_eq(values, values[:i])
+        assert_in_as_or_eq(values, values[i:])
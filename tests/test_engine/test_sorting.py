@@ -6,6 +6,8 @@ from montydb.types import bson
 from datetime import datetime
 
 from montydb.errors import OperationFailure as monty_op_err
+from montydb.engine.field_walker import FieldWalker
+from montydb.engine.queries import ordering, ordering_top
 from pymongo.errors import OperationFailure as mongo_op_err
 
 from ..conftest import skip_if_no_bson
@@ -403,3 +405,88 @@ def test_sort_21(monty_sort, mongo_sort):
 
     # ignore comparing error code
     # assert mongo_err.value.code == monty_err.value.code
+
+
+ORDERING_DOCS = [
+    {"a": 4, "b": "x"},
+    {"a": [1, 9], "b": "y"},
+    {"a": [], "b": "x"},
+    {"a": None, "b": "y"},
+    {"b": "x"},
+    {"a": 4.0, "b": None},
+    {"a": [4, [0]], "b": ["x", "z"]},
+    {"a": {"c": 1}, "b": "y"},
+    {"a": "4", "b": "x"},
+    {"a": [None, 2], "b": []},
+    {"a": [[]], "b": "x"},
+    {"a": {"c": [3, 1]}, "b": "y"},
+    {"a": 9, "b": {"c": 1}},
+    {"a": [9], "b": "x"},
+    {"a": True},
+    {"a": [{"c": 2}, {"c": 0}], "b": "z"},
+]
+
+
+@pytest.mark.parametrize("order", [
+    {"a": 1},
+    {"a": -1},
+    {"a": 1, "b": -1},
+    {"b": -1, "a": 1},
+    {"b": 1, "a": -1},
+    {"a.c": 1, "b": 1},
+    {"a.c": -1, "a": -1},
+    {"a.0": 1},
+])
+def test_sort_ordering_top(order):
+    fieldwalkers = [FieldWalker(doc) for doc in ORDERING_DOCS]
+    expected = ordering(fieldwalkers, order)
+
+    for count in (1, 3, 7, len(fieldwalkers), len(fieldwalkers) + 5):
+        top = ordering_top(iter(fieldwalkers), order, count)
+        assert [fw.doc for fw in top] == [fw.doc for fw in expected[:count]]
+
+
+def test_sort_ordering_top_bad_specifier():
+    with pytest.raises(monty_op_err):
+        ordering_top(iter([]), {"a": 3}, 1)
+
+
+def test_sort_with_limit(monty_sort, mongo_sort):
+    docs = [
+        {"a": [3, 1]},
+        {"a": None},
+        {"a": []},
+        {},
+        {"a": 2},
+        {"a": [5]},
+    ]
+    sort = [("a", -1)]
+
+    monty_c = monty_sort(docs, sort).skip(1).limit(3)
+    mongo_c = mongo_sort(docs, sort).skip(1).limit(3)
+
+    assert [d["_id"] for d in mongo_c] == [d["_id"] for d in monty_c]
+
+
+def test_sort_multi_fields_mixed_directions(monty_sort, mongo_sort):
+    docs = [
+        {"a": 1, "b": [2, 8], "c": "x"},
+        {"a": [1, 5], "b": 8, "c": "y"},
+        {"a": 1, "b": None, "c": "x"},
+        {"a": None, "b": [], "c": "z"},
+        {"b": 2, "c": "x"},
+        {"a": 1.0, "b": 8, "c": "x"},
+        {"a": [], "b": 2},
+        {"a": 5, "b": {"d": 1}, "c": "y"},
+        {"a": 1, "b": [8], "c": "y"},
+    ]
+    for sort in (
+        [("a", 1), ("b", -1), ("c", 1)],
+        [("a", -1), ("b", 1), ("c", -1)],
+        [("c", -1), ("a", 1)],
+        [("b", -1), ("a", -1)],
+    ):
+        monty_c = monty_sort(docs, sort)
+        mongo_c = mongo_sort(docs, sort)
+
+        assert [d["_id"] for d in mongo_c] == [d["_id"] for d in monty_c]
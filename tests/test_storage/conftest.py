@@ -0,0 +1,37 @@
+import os
+import shutil
+import pytest
+
+import montydb
+
+
+@pytest.fixture
+def storage_client(gettempdir, use_bson):
+    """Spawn a client on a fresh repository of given storage engine"""
+    repos = []
+    clients = []
+
+    def _storage_client(storage, **storage_kwargs):
+        if storage == "memory":
+            repo = ":memory:"
+        else:
+            repo = os.path.join(gettempdir, f"monty.{storage}.{len(repos)}")
+            if os.path.isdir(repo):
+                shutil.rmtree(repo)
+            repos.append(repo)
+
+        montydb.set_storage(repo, storage, use_bson=use_bson, **storage_kwargs)
+        client = montydb.MontyClient(repo)
+        for db in client.list_database_names():
+            client.drop_database(db)
+        clients.append(client)
+        return client
+
+    yield _storage_client
+
+    for client in clients:
+        for db in client.list_database_names():
+            client.drop_database(db)
+        client.close()
+    for repo in repos:
+        shutil.rmtree(repo, ignore_errors=True)
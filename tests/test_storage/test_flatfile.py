@@ -0,0 +1,199 @@
+import os
+import pytest
+
+import montydb
+from montydb.types import bson
+from montydb.errors import DuplicateKeyError
+
+
+def _paths(client, db_name, col_name):
+    base = os.path.join(client.address, db_name, col_name)
+    return base + ".json", base + ".jsonl"
+
+
+def test_flatfile_append_to_journal(storage_client):
+    client = storage_client("flatfile", journal_ratio=1000)
+    col = client.db.col
+    col_file, log_file = _paths(client, "db", "col")
+
+    # Compacted since the collection file was empty
+    col.insert_one({"_id": 0})
+    assert not os.path.isfile(log_file)
+    size = os.path.getsize(col_file)
+
+    col.insert_one({"_id": 1})
+    col.delete_one({"_id": 0})
+
+    assert os.path.getsize(col_file) == size
+    with open(log_file) as fp:
+        assert len(fp.readlines()) == 2
+
+
+def test_flatfile_replay_journal(storage_client):
+    client = storage_client("flatfile", journal_ratio=1000)
+    col = client.db.col
+    col.insert_many([{"_id": i, "a": i} for i in range(5)])
+    col.delete_one({"_id": 2})
+    col.update_one({"_id": 3}, {"$set": {"a": "x"}})
+
+    # Not closed, load from another client
+    other = montydb.MontyClient(client.address)
+    docs = list(other.db.col.find())
+    assert [doc["_id"] for doc in docs] == [0, 1, 3, 4]
+    assert docs[2]["a"] == "x"
+
+
+def test_flatfile_replay_incomplete_journal(storage_client):
+    client = storage_client("flatfile", journal_ratio=1000)
+    client.db.col.insert_many([{"_id": 0}, {"_id": 1}])
+    _, log_file = _paths(client, "db", "col")
+    with open(log_file, "a") as fp:
+        fp.write('{"put": {"_id": ')
+
+    other = montydb.MontyClient(client.address)
+    assert other.db.col.count_documents({}) == 2
+
+
+def test_flatfile_append_after_incomplete_journal(storage_client):
+    client = storage_client("flatfile", journal_ratio=1000)
+    client.db.col.insert_many([{"_id": 0}, {"_id": 1}])
+    _, log_file = _paths(client, "db", "col")
+    with open(log_file, "a") as fp:
+        fp.write('{"put": {"_id": 1')
+
+    other = montydb.MontyClient(client.address)
+    other.db.col.insert_one({"_id": 102})
+    with open(log_file) as fp:
+        assert fp.read().splitlines()[-1].startswith('{"put": {"_id": ')
+
+    other = montydb.MontyClient(client.address)
+    assert [doc["_id"] for doc in other.db.col.find()] == [0, 1, 102]
+
+
+def test_flatfile_compact_by_ratio(storage_client):
+    client = storage_client("flatfile", journal_ratio=0.5)
+    col = client.db.col
+    col_file, log_file = _paths(client, "db", "col")
+
+    col.insert_one({"_id": 0})
+    assert not os.path.isfile(log_file)
+    assert os.path.getsize(col_file) > 0
+
+    for i in range(1, 20):
+        col.insert_one({"_id": i})
+        if os.path.isfile(log_file):
+            assert os.path.getsize(log_file) <= os.path.getsize(col_file) * 0.5
+
+    other = montydb.MontyClient(client.address)
+    assert other.db.col.count_documents({}) == 20
+
+
+def test_flatfile_compact_on_close(storage_client):
+    client = storage_client("flatfile", journal_ratio=1000)
+    client.db.col.insert_many([{"_id": 0}, {"_id": 1}])
+    col_file, log_file = _paths(client, "db", "col")
+    client.close()
+
+    assert not os.path.isfile(log_file)
+    with open(col_file) as fp:
+        assert fp.read().startswith("[\n")
+
+    client = montydb.MontyClient(client.address)
+    assert client.db.col.count_documents({}) == 2
+
+
+def test_flatfile_drop_collection_with_journal(storage_client):
+    client = storage_client("flatfile", journal_ratio=1000)
+    db = client.db
+    db.col.insert_one({"_id": 0})
+    assert db.list_collection_names() == ["col"]
+
+    db.drop_collection("col")
+    assert db.list_collection_names() == []
+    assert not any(os.path.isfile(p) for p in _paths(client, "db", "col"))
+
+
+def test_flatfile_flush_once_per_many(storage_client, monkeypatch):
+    from montydb.storage.flatfile import FlatFileKVEngine
+
+    client = storage_client("flatfile")
+    col = client.db.col
+    col.insert_many([{"_id": i, "a": i % 2} for i in range(20)])
+
+    flushed = []
+    flush = FlatFileKVEngine.flush
+    monkeypatch.setattr(
+        FlatFileKVEngine, "flush", lambda self: flushed.append(flush(self))
+    )
+
+    col.update_many({"a": 0}, {"$set": {"b": 1}})
+    assert len(flushed) == 1
+    col.delete_many({"a": 1})
+    assert len(flushed) == 2
+
+    other = montydb.MontyClient(client.address)
+    assert other.db.col.count_documents({}) == 10
+    assert other.db.col.count_documents({"b": 1}) == 10
+
+
+def test_flatfile_delete_many_cached(storage_client):
+    client = storage_client("flatfile", cache_modified=5)
+    col = client.db.col
+    col.insert_many([{"_id": i} for i in range(20)])
+
+    def count_on_disk():
+        other = montydb.MontyClient(client.address)
+        return other.db.col.count_documents({})
+
+    col.delete_many({"_id": {"$lt": 3}})
+    assert count_on_disk() == 20  # cached
+    col.delete_many({"_id": {"$lt": 8}})
+    assert count_on_disk() == 12
+
+
+def test_flatfile_load_pretty_formats(storage_client):
+    client = storage_client("flatfile")
+    client.db.col.insert_one({"_id": "x"})
+    client.close()
+
+    db_path = os.path.join(client.address, "db")
+    with open(os.path.join(db_path, "indented.json"), "w") as fp:
+        fp.write(
+            '[\n  {\n    "_id": 1,\n    "a": {\n      "b": [1, 2]\n    }\n  },\n'
+            '  {\n    "_id": 2\n  }\n]'
+        )
+    with open(os.path.join(db_path, "oneline.json"), "w") as fp:
+        fp.write('[{"_id": 1}, {"_id": 2}]')
+    with open(os.path.join(db_path, "empty.json"), "w") as fp:
+        fp.write("[]")
+
+    client = montydb.MontyClient(client.address)
+    db = client.db
+    assert list(db.indented.find()) == [{"_id": 1, "a": {"b": [1, 2]}}, {"_id": 2}]
+    assert list(db.oneline.find()) == [{"_id": 1}, {"_id": 2}]
+    assert list(db.empty.find()) == []
+
+    db.oneline.insert_one({"_id": 3})
+    with pytest.raises(DuplicateKeyError):
+        db.indented.insert_one({"_id": 2})
+
+
+def test_flatfile_load_keep_stored_form(storage_client, use_bson):
+    client = storage_client("flatfile")
+    col = client.db.col
+    col.insert_many([{"_id": bson.ObjectId(), "a": i} for i in range(3)])
+    client.close()
+
+    client = montydb.MontyClient(client.address)
+    col = client.db.col
+    doc = col.find_one({"a": 1})
+    flatfile = client._storage._cache_manager["db"]["col"]
+    stored = list(flatfile.read().values())
+    if not use_bson:
+        col_file, _ = _paths(client, "db", "col")
+        with open(col_file) as fp:
+            lines = [line.rstrip(",\n").encode() for line in fp.readlines()]
+        assert stored == lines[1:-1]
+
+    with pytest.raises(DuplicateKeyError):
+        col.insert_one({"_id": doc["_id"]})
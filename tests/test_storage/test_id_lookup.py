@@ -0,0 +1,123 @@
+import pytest
+
+from montydb.types import bson
+from montydb.storage import AbstractCursor, _id_lookup_keys
+
+
+STORAGES = ["memory", "flatfile", "sqlite", "lightning"]
+
+
+@pytest.fixture
+def lookup_client(storage_client, monkeypatch):
+    decoded = []
+    decode_doc = AbstractCursor._decode_doc
+
+    def counted(self, doc):
+        decoded.append(doc)
+        return decode_doc(self, doc)
+
+    monkeypatch.setattr(AbstractCursor, "_decode_doc", counted)
+
+    def _lookup_client(storage):
+        client = storage_client(storage)
+        col = client.db.col
+        col.insert_many([{"_id": f"s{i}", "a": i} for i in range(20)])
+        col.insert_many([{"_id": i, "a": i} for i in range(20)])
+        decoded.clear()
+        return col, decoded
+
+    return _lookup_client
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_id_lookup_eq(lookup_client, storage):
+    col, decoded = lookup_client(storage)
+
+    assert col.find_one({"_id": "s3"}) == {"_id": "s3", "a": 3}
+    assert len(decoded) == 1
+    assert list(col.find({"_id": "s3", "a": 4})) == []
+    assert list(col.find({"_id": "none"})) == []
+    assert len(decoded) == 2
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_id_lookup_in(lookup_client, storage):
+    col, decoded = lookup_client(storage)
+
+    spec = {"_id": {"$in": ["s1", "s5", "s5", "none"]}, "a": {"$gt": 1}}
+    assert list(col.find(spec)) == [{"_id": "s5", "a": 5}]
+    assert len(decoded) == 2
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_id_lookup_write_ops(lookup_client, storage):
+    col, decoded = lookup_client(storage)
+
+    col.update_one({"_id": "s2"}, {"$set": {"b": 1}})
+    col.replace_one({"_id": "s4"}, {"a": "x"})
+    col.delete_one({"_id": "s6"})
+    assert len(decoded) == 3
+
+    assert col.find_one({"_id": "s2"}) == {"_id": "s2", "a": 2, "b": 1}
+    assert col.find_one({"_id": "s4"}) == {"_id": "s4", "a": "x"}
+    assert col.find_one({"_id": "s6"}) is None
+    assert col.count_documents({}) == 39
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_id_lookup_single_document_ops(lookup_client, storage):
+    col, _ = lookup_client(storage)
+
+    # Documents are fetched in `_id` order, not in `$in` order
+    for ids in ([10, 17, 9], ["s7", "s5", "s6"]):
+        spec = {"_id": {"$in": ids}, "a": {"$gt": 4}}
+        first, second, _ = sorted(ids)
+        assert col.find_one(spec)["_id"] == first
+
+        col.update_one(spec, {"$set": {"b": "updated"}})
+        assert col.find_one({"b": "updated"})["_id"] == first
+
+        col.delete_one(spec)
+        assert col.count_documents({"_id": first}) == 0
+
+        col.replace_one(spec, {"b": "replaced"})
+        assert col.find_one({"b": "replaced"})["_id"] == second
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_id_lookup_numeric(lookup_client, storage, use_bson):
+    col, decoded = lookup_client(storage)
+
+    assert col.find_one({"_id": 3.0}) == {"_id": 3, "a": 3}
+    assert list(col.find({"_id": {"$in": [1, 2.0]}}, {"_id": 1})) == [
+        {"_id": 1}, {"_id": 2}
+    ]
+    if use_bson:
+        # Numbers are not looked up by key with BSON
+        assert len(decoded) > 3
+    else:
+        assert len(decoded) == 3
+
+
+def test_id_lookup_keys(storage_client):
+    storage_client("memory")  # Init bson
+
+    assert _id_lookup_keys({}) is None
+    assert _id_lookup_keys({"a": 1}) is None
+    assert _id_lookup_keys({"_id": {"$gt": "a"}}) is None
+    assert _id_lookup_keys({"_id": {"a": 1}}) is None
+    assert _id_lookup_keys({"_id": {"$in": ["a", None]}}) is None
+    assert _id_lookup_keys({"_id": True}) is None
+    assert _id_lookup_keys({"_id": {"$in": "a"}}) is None
+
+    key = bson.id_encode("a")
+    assert _id_lookup_keys({"_id": "a"}) == [key]
+    assert _id_lookup_keys({"_id": {"$eq": "a"}}) == [key]
+    assert _id_lookup_keys({"_id": {"$in": ["a", "a"]}}) == [key]
+    assert _id_lookup_keys({"_id": {"$in": ["b", "a"]}}) == [
+        key, bson.id_encode("b")
+    ]
+    assert _id_lookup_keys({"_id": {"$in": []}}) == []
+
+    oid = bson.ObjectId()
+    assert _id_lookup_keys({"_id": oid}) == [bson.id_encode(oid)]
@@ -0,0 +1,541 @@
+import random
+import pytest
+from datetime import datetime
+
+from montydb.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from montydb.storage import AbstractCursor
+from montydb.types import bson
+
+from ..conftest import skip_if_no_bson
+
+
+STORAGES = ["memory", "flatfile", "sqlite", "lightning"]
+INDEX_STORAGES = ["memory", "lightning", "sqlite"]
+
+
+@pytest.fixture
+def index_client(storage_client, monkeypatch):
+    decoded = []
+    decode_doc = AbstractCursor._decode_doc
+
+    def counted(self, doc):
+        decoded.append(doc)
+        return decode_doc(self, doc)
+
+    monkeypatch.setattr(AbstractCursor, "_decode_doc", counted)
+
+    def _index_client(storage):
+        client = storage_client(storage)
+        col = client.db.col
+        col.insert_many([
+            {"_id": i, "a": i % 10, "b": [i, str(i)], "c": {"d": i}}
+            for i in range(50)
+        ])
+        decoded.clear()
+        return col, decoded
+
+    return _index_client
+
+
+def scan(col, spec):
+    # Wrapped in `$and` so no index is used
+    return ids(col.find({"$and": [spec]}))
+
+
+def ids(cursor):
+    return sorted(
+        (doc["_id"] for doc in cursor), key=lambda _id: (str(type(_id)), _id)
+    )
+
+
+@pytest.mark.parametrize("storage", INDEX_STORAGES)
+def test_index_create(index_client, storage):
+    col, _ = index_client(storage)
+
+    assert col.create_index("a") == "a_1"
+    assert col.create_index([("c.d", -1), ("a", 1)]) == "c.d_-1_a_1"
+    assert col.create_index("a") == "a_1"
+    assert col.create_index("b", name="by_b") == "by_b"
+
+    assert col.index_information() == {
+        "_id_": {"v": 2, "key": [("_id", 1)]},
+        "a_1": {"v": 2, "key": [("a", 1)]},
+        "c.d_-1_a_1": {"v": 2, "key": [("c.d", -1), ("a", 1)]},
+        "by_b": {"v": 2, "key": [("b", 1)]},
+    }
+    assert [(i["name"], dict(i["key"])) for i in col.list_indexes()] == [
+        ("_id_", {"_id": 1}),
+        ("a_1", {"a": 1}),
+        ("c.d_-1_a_1", {"c.d": -1, "a": 1}),
+        ("by_b", {"b": 1}),
+    ]
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_index_create_conflict(index_client, storage):
+    col, _ = index_client(storage)
+    col.create_index("a")
+
+    if storage in INDEX_STORAGES:
+        with pytest.raises(OperationFailure) as exc:
+            col.create_index("a", name="other")
+        assert exc.value.code == 85
+
+        with pytest.raises(OperationFailure) as exc:
+            col.create_index("b", name="a_1")
+        assert exc.value.code == 86
+
+    with pytest.raises(OperationFailure) as exc:
+        col.create_index("_id", name="other")
+    assert exc.value.code == 85
+
+    if storage in INDEX_STORAGES:
+        with pytest.raises(OperationFailure) as exc:
+            col.create_index("a", unique=True)
+        assert exc.value.code == 85
+
+    with pytest.raises(OperationFailure) as exc:
+        col.create_index([("a", "text")])
+    assert exc.value.code == 67
+
+    with pytest.raises(TypeError):
+        col.create_index({"a": 1})
+
+
+@pytest.mark.parametrize("storage", INDEX_STORAGES)
+def test_index_drop(index_client, storage):
+    col, _ = index_client(storage)
+    col.create_index("a")
+    col.create_index([("b", -1)])
+    col.create_index("c.d")
+
+    col.drop_index("a_1")
+    col.drop_index([("b", -1)])
+    assert list(col.index_information()) == ["_id_", "c.d_1"]
+
+    for name, code in [("a_1", 27), ("_id_", 72), ("*", None)]:
+        with pytest.raises(OperationFailure) as exc:
+            col.drop_index(name)
+        assert exc.value.code == code
+
+    col.drop_indexes()
+    assert list(col.index_information()) == ["_id_"]
+    assert ids(col.find({"a": 1})) == [1, 11, 21, 31, 41]
+
+    col.create_index("a")
+    col.drop()
+    assert list(col.index_information()) == ["_id_"]
+
+
+@pytest.mark.parametrize("storage", [s for s in STORAGES if s not in INDEX_STORAGES])
+def test_index_not_supported(index_client, storage):
+    col, _ = index_client(storage)
+
+    assert col.create_index("a") == "a_1"
+    assert list(col.index_information()) == ["_id_"]
+    assert ids(col.find({"a": 1})) == [1, 11, 21, 31, 41]
+
+    # Unique index can't be enforced
+    with pytest.raises(OperationFailure) as exc:
+        col.create_index("c.d", unique=True)
+    assert exc.value.code == 67
+    assert "flatfile storage does not support unique indexes" in str(exc.value)
+    col.insert_many([{"c": {"d": 1}}, {"c": {"d": 1}}])
+
+
+@pytest.mark.parametrize("storage", INDEX_STORAGES)
+def test_index_lookup(index_client, storage):
+    col, decoded = index_client(storage)
+    col.create_index("a")
+    col.create_index([("c.d", -1), ("a", 1)])
+    col.create_index("b")
+
+    assert ids(col.find({"a": 3})) == [3, 13, 23, 33, 43]
+    assert len(decoded) == 5
+
+    decoded.clear()
+    assert ids(col.find({"a": {"$in": [3, 4.0]}, "c.d": {"$gt": 20}})) == [
+        23, 24, 33, 34, 43, 44
+    ]
+    assert len(decoded) == 10
+
+    decoded.clear()
+    assert ids(col.find({"c.d": {"$gte": 45, "$lt": 47}})) == [45, 46]
+    assert len(decoded) == 5  # Only the lower bound is looked up
+
+    decoded.clear()
+    assert ids(col.find({"b": {"$lte": "12"}})) == [0, 1, 10, 11, 12]
+    assert len(decoded) == 5
+
+    decoded.clear()
+    assert ids(col.find({"b": 7})) == [7]
+    assert len(decoded) == 1
+
+    decoded.clear()
+    assert ids(col.find({"a": {"$ne": 3}})) == scan(col, {"a": {"$ne": 3}})
+    assert len(decoded) == 100
+
+
+@pytest.mark.parametrize("storage", INDEX_STORAGES)
+def test_index_range_on_array(storage_client, storage):
+    col = storage_client(storage).db.col
+    col.insert_many([
+        {"_id": 1, "a": [6, 1]},
+        {"_id": 2, "a": [6, "x"]},
+        {"_id": 3, "a": 4},
+    ])
+    col.create_index("a")
+
+    # Bounds are met by different elements of the array
+    for spec in [
+        {"a": {"$gt": 5, "$lt": 3}},
+        {"a": {"$gt": 5, "$lt": "z"}},
+        {"a": {"$lte": 1, "$gte": 6}},
+    ]:
+        assert ids(col.find(spec)) == scan(col, spec), spec
+    assert ids(col.find({"a": {"$gt": 5, "$lt": 3}})) == [1]
+    assert ids(col.find({"a": {"$gt": 5, "$lt": "z"}})) == [2]
+
+
+@pytest.mark.parametrize("storage", INDEX_STORAGES)
+def test_index_write_ops(index_client, storage):
+    col, _ = index_client(storage)
+    col.create_index("a")
+    col.create_index("b")
+
+    col.update_many({"a": 3}, {"$set": {"a": 30}})
+    col.update_one({"_id": 4}, {"$push": {"b": "x"}})
+    col.replace_one({"_id": 5}, {"a": [1, 2]})
+    col.replace_one({"_id": 50}, {"a": 1}, upsert=True)
+    col.delete_many({"a": 6})
+    col.delete_one({"a": 7})
+    col.insert_one({"_id": 51, "b": "x"})
+
+    for spec in [
+        {"a": 3},
+        {"a": 30},
+        {"a": 1},
+        {"a": 2},
+        {"a": {"$in": [6, 7]}},
+        {"a": {"$gte": 5}},
+        {"b": "x"},
+        {"b": 5},
+    ]:
+        assert ids(col.find(spec)) == scan(col, spec), spec
+
+    assert ids(col.find({"b": "x"})) == [4, 51]
+
+
+@pytest.mark.parametrize("storage", INDEX_STORAGES)
+def test_index_unique(storage_client, storage):
+    col = storage_client(storage).db.col
+    col.insert_many([{"_id": i, "a": i, "b": {"c": str(i)}} for i in range(3)])
+    assert col.create_index("b.c", unique=True) == "b.c_1"
+    assert col.index_information()["b.c_1"] == {
+        "v": 2, "key": [("b.c", 1)], "unique": True
+    }
+
+    with pytest.raises(DuplicateKeyError) as exc:
+        col.insert_one({"_id": 3, "b": {"c": "1"}})
+    assert exc.value.code == 11000
+    assert 'index: b.c_1 dup key: { : "1" }' in str(exc.value)
+
+    with pytest.raises(DuplicateKeyError) as exc:
+        col.insert_one({"_id": 0, "b": {"c": "0"}})
+    assert "index: _id_ " in str(exc.value)
+
+    with pytest.raises(BulkWriteError) as exc:
+        col.insert_many([{"_id": 3, "b": {"c": "3"}}, {"_id": 4, "b": {"c": "3"}}])
+    error = exc.value.details["writeErrors"][0]
+    assert exc.value.details["nInserted"] == 1
+    assert error["index"] == 1 and "index: b.c_1 " in error["errmsg"]
+
+    with pytest.raises(DuplicateKeyError):
+        col.update_one({"_id": 0}, {"$set": {"b.c": "2"}})
+    with pytest.raises(DuplicateKeyError):
+        col.replace_one({"_id": 0}, {"b": {"c": "2"}})
+    with pytest.raises(DuplicateKeyError):
+        col.update_one({"_id": 9}, {"$set": {"b.c": "2"}}, upsert=True)
+    with pytest.raises(DuplicateKeyError):
+        col.update_many({}, {"$set": {"b.c": "x"}})
+
+    col.update_one({"_id": 0}, {"$set": {"a": 10, "b.c": "0"}})
+    col.delete_one({"_id": 1})
+    col.update_one({"_id": 0}, {"$set": {"b.c": "1"}})
+
+    # A missing field is indexed as null
+    col.insert_one({"_id": 5})
+    with pytest.raises(DuplicateKeyError):
+        col.insert_one({"_id": 6, "b": {"c": None}})
+
+    assert ids(col.find({"b.c": {"$in": ["0", "1", "2", "x"]}})) == [0, 2]
+    assert ids(col.find({"b.c": "x"})) == scan(col, {"b.c": "x"})
+    assert ids(col.find()) == [0, 2, 3, 5]
+
+
+@pytest.mark.parametrize("storage", INDEX_STORAGES)
+def test_index_unique_array(storage_client, storage):
+    col = storage_client(storage).db.col
+    col.create_index("a", unique=True)
+    col.insert_one({"_id": 0, "a": [1, 1, 2]})
+    col.update_one({"_id": 0}, {"$push": {"a": 3}})
+
+    with pytest.raises(DuplicateKeyError):
+        col.insert_one({"_id": 1, "a": [3, 4]})
+    col.insert_one({"_id": 1, "a": [4, 5]})
+    assert ids(col.find({"a": {"$in": [3, 5]}})) == [0, 1]
+
+
+@pytest.mark.parametrize("storage", INDEX_STORAGES)
+def test_index_unique_insert_many(storage_client, storage):
+    col = storage_client(storage).db.col
+    col.create_index("a", unique=True)
+    col.create_index("b")
+    col.insert_one({"_id": 0, "a": 0, "b": 1})
+
+    with pytest.raises(BulkWriteError) as exc:
+        col.insert_many([
+            {"_id": 1, "a": [1, 2], "b": 1},
+            {"_id": 2, "a": 3, "b": 1},
+            {"_id": 3, "a": [4, 2], "b": 1},
+            {"_id": 4, "a": 5, "b": 1},
+        ])
+    assert exc.value.details["nInserted"] == 2
+    assert exc.value.details["writeErrors"][0]["index"] == 2
+
+    # Documents written before the error are indexed, in insertion order
+    assert [doc["_id"] for doc in col.find({"b": 1})] == [0, 1, 2]
+    assert ids(col.find({"a": {"$in": [2, 3, 4, 5]}})) == [1, 2]
+    col.insert_many([{"_id": 3, "a": 4}, {"_id": 4, "a": 5}])
+    assert ids(col.find({"a": {"$gte": 4}})) == [3, 4]
+
+
+@pytest.mark.parametrize("storage", INDEX_STORAGES)
+def test_index_unique_build(index_client, storage):
+    col, _ = index_client(storage)
+
+    with pytest.raises(DuplicateKeyError) as exc:
+        col.create_index("a", unique=True)
+    assert exc.value.code == 11000
+    assert "index: a_1" in str(exc.value)
+    assert list(col.index_information()) == ["_id_"]
+
+    col.create_index("c.d", unique=True)
+    col.create_index("a")
+    assert list(col.index_information()) == ["_id_", "c.d_1", "a_1"]
+    assert ids(col.find({"a": 1})) == [1, 11, 21, 31, 41]
+
+
+def winning_stage(plan):
+    while "inputStage" in plan and plan["stage"] != "FETCH":
+        plan = plan["inputStage"]
+    if plan["stage"] == "FETCH":
+        return plan["inputStage"]["stage"], plan["inputStage"]["indexName"]
+    return plan["stage"], None
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_index_explain(index_client, storage):
+    col, _ = index_client(storage)
+    col.insert_one({"_id": "x", "a": 3})
+    col.create_index("a")
+    indexed = storage in INDEX_STORAGES
+
+    explained = col.find({"a": 3}).explain()
+    planner = explained["queryPlanner"]
+    stats = explained["executionStats"]
+    assert planner["namespace"] == "db.col"
+    assert planner["parsedQuery"] == {"a": 3}
+    assert stats["nReturned"] == 6
+    if indexed:
+        assert winning_stage(planner["winningPlan"]) == ("IXSCAN", "a_1")
+        assert planner["winningPlan"]["inputStage"]["keyPattern"] == {"a": 1}
+        assert stats["totalKeysExamined"] == 6
+        assert stats["totalDocsExamined"] == 6
+    else:
+        assert winning_stage(planner["winningPlan"]) == ("COLLSCAN", None)
+        assert stats["totalKeysExamined"] == 0
+        assert stats["totalDocsExamined"] == 51
+
+    explained = col.find({"_id": {"$in": ["x", "y"]}}).explain()
+    assert winning_stage(explained["queryPlanner"]["winningPlan"]) == (
+        "IDHACK", None
+    )
+    assert explained["executionStats"]["nReturned"] == 1
+    assert explained["executionStats"]["totalKeysExamined"] == 2
+    assert explained["executionStats"]["totalDocsExamined"] == 1
+
+    explained = col.find({"b": {"$gt": 40}, "c": {"$ne": None}}).explain()
+    assert winning_stage(explained["queryPlanner"]["winningPlan"]) == (
+        "COLLSCAN", None
+    )
+    assert explained["executionStats"]["nReturned"] == 9
+    assert explained["executionStats"]["totalDocsExamined"] == 51
+
+
+@pytest.mark.parametrize("storage", INDEX_STORAGES)
+def test_index_explain_stages(index_client, storage):
+    col, _ = index_client(storage)
+    col.create_index("a")
+
+    cursor = col.find({"a": {"$gte": 8}}, {"c": 0}).sort("c.d", -1).skip(1).limit(2)
+    explained = cursor.explain()
+    plan = explained["queryPlanner"]["winningPlan"]
+    stages = []
+    while "inputStage" in plan:
+        stages.append(plan["stage"])
+        plan = plan["inputStage"]
+    assert stages == ["PROJECTION", "LIMIT", "SKIP", "SORT", "FETCH"]
+
+    stats = explained["executionStats"]
+    assert stats["nReturned"] == 2
+    assert stats["totalDocsExamined"] == 10
+    for stage in ("decode", "filter", "sort", "projection"):
+        assert stats[f"{stage}TimeMillis"] >= 0
+
+    # Explaining doesn't run the cursor itself
+    assert [doc["_id"] for doc in cursor] == [48, 39]
+
+    # Without sorting, documents stop being fetched when limit is reached
+    explained = col.find({"a": {"$gte": 8}}).limit(3).explain()
+    assert explained["executionStats"]["nReturned"] == 3
+    assert explained["executionStats"]["totalDocsExamined"] == 3
+
+
+@pytest.mark.parametrize("storage", INDEX_STORAGES)
+def test_index_hint(index_client, storage):
+    col, _ = index_client(storage)
+    col.create_index("a")
+    col.create_index([("c.d", -1), ("a", 1)])
+
+    def explain(cursor):
+        explained = cursor.explain()
+        plan = explained["queryPlanner"]["winningPlan"]
+        return winning_stage(plan), explained["executionStats"]
+
+    spec = {"a": 3, "c.d": {"$lt": 20}}
+    stage, stats = explain(col.find(spec))
+    assert stage == ("IXSCAN", "a_1")
+    assert stats["totalKeysExamined"] == 5
+
+    stage, stats = explain(col.find(spec).hint("c.d_-1_a_1"))
+    assert stage == ("IXSCAN", "c.d_-1_a_1")
+    assert stats["totalKeysExamined"] == 20
+
+    stage, stats = explain(col.find(spec).hint([("c.d", -1), ("a", 1)]))
+    assert stage == ("IXSCAN", "c.d_-1_a_1")
+
+    # A hinted index is fully scanned when the query can't look it up
+    stage, stats = explain(col.find({"b": 7}, hint="a_1"))
+    assert stage == ("IXSCAN", "a_1")
+    assert stats["totalKeysExamined"] == 50
+    assert stats["nReturned"] == 1
+
+    stage, stats = explain(col.find(spec).hint("$natural"))
+    assert stage == ("COLLSCAN", None)
+    assert stats["totalKeysExamined"] == 0
+
+    assert explain(col.find(spec).hint([("$natural", 1)]))[0] == ("COLLSCAN", None)
+    assert explain(col.find(spec).hint("a_1").hint(None))[0] == ("IXSCAN", "a_1")
+    assert explain(col.find(spec).hint("_id_"))[0] == ("COLLSCAN", None)
+
+    assert ids(col.find(spec).hint("c.d_-1_a_1")) == [3, 13]
+    assert ids(col.find(spec).hint("$natural")) == [3, 13]
+
+    with pytest.raises(OperationFailure) as exc:
+        list(col.find(spec).hint("b_1"))
+    assert exc.value.code == 2
+    with pytest.raises(OperationFailure) as exc:
+        col.find(spec).hint([("a", -1)]).explain()
+    assert exc.value.code == 2
+
+
+VALUES = [
+    None, 0, 1, 1.0, 1.5, -2, 2 ** 40, float("inf"), float("nan"), True, False,
+    "", "a", "b", "ab", datetime(2020, 1, 1), datetime(2021, 1, 1),
+    {"x": 1}, [], [1, "a"], [[1]], [{"x": 1}, {"x": "a"}],
+]
+
+SPECS = [
+    {"a": 1},
+    {"a": None},
+    {"a": "a"},
+    {"a": {"$eq": 1.5}},
+    {"a": {"$in": [1, "b"]}},
+    {"a": {"$in": [1, None]}},
+    {"a": {"$gt": 0}},
+    {"a": {"$gte": 1, "$lt": 2}},
+    {"a": {"$lte": "ab"}},
+    {"a": {"$lt": datetime(2020, 6, 1)}},
+    {"a": {"$gt": float("nan")}},
+    {"a": {"$gt": 1, "$ne": 1.5}},
+    {"a": {"$in": [[1]]}},
+    {"a.x": 1},
+    {"a.x": {"$gte": "a"}},
+    {"a.0": {"$in": [1, {"x": 1}]}},
+    {"a": 1, "b": "a"},
+    {"b": {"$gt": 1}, "a": {"$in": [1, 1.5]}},
+]
+
+# Comparing bool with Decimal128 raises, so these are not used with BSON
+BOOL_SPECS = [
+    {"a": True},
+    {"a": {"$in": [1, "b", False]}},
+    {"a": {"$gt": False}},
+]
+
+
+def assert_index_same_as_scan(col, specs):
+    for keys in (
+        [("a", 1)],
+        [("a", -1)],
+        [("a.x", 1)],
+        [("a.0", 1)],
+        [("a", 1), ("b", -1)],
+        [("b", 1), ("a", 1)],
+    ):
+        col.drop_indexes()
+        col.create_index(keys)
+        for spec in specs:
+            assert ids(col.find(spec)) == scan(col, spec), (keys, spec)
+
+
+@pytest.mark.parametrize("storage", INDEX_STORAGES)
+def test_index_same_as_scan(storage_client, storage):
+    col = storage_client(storage).db.col
+    random.seed(0)
+    col.insert_many([
+        {"_id": i, "a": value, "b": random.choice(VALUES)}
+        for i, value in enumerate(VALUES * 3)
+    ])
+    col.insert_one({"_id": "missing"})
+    assert_index_same_as_scan(col, SPECS + BOOL_SPECS)
+
+
+@skip_if_no_bson
+@pytest.mark.parametrize("storage", INDEX_STORAGES)
+def test_index_same_as_scan_bson(storage_client, storage):
+    values = [
+        bson.Int64(1),
+        bson.Decimal128("1"),
+        bson.Decimal128("1.5"),
+        bson.Decimal128("0.1"),
+        bson.Decimal128("NaN"),
+        0.1,
+        bson.ObjectId(b"0" * 12),
+        bson.Code("a"),
+        bson.MinKey(),
+        bson.MaxKey(),
+    ]
+    specs = SPECS + [
+        {"a": 0.1},
+        {"a": {"$gte": 0.1}},
+        {"a": {"$lte": 0.1}},
+        {"a": bson.Int64(1)},
+        {"a": bson.Decimal128("1")},
+        {"a": {"$gt": bson.MinKey()}},
+        {"a": bson.ObjectId(b"0" * 12)},
+    ]
+    col = storage_client(storage).db.col
+    col.insert_many([{"_id": i, "a": value} for i, value in enumerate(values)])
+    assert_index_same_as_scan(col, specs)
@@ -0,0 +1,278 @@
+import os
+import lmdb
+import threading
+import pytest
+
+from montydb.errors import DuplicateKeyError, WriteError
+from montydb.storage.lightning import LMDBKVEngine, _environments
+
+
+def _col_path(client, db_name, col_name):
+    return os.path.join(client.address, db_name, col_name + ".mdb")
+
+
+def test_lightning_reuse_environment(storage_client):
+    client = storage_client("lightning")
+    col = client.db.col
+    for i in range(10):
+        col.insert_one({"_id": i})
+    assert col.count_documents({}) == 10
+
+    col_path = _col_path(client, "db", "col")
+    env, _ = client._storage._conn.open(col_path)
+    for i in range(10, 20):
+        col.insert_one({"_id": i})
+    assert client._storage._conn.open(col_path)[0] is env
+    assert col.count_documents({}) == 20
+
+
+def test_lightning_concurrent_readers(storage_client):
+    client = storage_client("lightning")
+    col = client.db.col
+    col.insert_many([{"_id": i} for i in range(100)])
+
+    errors = []
+
+    def work():
+        try:
+            for _ in range(5):
+                assert len(list(col.find())) == 100
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+
+
+def test_lightning_write_while_reading(storage_client):
+    client = storage_client("lightning")
+    col = client.db.col
+    col.insert_many([{"_id": i, "a": 0} for i in range(10)])
+
+    col.update_many({}, {"$inc": {"a": 1}})
+    assert [doc["a"] for doc in col.find()] == [1] * 10
+
+
+def test_lightning_drop_and_recreate_collection(storage_client):
+    client = storage_client("lightning")
+    db = client.db
+    db.col.insert_one({"_id": 0})
+    db.drop_collection("col")
+    assert db.list_collection_names() == []
+
+    db.col.insert_one({"_id": 1})
+    assert db.list_collection_names() == ["col"]
+    assert [doc["_id"] for doc in db.col.find()] == [1]
+
+
+def test_lightning_drop_database(storage_client):
+    client = storage_client("lightning")
+    client.db.col.insert_one({"_id": 0})
+    client.drop_database("db")
+    assert client.list_database_names() == []
+
+    client.db.col.insert_one({"_id": 1})
+    assert [doc["_id"] for doc in client.db.col.find()] == [1]
+
+
+def test_lightning_close_releases_environments(storage_client):
+    client = storage_client("lightning")
+    client.db.col.insert_one({"_id": 0})
+    col_path = _col_path(client, "db", "col")
+    assert col_path in _environments._pool
+
+    client.close()
+    assert col_path not in _environments._pool
+
+
+def test_lightning_shared_by_clients(storage_client):
+    client = storage_client("lightning")
+    client.db.col.insert_one({"_id": 0})
+
+    other = type(client)(client.address)
+    assert other.db.col.find_one({"_id": 0}) == {"_id": 0}
+    other.close()
+
+    # Still opened for the first client
+    client.db.col.insert_one({"_id": 1})
+    assert client.db.col.count_documents({}) == 2
+
+
+def test_lightning_grow_map_size(storage_client):
+    client = storage_client("lightning", map_size=65536)
+    col = client.db.col
+    col.insert_many([{"_id": i, "data": "x" * 1024} for i in range(200)])
+    for i in range(200, 250):
+        col.insert_one({"_id": i, "data": "x" * 1024})
+
+    assert client._storage.stats["map_resizes"] > 0
+    assert col.count_documents({}) == 250
+    assert sorted(doc["_id"] for doc in col.find()) == list(range(250))
+
+
+def test_lightning_grow_map_size_while_reading(storage_client):
+    client = storage_client("lightning", map_size=65536)
+    col = client.db.col
+    col.insert_many([{"_id": i, "data": ""} for i in range(50)])
+
+    col.update_many({}, {"$set": {"data": "x" * 2048}})
+    assert client._storage.stats["map_resizes"] > 0
+    assert all(len(doc["data"]) == 2048 for doc in col.find())
+
+
+def test_lightning_grow_map_size_ceiling(storage_client):
+    client = storage_client("lightning", map_size=65536, max_map_size=131072)
+    col = client.db.col
+    with pytest.raises(lmdb.MapFullError):
+        col.insert_many([{"_id": i, "data": "x" * 1024} for i in range(500)])
+
+    assert client._storage.stats["map_resizes"] == 1
+    assert col.count_documents({}) == 0
+
+
+def test_lightning_read_in_batches(storage_client):
+    client = storage_client("lightning")
+    col = client.db.col
+    col.insert_many([{"_id": i} for i in range(25)])
+
+    ids = [doc["_id"] for doc in col.find().batch_size(4)]
+    assert ids == [doc["_id"] for doc in col.find()]
+    assert sorted(ids) == list(range(25))
+    assert col.find_one({"_id": 24}) == {"_id": 24}
+
+
+def test_lightning_index_persisted(storage_client, monkeypatch):
+    client = storage_client("lightning")
+    col = client.db.col
+    col.insert_many([{"_id": i, "a": i % 10} for i in range(100)])
+    col.create_index("a")
+    col.create_index([("b", -1)], name="by_b")
+    client.close()
+
+    def no_scan(*args):
+        raise AssertionError("Collection scanned")
+
+    monkeypatch.setattr(LMDBKVEngine, "iter_docs", no_scan)
+
+    other = type(client)(client.address)
+    col = other.db.col
+    assert list(col.index_information()) == ["_id_", "a_1", "by_b"]
+    assert col.index_information()["by_b"]["key"] == [("b", -1)]
+    assert sorted(doc["_id"] for doc in col.find({"a": 3})) == list(range(3, 100, 10))
+
+    col.insert_one({"_id": 100, "a": 3})
+    col.delete_one({"a": 3, "_id": 3})
+    found = sorted(doc["_id"] for doc in col.find({"a": 3}))
+    assert found == list(range(13, 100, 10)) + [100]
+    other.close()
+
+
+def test_lightning_index_opened_by_other(storage_client):
+    client = storage_client("lightning")
+    col = client.db.col
+    col.insert_one({"_id": 0, "a": 1})
+    col.create_index("a")
+
+    # As if the index was created by other process
+    col_path = _col_path(client, "db", "col")
+    _environments.forget_database(col_path, b"index:a_1")
+
+    col.insert_one({"_id": 1, "a": 1})
+    assert _environments.database(col_path, b"index:a_1") is not None
+    assert [doc["_id"] for doc in col.find({"a": 1})] == [0, 1]
+
+
+def test_lightning_index_long_keys(storage_client):
+    client = storage_client("lightning")
+    col = client.db.col
+    col.create_index("a")
+    long_a = "x" * 1000
+    col.insert_many([
+        {"_id": 0, "a": long_a},
+        {"_id": 1, "a": long_a + "y"},
+        {"_id": 2, "a": "y"},
+    ])
+
+    assert [doc["_id"] for doc in col.find({"a": long_a + "y"})] == [1]
+    assert [doc["_id"] for doc in col.find({"a": {"$gt": long_a}})] == [1, 2]
+    assert [doc["_id"] for doc in col.find({"a": {"$lte": long_a}})] == [0]
+
+    col.delete_one({"_id": 1})
+    assert list(col.find({"a": long_a + "y"})) == []
+
+
+def test_lightning_long_id(storage_client):
+    client = storage_client("lightning")
+    col = client.db.col
+    col.create_index("a")
+    col.insert_one({"_id": "x" * 400, "a": 1})
+
+    for write in (
+        lambda: col.insert_one({"_id": "x" * 1000, "a": 1}),
+        lambda: col.insert_many([{"_id": 1, "a": 1}, {"_id": "x" * 1000}]),
+        lambda: col.replace_one(
+            {"a": 2}, {"_id": "x" * 1000, "a": 1}, upsert=True
+        ),
+    ):
+        with pytest.raises(WriteError) as exc:
+            write()
+        assert exc.value.code == 17280
+        assert "_id is too long" in str(exc.value)
+
+    assert [doc["_id"] for doc in col.find({"a": 1})] == ["x" * 400]
+
+
+def test_lightning_index_unique_long_keys(storage_client):
+    client = storage_client("lightning")
+    col = client.db.col
+    col.create_index("a", unique=True)
+    long_a = "x" * 1000
+    # Truncated keys are the same, but the full keys are not
+    col.insert_many([{"_id": 0, "a": long_a}, {"_id": 1, "a": long_a + "y"}])
+
+    with pytest.raises(DuplicateKeyError):
+        col.insert_one({"_id": 2, "a": long_a})
+    assert [doc["_id"] for doc in col.find({"a": long_a})] == [0]
+
+
+def test_lightning_index_grow_map_size(storage_client):
+    client = storage_client("lightning", map_size=65536)
+    col = client.db.col
+    col.create_index("a")
+    col.insert_many([{"_id": i, "a": "x" * 256 + str(i)} for i in range(200)])
+
+    assert client._storage.stats["map_resizes"] > 0
+    assert [doc["_id"] for doc in col.find({"a": "x" * 256 + "7"})] == [7]
+
+
+def test_lightning_index_concurrent_readers(storage_client):
+    client = storage_client("lightning")
+    col = client.db.col
+    col.insert_many([{"_id": i, "a": 0} for i in range(100)])
+    col.create_index("a")
+
+    errors = []
+
+    def read():
+        try:
+            for _ in range(20):
+                # Each read sees all or none of the documents updated
+                found = [doc["a"] for doc in col.find({"a": {"$gte": 0}})]
+                assert len(found) == 100 and len(set(found)) == 1
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for _ in range(20):
+        col.update_many({}, {"$inc": {"a": 1}})
+    for t in threads:
+        t.join()
+
+    assert not errors
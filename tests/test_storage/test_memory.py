@@ -0,0 +1,80 @@
+import pytest
+from datetime import datetime
+
+import montydb
+from montydb.types import bson
+from montydb.storage import memory
+
+
+@pytest.fixture
+def decoded_client():
+    config = memory._config["_"]
+    montydb.set_storage(":memory:", "memory", store_decoded=True, **{
+        k: v for k, v in config.items() if k != "store_decoded"
+    })
+    client = montydb.MontyClient(":memory:")
+    client.drop_database("decoded")
+
+    yield client
+
+    client.drop_database("decoded")
+    memory._config["_"] = config
+
+
+def test_memory_store_decoded(decoded_client):
+    col = decoded_client.decoded.col
+    col.insert_one({"_id": 0, "a": {"b": [1, {"c": 2}]}})
+
+    stored = list(memory._repos[":memory:"]["decoded"]["col"].values())
+    assert stored == [{"_id": 0, "a": {"b": [1, {"c": 2}]}}]
+    assert col.find_one({"a.b.c": 2}) == {"_id": 0, "a": {"b": [1, {"c": 2}]}}
+
+
+def test_memory_store_decoded_copy_on_read(decoded_client):
+    col = decoded_client.decoded.col
+    doc = {"_id": 0, "a": {"b": [1]}}
+    col.insert_one(doc)
+    doc["a"]["b"].append(2)
+
+    found = col.find_one()
+    found["a"]["b"].append(3)
+    found["x"] = 1
+
+    assert col.find_one() == {"_id": 0, "a": {"b": [1]}}
+
+
+def test_memory_store_decoded_update(decoded_client):
+    col = decoded_client.decoded.col
+    col.insert_many([{"_id": i, "a": [i]} for i in range(3)])
+    col.update_many({}, {"$push": {"a": 9}})
+    doc = col.find_one_and_update({"_id": 1}, {"$set": {"b": 1}})
+    doc["a"].clear()
+
+    assert [d["a"] for d in col.find()] == [[0, 9], [1, 9], [2, 9]]
+
+
+def test_memory_store_decoded_validate(decoded_client):
+    col = decoded_client.decoded.col
+    with pytest.raises(bson.InvalidDocument):
+        col.insert_one({"$a": 1})
+    if bson.bson_used:
+        error, message = bson.InvalidDocument, "cannot encode object"
+    else:
+        error, message = TypeError, "is not JSON serializable"
+    with pytest.raises(error) as exc:
+        col.insert_one({"a": object()})
+    assert message in str(exc.value)
+    assert col.count_documents({}) == 0
+
+
+def test_memory_store_decoded_codec_options(decoded_client):
+    col = decoded_client.decoded.col
+    col.insert_one({"_id": 0, "t": datetime(2020, 1, 1, 12, 0, 0, 123456)})
+
+    doc = col.find_one()
+    assert doc["t"] == datetime(2020, 1, 1, 12, 0, 0, 123000)
+    assert doc["t"].tzinfo is None
+
+    codec_options = bson.parse_codec_options({"tz_aware": True})
+    doc = col.with_options(codec_options=codec_options).find_one()
+    assert doc["t"].tzinfo is not None
@@ -0,0 +1,33 @@
+import pytest
+
+
+STORAGES = ["memory", "flatfile", "sqlite", "lightning"]
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_scan_insert_while_iterating(storage_client, storage):
+    col = storage_client(storage).db.col
+    col.insert_many([{"a": i} for i in range(300)])
+
+    found = 0
+    for doc in col.find().batch_size(50):
+        col.insert_one({"a": -1})
+        found += 1
+        assert found <= 300, "documents inserted after query are returned"
+
+    assert found == 300
+    assert col.count_documents({}) == 600
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_scan_update_while_iterating(storage_client, storage):
+    col = storage_client(storage).db.col
+    col.insert_many([{"_id": i, "a": i} for i in range(300)])
+
+    found = []
+    for doc in col.find().batch_size(50):
+        col.update_one({"_id": doc["_id"]}, {"$set": {"a": -1, "b": "x" * 100}})
+        found.append(doc["_id"])
+
+    assert sorted(found) == list(range(300))
+    assert col.count_documents({"a": -1}) == 300
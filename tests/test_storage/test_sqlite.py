@@ -0,0 +1,288 @@
+import os
+import sqlite3
+import threading
+import pytest
+from collections import OrderedDict
+
+from montydb.errors import BulkWriteError
+from montydb.engine.index import index_ranges
+from montydb.engine.queries import QueryFilter
+from montydb.storage.sqlite import json_where
+from montydb.types import bson
+
+
+def test_sqlite_reuse_connection(storage_client):
+    client = storage_client("sqlite")
+    col = client.db.col
+    for i in range(10):
+        col.insert_one({"_id": i})
+
+    pool = client._storage._conn._SQLiteKVEngine__pool
+    assert len(pool) == 1
+    assert col.count_documents({}) == 10
+
+
+def test_sqlite_connection_per_thread(storage_client):
+    client = storage_client("sqlite", check_same_thread=True)
+    col = client.db.col
+    col.insert_one({"_id": "main"})
+
+    errors = []
+
+    def work(n):
+        try:
+            col.insert_one({"_id": n})
+            col.find_one({"_id": n})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    assert col.count_documents({}) == 5
+
+
+def test_sqlite_connection_released_by_thread(storage_client):
+    client = storage_client("sqlite")
+    col = client.db.col
+    col.insert_one({"_id": "main"})
+    pool = client._storage._conn._SQLiteKVEngine__pool
+    assert len(pool) == 1
+
+    def work(n):
+        col.insert_one({"_id": n})
+        assert len(pool) > 1
+
+    for i in range(50):
+        thread = threading.Thread(target=work, args=(i,))
+        thread.start()
+        thread.join()
+
+    assert len(pool) == 1
+    assert col.count_documents({}) == 51
+
+    # Connections of other threads are removed on close
+    thread = threading.Thread(target=work, args=("x",))
+    thread.start()
+    thread.join()
+    client.close()
+    assert len(pool) == 0
+
+
+def test_sqlite_drop_and_recreate_collection(storage_client):
+    client = storage_client("sqlite")
+    db = client.db
+    db.col.insert_one({"_id": 0})
+    db.drop_collection("col")
+    assert db.list_collection_names() == []
+
+    db.col.insert_one({"_id": 1})
+    assert db.list_collection_names() == ["col"]
+    assert [doc["_id"] for doc in db.col.find()] == [1]
+
+
+def test_sqlite_reopen_after_close(storage_client):
+    client = storage_client("sqlite")
+    client.db.col.insert_one({"_id": 0})
+    client.close()
+    client.db.col.insert_one({"_id": 1})
+    assert client.db.col.count_documents({}) == 2
+
+
+def test_sqlite_write_many_duplicate_key(storage_client):
+    client = storage_client("sqlite")
+    col = client.db.col
+    col.insert_many([{"_id": 0}, {"_id": 1}])
+
+    docs = [{"_id": 2}, {"_id": 3}, {"_id": 1}, {"_id": 4}]
+    with pytest.raises(BulkWriteError) as err:
+        col.insert_many(docs)
+
+    assert err.value.details["nInserted"] == 2
+    assert err.value.details["writeErrors"][0]["index"] == 2
+    assert sorted(doc["_id"] for doc in col.find()) == [0, 1, 2, 3]
+
+
+def test_sqlite_write_many_duplicate_key_in_batch(storage_client):
+    client = storage_client("sqlite")
+    col = client.db.col
+
+    docs = [{"_id": 0}, {"_id": 1}, {"_id": 0}]
+    with pytest.raises(BulkWriteError) as err:
+        col.insert_many(docs)
+
+    assert err.value.details["nInserted"] == 2
+    assert sorted(doc["_id"] for doc in col.find()) == [0, 1]
+
+
+def test_sqlite_streaming_query(storage_client):
+    client = storage_client("sqlite", batch_size=2)
+    col = client.db.col
+    col.insert_many([{"_id": i, "a": i % 3} for i in range(7)])
+
+    assert [doc["_id"] for doc in col.find({"a": 1})] == [1, 4]
+    assert [doc["_id"] for doc in col.find().batch_size(3)] == list(range(7))
+
+    col.delete_one({"a": 2})
+    col.update_one({"a": 0}, {"$set": {"b": 1}})
+    assert col.count_documents({}) == 6
+    assert col.find_one({"b": 1})["_id"] == 0
+
+
+PUSHDOWN_DOCS = [
+    {"_id": 0, "a": 1, "s": "abc", "b": {"c": 5}},
+    {"_id": 1, "a": 1.5, "s": "abd", "b": {"c": [4, 6]}},
+    {"_id": 2, "a": True, "s": None, "b": [{"c": 5}]},
+    {"_id": 3, "a": [1, 3], "s": "xyz"},
+    {"_id": 4, "a": None, "b": {"c": "5"}},
+    {"_id": 5, "s": "été", "b": {}},
+    {"_id": 6, "a": float("nan"), "s": 5},
+    {"_id": 7, "a": 3, "s": {"x": 1}, "b": {"c": None}},
+]
+
+PUSHDOWN_SPECS = [
+    {"a": 1},
+    {"a": True},
+    {"a": None},
+    {"a": {"$gt": 1}},
+    {"a": {"$gte": 1.5, "$lt": 3}},
+    {"a": {"$lte": 1}},
+    {"a": {"$in": [1, None, "x"]}},
+    {"a": {"$exists": True}},
+    {"a": {"$exists": False}},
+    {"s": "abc"},
+    {"s": {"$gt": "abc"}},
+    {"s": {"$in": ["xyz", 5]}},
+    {"b.c": 5},
+    {"b.c": {"$exists": True}},
+    {"b.c": {"$exists": False}},
+    {"b.c": None},
+    {"$or": [{"a": 1}, {"s": "xyz"}]},
+    {"$and": [{"a": {"$gte": 1}}, {"s": {"$ne": "abc"}}]},
+]
+
+
+@pytest.mark.parametrize("spec", PUSHDOWN_SPECS)
+def test_sqlite_filter_pushdown(storage_client, use_bson, spec):
+    if use_bson:
+        pytest.skip("Filter pushdown only works without BSON.")
+
+    client = storage_client("sqlite")
+    col = client.db.col
+    col.insert_many([dict(doc) for doc in PUSHDOWN_DOCS])
+
+    queryfilter = QueryFilter(spec)
+    expected = [doc["_id"] for doc in PUSHDOWN_DOCS if queryfilter(doc)]
+
+    assert json_where(spec) is not None
+    assert [doc["_id"] for doc in col.find(spec)] == expected
+
+
+def test_sqlite_filter_pushdown_skip_rows(storage_client, use_bson):
+    if use_bson:
+        pytest.skip("Filter pushdown only works without BSON.")
+
+    client = storage_client("sqlite")
+    col = client.db.col
+    col.insert_many([{"_id": i, "a": i} for i in range(10)])
+
+    engine = client._storage._conn
+    col_path = os.path.join(client._storage._db_path("db"), "col.collection")
+    rows = list(engine.read_all(col_path, 0, where=json_where({"a": 3})))
+    assert len(rows) == 1
+
+
+def test_sqlite_filter_pushdown_not_pushable():
+    assert json_where({}) is None
+    assert json_where({"a.0": 1}) is None
+    assert json_where({"a": {"b": 1}}) is None
+    assert json_where({"a": {"$ne": 1}}) is None
+    assert json_where({"a": {"$in": [1, {"b": 1}]}}) is None
+    assert json_where({"$or": [{"a": 1}, {"b": {"$size": 1}}]}) is None
+
+
+def _index_entries(col_path, table="index_0"):
+    conn = sqlite3.connect(col_path)
+    try:
+        return conn.execute(f"SELECT count(*) FROM [{table}]").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_sqlite_index_table(storage_client):
+    client = storage_client("sqlite")
+    col = client.db.col
+    col.insert_many([{"_id": i, "a": [i, i + 1]} for i in range(10)])
+    col.create_index("a")
+
+    col_path = os.path.join(client._storage._db_path("db"), "col.collection")
+    assert _index_entries(col_path) == 30  # two elements and the array
+
+    col.insert_one({"_id": 10, "a": 10})
+    col.update_one({"_id": 0}, {"$set": {"a": 0}})
+    col.delete_many({"_id": {"$in": [1, 2]}})
+    assert _index_entries(col_path) == 30 - 2 - 6 + 1
+
+    engine = client._storage._conn
+    ranges = index_ranges({"a": {"$gte": 10}}, "a")
+    rows = list(engine.read_index(col_path, "a_1", ranges))
+    assert len(rows) == 2
+
+    col.drop_index("a_1")
+    assert engine.read_index(col_path, "a_1", ranges) is None
+
+
+def test_sqlite_index_ordered(storage_client):
+    client = storage_client("sqlite")
+    col = client.db.col
+    col.insert_many([{"_id": i, "a": (i * 7) % 10} for i in range(10)])
+    col.create_index("a")
+
+    engine = client._storage._conn
+    col_path = os.path.join(client._storage._db_path("db"), "col.collection")
+    spec = {"a": {"$gte": 3}}
+    ranges = index_ranges(spec, "a")
+    for direction in (1, -1):
+        ordering = OrderedDict([("a", direction)])
+        rows = engine.read_index(col_path, "a_1", ranges, ordering)
+        found = [bson.document_decode(row[0])["a"] for row in rows]
+        assert found == sorted(range(3, 10), reverse=direction == -1)
+
+    assert [doc["a"] for doc in col.find(spec).sort("a", -1).limit(3)] == [9, 8, 7]
+
+
+def test_sqlite_index_write_many_duplicate_key(storage_client):
+    client = storage_client("sqlite")
+    col = client.db.col
+    col.create_index("a")
+
+    docs = [{"_id": 0, "a": 1}, {"_id": 1, "a": 1}, {"_id": 0, "a": 2}]
+    with pytest.raises(BulkWriteError):
+        col.insert_many(docs)
+
+    col_path = os.path.join(client._storage._db_path("db"), "col.collection")
+    assert _index_entries(col_path) == 2
+    assert [doc["_id"] for doc in col.find({"a": 1})] == [0, 1]
+    assert list(col.find({"a": 2})) == []
+
+
+def test_sqlite_index_created_by_other(storage_client):
+    client = storage_client("sqlite")
+    client.db.col.insert_one({"_id": 0, "a": 1})
+    assert list(client.db.col.index_information()) == ["_id_"]
+
+    other = type(client)(client.address)
+    other.db.col.create_index("a")
+    other.db.col.insert_one({"_id": 1, "a": 1})
+
+    col = client.db.col
+    assert list(col.index_information()) == ["_id_", "a_1"]
+    col.insert_one({"_id": 2, "a": 1})
+    col_path = os.path.join(client._storage._db_path("db"), "col.collection")
+    assert _index_entries(col_path) == 3
+    assert [doc["_id"] for doc in other.db.col.find({"a": 1})] == [0, 1, 2]
+    other.close()